@@ -1,7 +1,7 @@
 "use client";
 
 
-import { useState, useEffect, useCallback, type DragEvent, type ChangeEvent } from "react";
+import { useState, useEffect, useCallback, useRef, type DragEvent, type ChangeEvent } from "react";
 import Link from "next/link";
 import { Upload, CheckCircle2, ArrowRight, Mic, MicOff, Volume2, VolumeX, Home, Sparkles } from "lucide-react";
 import { cn } from "@/lib/utils";
@@ -54,6 +54,10 @@ export default function ResumeUploadPage() {
     const [evaluations, setEvaluations] = useState<Record<number, any>>({});
     const [isEvaluating, setIsEvaluating] = useState(false);
     const [isInterviewComplete, setIsInterviewComplete] = useState(false);
+    // Server-side session: answers are graded in the background as the user moves on
+    const [sessionId, setSessionId] = useState<string | null>(null);
+    const submittedAnswers = useRef<Record<number, { answer: string; sent: Promise<boolean> }>>({});
+    const previousQuestionIndex = useRef(0);
 
     const [isVoiceMode, setIsVoiceMode] = useState(false);
     const [isListening, setIsListening] = useState(false);
@@ -199,6 +203,19 @@ const handleUpload = async () => {
   }
 };
 
+    // Warm the question cache for this resume + JD while the user finishes configuring
+    const handlePregenerate = () => {
+        if (!extractedText || !jobDescription.trim()) return;
+        fetch(`${API_BASE}/pregenerate`, {
+            method: "POST",
+            headers: { "Content-Type": "application/json" },
+            body: JSON.stringify({
+                resume_text: extractedText,
+                job_description: jobDescription
+            })
+        }).catch((error) => console.warn("Pregeneration request failed", error));
+    };
+
     const handleGenerateQuestions = async () => {
         setIsLoading(true);
 
@@ -229,6 +246,7 @@ const handleUpload = async () => {
             if (qData.questions && qData.questions.length > 0) {
                 setQuestions(qData.questions);
                 setShowConfig(false); // Only hide config if we have questions
+                startSession(qData.questions);
             } else {
                 throw new Error("No questions were generated. Please try again.");
             }
@@ -268,6 +286,67 @@ const handleUpload = async () => {
     };
 
 
+    const startSession = async (sessionQuestions: Question[]) => {
+        submittedAnswers.current = {};
+        previousQuestionIndex.current = 0;
+        setSessionId(null);
+        try {
+            const res = await fetch(`${API_BASE}/sessions`, {
+                method: "POST",
+                headers: { "Content-Type": "application/json" },
+                body: JSON.stringify({ questions: sessionQuestions })
+            });
+            if (res.ok) {
+                const data = await res.json();
+                setSessionId(data.session_id);
+            }
+        } catch (error) {
+            // Without a session the interview is graded in one batch at the end
+            console.warn("Could not start interview session", error);
+        }
+    };
+
+    // Resolves to false if the server did not store the answer; it is then resent on the next try
+    const submitAnswer = (index: number): Promise<boolean> => {
+        if (!sessionId) return Promise.resolve(false);
+        const answer = answers[index] || "";
+        const previous = submittedAnswers.current[index];
+        if (previous?.answer === answer) return previous.sent;
+        const entry = {
+            answer,
+            sent: (async () => {
+                try {
+                    const res = await fetch(`${API_BASE}/sessions/${sessionId}/answers/${index}`, {
+                        method: "PUT",
+                        headers: { "Content-Type": "application/json" },
+                        body: JSON.stringify({ answer })
+                    });
+                    if (!res.ok) {
+                        throw new Error(`Answer submission failed with status ${res.status}`);
+                    }
+                    return true;
+                } catch (error) {
+                    if (submittedAnswers.current[index] === entry) {
+                        delete submittedAnswers.current[index];
+                    }
+                    console.warn("Could not submit answer", error);
+                    return false;
+                }
+            })()
+        };
+        submittedAnswers.current[index] = entry;
+        return entry.sent;
+    };
+
+    // Submit the answer the user just left (Next, Previous or the timer) so grading starts early
+    useEffect(() => {
+        const previous = previousQuestionIndex.current;
+        previousQuestionIndex.current = currentQuestionIndex;
+        if (previous !== currentQuestionIndex) {
+            submitAnswer(previous);
+        }
+    }, [currentQuestionIndex]);
+
     const handleNext = () => {
         if (currentQuestionIndex < questions.length - 1) {
             setCurrentQuestionIndex(prev => prev + 1);
@@ -285,26 +364,42 @@ const handleUpload = async () => {
         const newEvaluations: Record<number, any> = {};
 
         try {
-            // Evaluate all answers in parallel or sequence
-            // Using sequence to avoid overloading or order issues, 
-            // but parallel would be faster. Let's do parallel for better speed.
-            const evaluationPromises = questions.map(async (q, index) => {
-                const answer = answers[index] || "No answer provided.";
-                const res = await fetchWithTimeout(`${API_BASE}/evaluate_answer`, {
-
-
-
-                    method: "POST",
-                    headers: { "Content-Type": "application/json" },
-                    body: JSON.stringify({ question: q.text, answer })
-                });
-                if (res.ok) {
-                    const result = await res.json();
-                    newEvaluations[index] = result;
+            // Earlier answers are usually graded or in flight already; this sends the last one, waits
+            // for pending ones and retries any that failed. If one still fails, the whole interview is
+            // graded below instead.
+            const answered = questions.map((_, index) => index).filter(index => index === currentQuestionIndex || answers[index]);
+            const submitted = sessionId && (await Promise.all(answered.map(submitAnswer))).every(Boolean);
+            if (submitted) {
+                const reportRes = await fetchWithTimeout(`${API_BASE}/sessions/${sessionId}/report`, { method: "GET" });
+                if (reportRes.ok) {
+                    const report = await reportRes.json();
+                    report.results.forEach((result: any, index: number) => {
+                        newEvaluations[index] = result;
+                    });
+                    setEvaluations(newEvaluations);
+                    setIsInterviewComplete(true);
+                    return;
                 }
+            }
+
+            // Grade the whole interview in one request; the backend batches the LLM calls
+            const items = questions.map((q, index) => ({
+                question: q.text,
+                answer: answers[index] || "No answer provided."
+            }));
+            const res = await fetchWithTimeout(`${API_BASE}/evaluate_interview`, {
+                method: "POST",
+                headers: { "Content-Type": "application/json" },
+                body: JSON.stringify({ items })
+            });
+            if (!res.ok) {
+                throw new Error("Failed to evaluate interview");
+            }
+            const data = await res.json();
+            data.results.forEach((result: any, index: number) => {
+                newEvaluations[index] = result;
             });
 
-            await Promise.all(evaluationPromises);
             setEvaluations(newEvaluations);
             setIsInterviewComplete(true);
         } catch (err) {
@@ -488,6 +583,7 @@ const handleUpload = async () => {
                                 <textarea
                                     value={jobDescription}
                                     onChange={(e) => setJobDescription(e.target.value)}
+                                    onBlur={handlePregenerate}
                                     placeholder="Paste the job description here to get more targeted questions..."
                                     className="w-full min-h-[120px] px-4 py-3 rounded-xl bg-secondary/30 border border-input focus:border-primary focus:ring-1 focus:ring-primary outline-none transition-all resize-none"
                                 />
@@ -663,6 +759,7 @@ const handleUpload = async () => {
                                 <button
                                     onClick={() => {
                                         setQuestions([]);
+                                        setSessionId(null);
                                         setAnswers({});
                                         setEvaluations({});
                                         setCurrentQuestionIndex(0);
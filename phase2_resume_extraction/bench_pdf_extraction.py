@@ -0,0 +1,99 @@
+"""
+Benchmark: page-parallel / early-stop PDF extraction vs. the original sequential extractor.
+
+Builds a synthetic corpus of text PDFs (1 to 50 pages) in memory and times:
+  - legacy:     the original page loop with `text +=` concatenation
+  - current:    extract_text_from_pdf (process pool for long PDFs)
+  - early-stop: extract_text_from_pdf with a 5000-character budget (what get_cache_key uses)
+
+Usage:
+    python bench_pdf_extraction.py --pages 1 5 10 25 50 --repeat 3
+"""
+import io
+import time
+import argparse
+from pypdf import PdfReader
+
+import resume_parser
+from resume_parser import extract_text_from_pdf
+
+
+def legacy_extract_text_from_pdf(source) -> str:
+    """The extractor as it was before page-parallel extraction."""
+    reader = PdfReader(source)
+    text = ""
+    for page in reader.pages:
+        try:
+            text += page.extract_text() + "\n"
+        except Exception:
+            continue
+    return text
+
+
+def make_pdf(pages: int, lines_per_page: int = 45) -> bytes:
+    """Writes a minimal multi-page text PDF (Helvetica, one content stream per page)."""
+    objects = []
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    font_id = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    pages_id = add(b"")  # filled in once the page ids are known
+    page_ids = []
+    for p in range(pages):
+        lines = [
+            f"Page {p + 1} line {i + 1}: Built REST APIs with Python, FastAPI and PostgreSQL; led React migration."
+            for i in range(lines_per_page)
+        ]
+        stream = "BT /F1 9 Tf 40 800 Td 11 TL " + " ".join(f"({line}) '" for line in lines) + " ET"
+        content_id = add(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream.encode()))
+        page_ids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 842] /Contents %d 0 R "
+            b"/Resources << /Font << /F1 %d 0 R >> >> >>" % (pages_id, content_id, font_id)
+        ))
+    kids = " ".join(f"{pid} 0 R" for pid in page_ids).encode()
+    objects[pages_id - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))
+    catalog_id = add(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b"%010d 00000 n \n" % offset)
+    out.write(b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, catalog_id, xref))
+    return out.getvalue()
+
+
+def best_of(fn, data: bytes, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(io.BytesIO(data))
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 2, 5, 10, 25, 50])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    # Warm the process pool so its start-up cost is not charged to the first long PDF
+    extract_text_from_pdf(io.BytesIO(make_pdf(resume_parser.PDF_PARALLEL_MIN_PAGES)))
+
+    print(f"workers={resume_parser.PDF_WORKERS} parallel_min_pages={resume_parser.PDF_PARALLEL_MIN_PAGES}")
+    print(f"{'pages':>6}{'legacy ms':>12}{'current ms':>12}{'early-stop ms':>15}{'speedup':>10}")
+    for pages in args.pages:
+        data = make_pdf(pages)
+        assert legacy_extract_text_from_pdf(io.BytesIO(data)) == extract_text_from_pdf(io.BytesIO(data))
+        legacy = best_of(legacy_extract_text_from_pdf, data, args.repeat)
+        current = best_of(extract_text_from_pdf, data, args.repeat)
+        early = best_of(lambda f: extract_text_from_pdf(f, max_chars=5000), data, args.repeat)
+        print(f"{pages:>6}{legacy:>12.1f}{current:>12.1f}{early:>15.1f}{legacy / current:>9.1f}x")
@@ -0,0 +1,262 @@
+"""
+Bulk resume ingestion.
+
+Local text extraction is fanned out over a process pool. Documents that come back (nearly)
+empty are scans; they go to a separate Deep Scan queue served by a few threads, since those
+calls wait on Gemini rather than the CPU. The queue is bounded: when it is full, no new files
+are handed to the pool until it drains, so a batch of scans cannot pile up in memory or
+outrun the Gemini quota. Results are yielded as they finish, not in input order.
+
+Usage:
+    python bulk_ingest.py resumes/ --out resumes.jsonl
+    python bulk_ingest.py a.pdf b.docx c.txt --workers 8 --deep-scan-workers 2
+
+One JSON object per line: the ResumeData fields plus "status" ("ok" or "error"), "error",
+"seconds" and "index" (the file's position in the input, since results arrive out of order).
+A per-format throughput summary is printed to stderr at the end.
+"""
+import os
+import io
+import sys
+import json
+import time
+import argparse
+import threading
+import contextlib
+import multiprocessing
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple, Union
+
+import resume_parser
+from resume_parser import ResumeData, build_resume_data, deep_scan, extract_text, needs_deep_scan
+
+BULK_WORKERS = int(os.getenv("BULK_WORKERS", str(os.cpu_count() or 1)))
+DEEP_SCAN_CONCURRENCY = int(os.getenv("DEEP_SCAN_CONCURRENCY", "2"))
+DEEP_SCAN_QUEUE_SIZE = int(os.getenv("DEEP_SCAN_QUEUE_SIZE", "32"))
+SUPPORTED_FORMATS = (".pdf", ".docx", ".txt")
+
+# (filename, path on disk or raw bytes)
+BulkItem = Tuple[str, Union[str, bytes]]
+
+# One pool per API process, shared by concurrent uploads so they cannot each start BULK_WORKERS processes
+_bulk_pool: Optional[ProcessPoolExecutor] = None
+_bulk_pool_lock = threading.Lock()
+
+
+def _init_worker():
+    # The bulk pool already uses every core; don't let long PDFs start a page pool per worker
+    resume_parser.PDF_WORKERS = 1
+
+
+def create_pool(workers: int = BULK_WORKERS) -> ProcessPoolExecutor:
+    # spawn, not fork: the API calls this from a threadpool thread, and a forked child can inherit
+    # a lock that another thread was holding and hang on it
+    context = multiprocessing.get_context("spawn")
+    return ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker)
+
+
+def get_bulk_pool() -> ProcessPoolExecutor:
+    """Returns the shared pool, replacing it if a crashed worker left it broken."""
+    global _bulk_pool
+    with _bulk_pool_lock:
+        if _bulk_pool is None or getattr(_bulk_pool, "_broken", False):
+            _bulk_pool = create_pool()
+        return _bulk_pool
+
+
+def close_bulk_pool():
+    """Stops the shared pool's workers; the next upload starts a new pool."""
+    global _bulk_pool
+    with _bulk_pool_lock:
+        pool, _bulk_pool = _bulk_pool, None
+    if pool is not None:
+        pool.shutdown(cancel_futures=True)
+
+
+def _open(source: Union[str, bytes]) -> Union[str, io.BytesIO]:
+    return source if isinstance(source, str) else io.BytesIO(source)
+
+
+def _extract_local(filename: str, source: Union[str, bytes]) -> Dict[str, Any]:
+    """Runs in the process pool: local extraction only, never calls Gemini."""
+    start = time.perf_counter()
+    ext = os.path.splitext(filename)[1].lower()
+    try:
+        text = extract_text(_open(source), ext).strip()
+    except Exception as e:
+        return {"error": str(e), "seconds": time.perf_counter() - start}
+    if needs_deep_scan(text):
+        return {"text": text, "deep_scan": True, "seconds": time.perf_counter() - start}
+    # Structured fields are computed here too, so the parent only serializes results
+    data = build_resume_data(text, filename, ext)
+    return {"data": data, "deep_scan": False, "seconds": time.perf_counter() - start}
+
+
+def _record(index: int, filename: str, seconds: float, data: Optional[ResumeData] = None, error: str = "") -> Dict[str, Any]:
+    if data is not None:
+        return {**data.model_dump(), "status": "ok", "error": "", "seconds": round(seconds, 4), "index": index}
+    return {
+        "text": "",
+        "filename": os.path.basename(filename),
+        "file_type": os.path.splitext(filename)[1].lower(),
+        "extraction_method": "",
+        "skills": [],
+        "sections": {},
+        "years_of_experience": None,
+        "status": "error",
+        "error": error,
+        "seconds": round(seconds, 4),
+        "index": index,
+    }
+
+
+def _deep_scan(index: int, filename: str, source: Union[str, bytes], extracted_text: str, local_seconds: float) -> Dict[str, Any]:
+    start = time.perf_counter()
+    ext = os.path.splitext(filename)[1].lower()
+    try:
+        data = deep_scan(_open(source), filename, ext, extracted_text)
+    except Exception as e:
+        return _record(index, filename, local_seconds + time.perf_counter() - start, error=str(e))
+    return _record(index, filename, local_seconds + time.perf_counter() - start, data)
+
+
+def ingest(items: Iterable[BulkItem], workers: int = BULK_WORKERS,
+           deep_scan_workers: int = DEEP_SCAN_CONCURRENCY,
+           deep_scan_queue_size: int = DEEP_SCAN_QUEUE_SIZE,
+           pool: Optional[ProcessPoolExecutor] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Parses every item and yields one record per file as soon as it is done. Local extraction runs
+    on `pool` if given (left running afterwards), otherwise on a pool of `workers` processes
+    created for this call.
+    """
+    items = enumerate(items)
+    exhausted = False
+    local: Dict[Future, Tuple[int, str, Union[str, bytes]]] = {}
+    scans: Dict[Future, int] = {}
+    backlog: deque = deque()  # scans waiting for a Deep Scan thread
+
+    with (contextlib.nullcontext(pool) if pool is not None else create_pool(workers)) as pool, \
+            ThreadPoolExecutor(max_workers=deep_scan_workers, thread_name_prefix="deep-scan") as scanner:
+        while True:
+            # Keep a couple of files per worker in flight, unless the Deep Scan queue is full
+            while not exhausted and len(local) < workers * 2 and len(backlog) + len(scans) < deep_scan_queue_size:
+                item = next(items, None)
+                if item is None:
+                    exhausted = True
+                    break
+                index, (filename, source) = item
+                if os.path.splitext(filename)[1].lower() not in SUPPORTED_FORMATS:
+                    yield _record(index, filename, 0.0, error=f"Unsupported file format: {os.path.splitext(filename)[1].lower()}")
+                    continue
+                local[pool.submit(_extract_local, filename, source)] = (index, filename, source)
+
+            while backlog and len(scans) < deep_scan_workers:
+                index, filename, source, text, seconds = backlog.popleft()
+                scans[scanner.submit(_deep_scan, index, filename, source, text, seconds)] = index
+
+            if not local and not scans:
+                return
+
+            done, _ = wait([*local, *scans], return_when=FIRST_COMPLETED)
+            for future in done:
+                if future in scans:
+                    del scans[future]
+                    yield future.result()
+                    continue
+
+                index, filename, source = local.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:  # the worker process died
+                    yield _record(index, filename, 0.0, error=str(e))
+                    continue
+                if "error" in result:
+                    yield _record(index, filename, result["seconds"], error=result["error"])
+                elif result["deep_scan"]:
+                    backlog.append((index, filename, source, result["text"], result["seconds"]))
+                else:
+                    yield _record(index, filename, result["seconds"], result["data"])
+
+
+class ThroughputReport:
+    """Per-format counts and files/s for a bulk run."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.formats: Dict[str, Dict[str, float]] = {}
+
+    def add(self, record: Dict[str, Any]):
+        row = self.formats.setdefault(record["file_type"] or "?", {"files": 0, "ok": 0, "deep_scans": 0, "errors": 0, "seconds": 0.0})
+        row["files"] += 1
+        row["ok"] += record["status"] == "ok"
+        row["errors"] += record["status"] == "error"
+        row["deep_scans"] += record["extraction_method"] == "ai_deep_scan"
+        row["seconds"] += record["seconds"]
+
+    def summary(self) -> Dict[str, Any]:
+        wall = time.perf_counter() - self.started
+        formats = {}
+        for ext, row in sorted(self.formats.items()):
+            formats[ext] = {
+                **{k: int(v) for k, v in row.items() if k != "seconds"},
+                "files_per_second": round(row["files"] / wall, 2) if wall else 0.0,
+                "avg_ms": round(row["seconds"] / row["files"] * 1000, 1),
+            }
+        files = sum(row["files"] for row in self.formats.values())
+        return {
+            "files": int(files),
+            "wall_seconds": round(wall, 2),
+            "files_per_second": round(files / wall, 2) if wall else 0.0,
+            "formats": formats,
+        }
+
+
+def iter_paths(paths: Iterable[str]) -> Iterator[BulkItem]:
+    """Expands directories (recursively) into supported resume files."""
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                for name in sorted(names):
+                    if os.path.splitext(name)[1].lower() in SUPPORTED_FORMATS:
+                        full = os.path.join(root, name)
+                        yield full, full
+        else:
+            yield path, path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+", help="Resume files or directories")
+    parser.add_argument("--out", default="-", help="JSONL output file ('-' for stdout)")
+    parser.add_argument("--workers", type=int, default=BULK_WORKERS)
+    parser.add_argument("--deep-scan-workers", type=int, default=DEEP_SCAN_CONCURRENCY)
+    parser.add_argument("--deep-scan-queue", type=int, default=DEEP_SCAN_QUEUE_SIZE)
+    args = parser.parse_args()
+
+    if args.out == "-":
+        # The parser logs with print(), in this process and in the pool; send all of that to stderr
+        out = os.fdopen(os.dup(sys.stdout.fileno()), "w", encoding="utf-8")
+        sys.stdout.flush()
+        os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    else:
+        out = open(args.out, "w", encoding="utf-8")
+    report = ThroughputReport()
+    try:
+        for record in ingest(iter_paths(args.paths), args.workers, args.deep_scan_workers, args.deep_scan_queue):
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+            report.add(record)
+    finally:
+        out.close()
+
+    summary = report.summary()
+    print(f"\n{summary['files']} files in {summary['wall_seconds']}s ({summary['files_per_second']} files/s)", file=sys.stderr)
+    print(f"{'format':<8}{'files':>7}{'ok':>7}{'deep scans':>12}{'errors':>8}{'files/s':>10}{'avg ms':>10}", file=sys.stderr)
+    for ext, row in summary["formats"].items():
+        print(f"{ext:<8}{row['files']:>7}{row['ok']:>7}{row['deep_scans']:>12}{row['errors']:>8}"
+              f"{row['files_per_second']:>10.2f}{row['avg_ms']:>10.1f}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,40 +1,144 @@
 import os
-from pypdf import PdfReader
-from docx import Document
+import io
+import mimetypes
+import threading
+import contextlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import TYPE_CHECKING, Any, Callable, ContextManager, Dict, Optional, List, Union, BinaryIO
+from resume_structure import extract_structure
+
+# pypdf and python-docx are imported where they are used, keeping them off the API's cold start path
+if TYPE_CHECKING:
+    from pypdf import PdfReader
+
+# Stage timing and the Gemini quota belong to the backend (Phase 3), which installs its hooks with
+# configure(). Standalone runs such as the bulk_ingest.py CLI time nothing and do not throttle.
+_span: Callable[[str], ContextManager] = lambda stage: contextlib.nullcontext()
+_rate_limiter: Optional[Any] = None
+_file_tokens = 0
+
+def configure(span: Callable[[str], ContextManager], rate_limiter: Any, file_tokens: int = 0):
+    """
+    Installs the caller's stage timer and rate limiter (estimate_tokens, acquire_blocking and
+    settle, as in the backend's RateLimiter). `file_tokens` is the estimated cost of an uploaded file.
+    """
+    global _span, _rate_limiter, _file_tokens
+    _span, _rate_limiter, _file_tokens = span, rate_limiter, file_tokens
+
+# parse_resume accepts a path on disk, raw bytes, or a binary file-like object
+ResumeSource = Union[str, bytes, BinaryIO]
+
+# PDF extraction tuning: pages are extracted on a process pool for long documents,
+# and PDF_MAX_CHARS > 0 stops reading pages once that much text has been collected.
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(min(4, os.cpu_count() or 1))))
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "8"))
+PDF_MAX_CHARS = int(os.getenv("PDF_MAX_CHARS", "0"))
+
+_pdf_pool: Optional[ProcessPoolExecutor] = None
+_pdf_pool_lock = threading.Lock()
 
 class ResumeData(BaseModel):
     text: str
     filename: str
     file_type: str
-    # We could add more extracted fields later, e.g., skills, email, etc.
+    extraction_method: str = "text"  # "text" or "ai_deep_scan"
+    # Filled locally from the text by resume_structure (no model call)
+    skills: List[str] = []
+    sections: Dict[str, str] = {}
+    years_of_experience: Optional[float] = None
+
+def _extract_pages(reader: "PdfReader", start: int, end: int) -> List[str]:
+    texts = []
+    for index in range(start, end):
+        try:
+            texts.append((reader.pages[index].extract_text() or "") + "\n")
+        except Exception as e:
+            print(f"Error reading PDF page: {e}")
+    return texts
+
+def _extract_page_range(data: bytes, start: int, end: int) -> List[str]:
+    """Extracts pages [start, end) of a PDF. Runs inside the process pool, so it re-opens the document."""
+    from pypdf import PdfReader
+    return _extract_pages(PdfReader(io.BytesIO(data)), start, end)
 
-def extract_text_from_pdf(filepath: str) -> str:
+def _get_pdf_pool() -> ProcessPoolExecutor:
+    global _pdf_pool
+    # Called from the API's threadpool: forking there would copy other threads' held locks into the
+    # workers, so they are spawned instead
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            _pdf_pool = ProcessPoolExecutor(max_workers=PDF_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pdf_pool
+
+def close_pdf_pool():
+    """Stops the PDF extraction workers; the next long PDF starts a new pool."""
+    global _pdf_pool
+    with _pdf_pool_lock:
+        pool, _pdf_pool = _pdf_pool, None
+    if pool is not None:
+        pool.shutdown(cancel_futures=True)
+
+def extract_text_from_pdf(source: Union[str, BinaryIO], max_chars: int = PDF_MAX_CHARS) -> str:
+    """
+    Extracts text from every page of a PDF.
+
+    With `max_chars` set, pages are read in order and extraction stops once that many characters
+    have been collected. Otherwise PDFs with at least PDF_PARALLEL_MIN_PAGES pages are split into
+    contiguous page ranges and extracted on a process pool.
+    """
+    from pypdf import PdfReader
     try:
-        reader = PdfReader(filepath)
-        text = ""
+        if isinstance(source, str):
+            with open(source, "rb") as f:
+                data = f.read()
+        else:
+            data = source.read()
+        reader = PdfReader(io.BytesIO(data))
+        page_count = len(reader.pages)
+    except Exception as e:
+        print(f"Error opening PDF: {e}")
+        return ""
+
+    if max_chars:
+        texts, collected = [], 0
         for page in reader.pages:
             try:
-                text += page.extract_text() + "\n"
+                page_text = (page.extract_text() or "") + "\n"
             except Exception as e:
                 print(f"Error reading PDF page: {e}")
                 continue
-        return text
-    except Exception as e:
-        print(f"Error opening PDF: {e}")
-        return ""
+            texts.append(page_text)
+            collected += len(page_text)
+            if collected >= max_chars:
+                break
+        return "".join(texts)
+
+    if PDF_WORKERS > 1 and page_count >= PDF_PARALLEL_MIN_PAGES:
+        try:
+            step = -(-page_count // PDF_WORKERS)
+            ranges = [(start, min(start + step, page_count)) for start in range(0, page_count, step)]
+            pool = _get_pdf_pool()
+            futures = [pool.submit(_extract_page_range, data, start, end) for start, end in ranges]
+            return "".join(text for future in futures for text in future.result())
+        except Exception as e:
+            print(f"Parallel PDF extraction failed, falling back to sequential: {e}")
+
+    return "".join(_extract_pages(reader, 0, page_count))
 
-def extract_text_from_docx(filepath: str) -> str:
-    doc = Document(filepath)
+def extract_text_from_docx(source: Union[str, BinaryIO]) -> str:
+    from docx import Document
+    doc = Document(source)
     text = []
     for para in doc.paragraphs:
         text.append(para.text)
     return "\n".join(text)
 
-def extract_text_via_ai(filepath: str) -> str:
+def extract_text_via_ai(source: Union[str, BinaryIO], filename: str = "resume.pdf") -> str:
     """
     Uses Gemini's multimodal capabilities to extract text from scanned or non-searchable PDFs.
+    `source` may be a path or a binary stream; streams are uploaded without touching the disk.
     """
     import google.generativeai as genai
     from dotenv import load_dotenv
@@ -46,16 +150,30 @@ def extract_text_via_ai(filepath: str) -> str:
         return ""
         
     try:
+        # Deep Scan shares the model's RPM/TPM quota with question generation; wait before uploading
+        prompt = "Extract all text from this resume perfectly. Focus on skills, projects, and experience. Return ONLY the raw extracted text."
+        limiter = _rate_limiter
+        if limiter is not None:
+            estimated_tokens = _file_tokens + limiter.estimate_tokens(prompt)
+            limiter.acquire_blocking('gemini-flash-latest', estimated_tokens)
+
         genai.configure(api_key=api_key)
         # Check if model exists or use a safer version
         model = genai.GenerativeModel('gemini-flash-latest')
         
-        print(f"AI Deep Scan: Uploading {filepath} to Google AI SDK...")
-        sample_file = genai.upload_file(path=filepath, display_name="Resume OCR Fallback")
+        print(f"AI Deep Scan: Uploading {filename} to Google AI SDK...")
+        if isinstance(source, str):
+            sample_file = genai.upload_file(path=source, display_name="Resume OCR Fallback")
+        else:
+            source.seek(0)
+            mime_type = mimetypes.guess_type(filename)[0] or "application/pdf"
+            sample_file = genai.upload_file(path=source, mime_type=mime_type, display_name="Resume OCR Fallback")
         
         # Wait for file to be processed if necessary (though upload_file is usually sync enough for small PDFs)
-        prompt = "Extract all text from this resume perfectly. Focus on skills, projects, and experience. Return ONLY the raw extracted text."
         response = model.generate_content([sample_file, prompt])
+        usage = getattr(response, "usage_metadata", None)
+        if limiter is not None and getattr(usage, "total_token_count", None):
+            limiter.settle('gemini-flash-latest', estimated_tokens, usage.total_token_count)
         
         if not response or not response.text:
              print("AI Deep Scan: Received empty response from Gemini.")
@@ -75,47 +193,85 @@ def extract_text_via_ai(filepath: str) -> str:
         print(f"AI Deep Scan failed: {str(e)}")
         return f"AI_ERROR: {str(e)}"
 
-def parse_resume(filepath: str) -> ResumeData:
-    ext = os.path.splitext(filepath)[1].lower()
-    text = ""
-    
-    if ext == ".pdf":
-        text = extract_text_from_pdf(filepath)
-    elif ext == ".docx":
-        text = extract_text_from_docx(filepath)
-    elif ext == ".txt":
-        with open(filepath, "r", encoding="utf-8") as f:
-            text = f.read()
-    else:
-        raise ValueError(f"Unsupported file format: {ext}")
-        
-    extracted_text = text.strip()
-    
-    # AI Deep Scan Fallback: If 0 chars or very short, it's likely a scan
-    if len(extracted_text) < 50:
-        print(f"Traditional extraction returned {len(extracted_text)} chars. Triggering AI Deep Scan...")
-        ai_text = extract_text_via_ai(filepath)
-        
-        if ai_text.startswith("AI_ERROR:"):
-             error_msg = ai_text.replace("AI_ERROR:", "").strip()
-             raise ValueError(f"AI Deep Scan failed: {error_msg}. Traditional extraction also failed (0 chars). Please check your internet connection or use a text-based PDF.")
+# Below this many extracted characters a document is treated as a scan and sent to Deep Scan
+DEEP_SCAN_MIN_CHARS = 50
 
-        if len(ai_text.strip()) > 50:
-            print("AI Deep Scan successful.")
-            extracted_text = ai_text.strip()
-        else:
-            print("AI Deep Scan also failed to extract significant text.")
-            if len(extracted_text) < 30:
-                 if len(extracted_text) == 0:
-                     raise ValueError(f"Extracted zero text from {ext}. AI Deep Scan also returned no results. The file may be empty or corrupted.")
-                 raise ValueError(f"Extracted text is too short ({len(extracted_text)} chars). Please ensure your resume is not a scanned image and contains selectable text.")
+def extract_text(source: Union[str, BinaryIO], ext: str) -> str:
+    """Local (no network) text extraction for one of the supported formats."""
+    if ext == ".pdf":
+        with _span("pdf_parse"):
+            return extract_text_from_pdf(source)
+    if ext == ".docx":
+        with _span("docx_parse"):
+            return extract_text_from_docx(source)
+    if ext == ".txt":
+        if isinstance(source, str):
+            with open(source, "r", encoding="utf-8") as f:
+                return f.read()
+        return source.read().decode("utf-8")
+    raise ValueError(f"Unsupported file format: {ext}")
 
+def build_resume_data(text: str, filename: str, ext: str, extraction_method: str = "text") -> ResumeData:
+    with _span("structure"):
+        structure = extract_structure(text)
     return ResumeData(
-        text=extracted_text,
-        filename=os.path.basename(filepath),
-        file_type=ext
+        text=text,
+        filename=os.path.basename(filename),
+        file_type=ext,
+        extraction_method=extraction_method,
+        skills=structure.skills,
+        sections=structure.sections,
+        years_of_experience=structure.years_of_experience,
     )
 
+def needs_deep_scan(extracted_text: str) -> bool:
+    return len(extracted_text.strip()) < DEEP_SCAN_MIN_CHARS
+
+def deep_scan(source: Union[str, BinaryIO], filename: str, ext: str, extracted_text: str = "") -> ResumeData:
+    """
+    AI Deep Scan fallback for documents whose local extraction came back (nearly) empty.
+    Raises ValueError when neither extraction produced usable text.
+    """
+    print(f"Traditional extraction returned {len(extracted_text)} chars. Triggering AI Deep Scan...")
+    with _span("deep_scan"):
+        ai_text = extract_text_via_ai(source, os.path.basename(filename))
+
+    if ai_text.startswith("AI_ERROR:"):
+         error_msg = ai_text.replace("AI_ERROR:", "").strip()
+         raise ValueError(f"AI Deep Scan failed: {error_msg}. Traditional extraction also failed (0 chars). Please check your internet connection or use a text-based PDF.")
+
+    if len(ai_text.strip()) > 50:
+        print("AI Deep Scan successful.")
+        return build_resume_data(ai_text.strip(), filename, ext, "ai_deep_scan")
+
+    print("AI Deep Scan also failed to extract significant text.")
+    if len(extracted_text) < 30:
+         if len(extracted_text) == 0:
+             raise ValueError(f"Extracted zero text from {ext}. AI Deep Scan also returned no results. The file may be empty or corrupted.")
+         raise ValueError(f"Extracted text is too short ({len(extracted_text)} chars). Please ensure your resume is not a scanned image and contains selectable text.")
+    return build_resume_data(extracted_text, filename, ext)
+
+def parse_resume(source: ResumeSource, filename: Optional[str] = None) -> ResumeData:
+    """
+    Extracts resume text from a file path, raw bytes, or a binary file-like object.
+    `filename` is required for bytes/streams, since the format comes from its extension.
+    """
+    if isinstance(source, str):
+        filename = filename or source
+    elif not filename:
+        raise ValueError("filename is required when parsing a resume from bytes or a stream")
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+
+    ext = os.path.splitext(filename)[1].lower()
+    extracted_text = extract_text(source, ext).strip()
+
+    # AI Deep Scan Fallback: If 0 chars or very short, it's likely a scan
+    if needs_deep_scan(extracted_text):
+        return deep_scan(source, filename, ext, extracted_text)
+
+    return build_resume_data(extracted_text, filename, ext)
+
 if __name__ == "__main__":
     # Test block
     print("Resume Parser Module Loaded.")
@@ -0,0 +1,206 @@
+import os
+import re
+import json
+from datetime import date
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+from pydantic import BaseModel
+
+# Local structured extraction, run once per resume when it is parsed: skills from a token trie
+# built over skills.json, sections from header lines, and years of experience from the date
+# ranges in the experience section (or an explicit "N years of experience"). No model calls;
+# a typical resume takes well under a millisecond.
+
+SKILLS_FILE = os.getenv(
+    "SKILLS_FILE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "skills.json")
+)
+
+# Words like "node.js", "c++" and "c#" stay single tokens; "javascript" never matches "java"
+TOKEN_PATTERN = re.compile(r"[a-z0-9][a-z0-9+#]*(?:\.[a-z0-9]+)*")
+
+# Canonical section name -> header spellings. A line is a header if it is one of these on its own,
+# optionally followed by a colon (and, for one-line sections like "Skills: Python, SQL", content).
+SECTION_HEADERS = {
+    "summary": ["summary", "profile", "objective", "professional summary", "career objective", "about me"],
+    "skills": ["skills", "technical skills", "core competencies", "technologies", "tech stack", "key skills"],
+    "experience": ["experience", "work experience", "professional experience", "employment", "employment history",
+                   "work history", "internships", "internship"],
+    "projects": ["projects", "personal projects", "academic projects", "key projects"],
+    "education": ["education", "academic background", "academics", "qualifications"],
+    "certifications": ["certifications", "certification", "certificates", "licenses and certifications"],
+    "achievements": ["achievements", "awards", "honors", "honours", "accomplishments", "awards and achievements"],
+    "publications": ["publications", "research"],
+    "languages": ["languages"],
+    "volunteering": ["volunteering", "volunteer experience", "extracurricular activities", "activities"],
+    "references": ["references", "reference", "referees", "references available upon request"],
+    "declaration": ["declaration"],
+    "personal": ["personal details", "personal information"],
+    "interests": ["interests", "hobbies", "hobbies and interests"],
+}
+PREAMBLE = "preamble"  # name and contact lines above the first header
+
+_MONTHS = "jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec"
+# Anchored on the start year (a literal digit is cheap to scan for); the start month, if any, is
+# read from the few characters before the match
+_DATE_RANGE = re.compile(
+    r"(?P<sy>(?:19|20)\d\d)\s*(?:-|–|—|to|until)\s*(?:(?P<present>present|current|now|today|till date)|"
+    r"(?:(?P<em>" + _MONTHS + r")[a-z]*\.?\s+|(?P<en>\d{1,2})/)?(?P<ey>(?:19|20)\d\d))",
+    re.IGNORECASE
+)
+_START_MONTH = re.compile(r"(?:(?P<m>" + _MONTHS + r")[a-z]*\.?\s+|(?P<n>\d{1,2})/)$", re.IGNORECASE)
+_YEAR_WORDS = {"years", "yrs"}
+
+
+class ResumeStructure(BaseModel):
+    skills: List[str] = []  # canonical names from skills.json, in order of first mention
+    sections: Dict[str, str] = {}  # canonical section name -> its text, header line included
+    years_of_experience: Optional[float] = None
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def build_skill_trie(skills: Dict[str, List[str]]) -> dict:
+    """Nested dicts keyed by token; the None key of a node holds the skill a phrase ends in."""
+    trie: dict = {}
+    for skill, aliases in skills.items():
+        for name in [skill] + list(aliases):
+            node = trie
+            for token in tokenize(name):
+                node = node.setdefault(token, {})
+            node[None] = skill
+    return trie
+
+
+def load_skill_trie(path: str = SKILLS_FILE) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return build_skill_trie(json.load(f))
+
+
+SKILL_TRIE = load_skill_trie()
+_HEADER_LOOKUP = {spelling: name for name, spellings in SECTION_HEADERS.items() for spelling in spellings}
+
+
+def match_skills(tokens: List[str], trie: dict = SKILL_TRIE) -> List[str]:
+    """Longest-match scan: "react native" is one skill, not "react" plus a stray word."""
+    found: Dict[str, None] = {}
+    i, n = 0, len(tokens)
+    while i < n:
+        node = trie.get(tokens[i])
+        if node is None:
+            i += 1
+            continue
+        skill, end = node.get(None), i + 1
+        j = i + 1
+        while j < n:
+            node = node.get(tokens[j])
+            if node is None:
+                break
+            j += 1
+            if None in node:
+                skill, end = node[None], j
+        if skill is not None:
+            found.setdefault(skill)
+            i = end
+        else:
+            i += 1
+    return list(found)
+
+
+def skills_in(text: str) -> List[str]:
+    """Skills mentioned in a short text, e.g. an interview question."""
+    return match_skills(tokenize(text))
+
+
+def section_header(line: str) -> Optional[Tuple[str, str]]:
+    """Returns (section name, inline content) if `line` starts a section."""
+    head, _, rest = line.partition(":")
+    if len(head) > 40:
+        return None
+    name = _HEADER_LOOKUP.get(" ".join(head.lower().replace("&", "and").split()))
+    if name is None:
+        return None
+    return name, rest.strip()
+
+
+def split_sections(text: str) -> Dict[str, str]:
+    sections: Dict[str, List[str]] = {}
+    current = sections.setdefault(PREAMBLE, [])
+    for raw in text.splitlines():
+        line = raw.strip()
+        if not line:
+            continue
+        header = section_header(line)
+        if header is not None:
+            # Repeated headers ("Experience", later "Internships") extend the same section
+            current = sections.setdefault(header[0], [])
+        current.append(line)
+    return {name: "\n".join(lines) for name, lines in sections.items() if lines}
+
+
+def _month_index(year: str, month: Optional[str], numeric: Optional[str]) -> int:
+    if month:
+        return int(year) * 12 + _MONTHS.split("|").index(month[:3].lower())
+    if numeric and 1 <= int(numeric) <= 12:
+        return int(year) * 12 + int(numeric) - 1
+    return int(year) * 12
+
+
+def years_from_ranges(text: str, today: Optional[date] = None) -> Optional[float]:
+    """Total span of the date ranges in `text`, with overlapping jobs counted once."""
+    today = today or date.today()
+    now = today.year * 12 + today.month - 1
+    spans = []
+    for m in _DATE_RANGE.finditer(text):
+        before = _START_MONTH.search(text, max(0, m.start() - 12), m.start())
+        start = _month_index(m.group("sy"), before and before.group("m"), before and before.group("n"))
+        end = now if m.group("present") else _month_index(m.group("ey"), m.group("em"), m.group("en"))
+        if start < end <= now:
+            spans.append((start, end))
+    if not spans:
+        return None
+    spans.sort()
+    total, (cur_start, cur_end) = 0, spans[0]
+    for start, end in spans[1:]:
+        if start > cur_end:
+            total += cur_end - cur_start
+            cur_start, cur_end = start, end
+        else:
+            cur_end = max(cur_end, end)
+    total += cur_end - cur_start
+    return round(total / 12, 1)
+
+
+def years_claimed(tokens: List[str]) -> Optional[float]:
+    """Largest "N years of experience" style claim, read from the resume's tokens."""
+    best = None
+    for i, token in enumerate(tokens):
+        if token in _YEAR_WORDS and i and "experience" in tokens[i + 1:i + 5]:
+            number = tokens[i - 1].rstrip("+")
+            if number.replace(".", "", 1).isdigit() and float(number) < 50:
+                best = max(best or 0.0, float(number))
+    return best
+
+
+def years_of_experience(sections: Dict[str, str], tokens: List[str]) -> Optional[float]:
+    # Ranges only count inside the experience section; education and project dates would inflate them
+    from_ranges = years_from_ranges(sections["experience"]) if "experience" in sections else None
+    candidates = [y for y in (from_ranges, years_claimed(tokens)) if y is not None]
+    return max(candidates) if candidates else None
+
+
+@lru_cache(maxsize=256)
+def extract_structure(text: str) -> ResumeStructure:
+    """
+    Skills, sections and years of experience for a resume. Memoized on the text, so the question
+    bank, prompt builder and upload path share one pass; treat the result as read-only.
+    """
+    tokens = tokenize(text)
+    sections = split_sections(text)
+    return ResumeStructure(
+        skills=match_skills(tokens),
+        sections=sections,
+        years_of_experience=years_of_experience(sections, tokens),
+    )
@@ -0,0 +1,241 @@
+"""
+Offline benchmark for /upload_resume, /generate_questions and /evaluate_answer.
+
+Every profile runs in a fresh process with the fake Gemini backend (see fake_gemini.PROFILES)
+and in-memory caches, so runs are repeatable and spend no quota. For each endpoint and
+concurrency level it reports requests/s, p50/p95/p99 latency, non-200 responses and, for
+question generation, how many requests each fallback level (1/1b/2/3) served.
+
+`--repeat` is the share of requests that reuse an earlier payload, which is what exercises
+the resume, question and evaluation caches. Save a run with `--json` and pass it back as
+`--baseline` to fail (exit code 1) when p95 or throughput regress beyond `--tolerance`.
+
+The client-side RPM/TPM limiter is off by default, since the free-tier limits would dominate
+every profile; `--rate-limits` turns it on to see queueing and fallback under real quotas.
+
+Usage:
+    python benchmark.py --profiles healthy flaky quota --levels 1 8 32
+    python benchmark.py --json bench.json
+    python benchmark.py --baseline bench.json --tolerance 0.25
+
+Requires httpx (pip install httpx).
+"""
+import os
+import io
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import subprocess
+import contextlib
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ENDPOINTS = ("/upload_resume", "/generate_questions", "/evaluate_answer")
+LEVELS = ("1", "1b", "2", "3")
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class PayloadFactory:
+    """Deterministic request bodies; a `repeat` share of them reuses an earlier payload."""
+
+    def __init__(self, repeat: float, scan_share: float, seed: int = 7):
+        from bench_pdf_extraction import make_pdf
+        self.repeat = repeat
+        self.scan_share = scan_share
+        self.rng = random.Random(seed)
+        self.text_pdf = make_pdf(2)
+        self.scanned_pdf = make_pdf(1, lines_per_page=0)  # no text layer -> Deep Scan
+        self.issued = {}
+
+    def _index(self, endpoint: str) -> int:
+        issued = self.issued.get(endpoint, 0)
+        index = issued
+        if issued and self.rng.random() < self.repeat:
+            index = self.rng.randrange(issued)
+        self.issued[endpoint] = issued + 1
+        return index
+
+    def next(self, endpoint: str):
+        i = self._index(endpoint)
+        if endpoint == "/upload_resume":
+            scanned = random.Random(i).random() < self.scan_share
+            # A trailing PDF comment makes the bytes (and the resume cache key) unique per index
+            data = (self.scanned_pdf if scanned else self.text_pdf) + f"\n% resume {i}\n".encode()
+            return {"files": {"file": (f"resume_{i}.pdf", data, "application/pdf")}}
+        if endpoint == "/generate_questions":
+            return {"json": {
+                "resume_text": f"Candidate {i}. Python developer with React, SQL and Docker experience. Built REST APIs.",
+                "job_description": "Backend engineer, Python and SQL" if i % 2 else "",
+                "num_questions": 5,
+            }}
+        return {"json": {"question": "What is a closure in JavaScript?",
+                         "answer": f"A function bundled with its lexical scope, variant {i}."}}
+
+
+async def run_level(client, endpoint: str, concurrency: int, total: int, payloads: PayloadFactory):
+    from metrics import QUESTION_SOURCE
+    import fake_gemini
+
+    requests = [payloads.next(endpoint) for _ in range(total)]
+    queue = iter(requests)
+    latencies, failures = [], 0
+    levels_before = {level: QUESTION_SOURCE.value(level) for level in LEVELS}
+    calls_before = fake_gemini.STATS["calls"]
+
+    async def worker():
+        nonlocal failures
+        for kwargs in queue:
+            start = time.perf_counter()
+            res = await client.post(endpoint, **kwargs)
+            latencies.append(time.perf_counter() - start)
+            if res.status_code != 200:
+                failures += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - start
+
+    result = {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "requests": total,
+        "rps": round(total / wall, 2),
+        "p50_ms": round(_percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(_percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(_percentile(latencies, 99) * 1000, 1),
+        "errors": failures,
+        "model_calls": fake_gemini.STATS["calls"] - calls_before,
+    }
+    if endpoint == "/generate_questions":
+        result["levels"] = {level: int(QUESTION_SOURCE.value(level) - levels_before[level]) for level in LEVELS}
+    return result
+
+
+async def run_profile(args) -> dict:
+    import anyio
+    import httpx
+    import fake_gemini
+
+    anyio.to_thread.current_default_thread_limiter().total_tokens = args.threads
+    import main as app_module
+
+    payloads = PayloadFactory(args.repeat, args.scan_share)
+    results = []
+    transport = httpx.ASGITransport(app=app_module.app)
+    # ASGITransport does not run lifespan events, so start the app explicitly
+    async with app_module.app.router.lifespan_context(app_module.app), httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        for endpoint in ENDPOINTS:
+            for concurrency in args.levels:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    results.append(await run_level(client, endpoint, concurrency, max(args.requests, concurrency), payloads))
+    return {"profile": args.run_profile, "fake_stats": dict(fake_gemini.STATS), "results": results}
+
+
+def run_profile_in_subprocess(profile: str, args) -> dict:
+    command = [
+        sys.executable, os.path.abspath(__file__), "--run-profile", profile,
+        "--levels", *map(str, args.levels), "--requests", str(args.requests), "--threads", str(args.threads),
+        "--repeat", str(args.repeat), "--scan-share", str(args.scan_share),
+    ]
+    if args.rate_limits:
+        command.append("--rate-limits")
+    completed = subprocess.run(command, capture_output=True, text=True, cwd=HERE)
+    if completed.returncode != 0:
+        raise RuntimeError(f"Profile {profile} failed:\n{completed.stderr[-2000:]}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def print_report(run: dict):
+    print(f"\nprofile={run['profile']}  fake calls={run['fake_stats']['calls']} "
+          f"errors={run['fake_stats']['errors']} quota errors={run['fake_stats']['quota_errors']}")
+    print(f"{'endpoint':<22}{'conc':>6}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}{'model calls':>13}  levels 1/1b/2/3")
+    for r in run["results"]:
+        levels = "/".join(str(r["levels"][level]) for level in LEVELS) if "levels" in r else ""
+        print(f"{r['endpoint']:<22}{r['concurrency']:>6}{r['rps']:>9.1f}{r['p50_ms']:>9.0f}{r['p95_ms']:>9.0f}"
+              f"{r['p99_ms']:>9.0f}{r['errors']:>8}{r['model_calls']:>13}  {levels}")
+
+
+def compare(runs: list, baseline: list, tolerance: float) -> list:
+    """Returns a description of every result that is slower or less productive than the baseline."""
+    expected = {
+        (run["profile"], r["endpoint"], r["concurrency"]): r
+        for run in baseline for r in run["results"]
+    }
+    regressions = []
+    for run in runs:
+        for r in run["results"]:
+            base = expected.get((run["profile"], r["endpoint"], r["concurrency"]))
+            if base is None:
+                continue
+            where = f"{run['profile']} {r['endpoint']} c={r['concurrency']}"
+            if r["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+                regressions.append(f"{where}: p95 {base['p95_ms']:.0f}ms -> {r['p95_ms']:.0f}ms")
+            if r["rps"] < base["rps"] * (1 - tolerance):
+                regressions.append(f"{where}: throughput {base['rps']:.1f} -> {r['rps']:.1f} req/s")
+            if r["errors"] > base["errors"]:
+                regressions.append(f"{where}: errors {base['errors']} -> {r['errors']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profiles", nargs="+", default=["healthy", "flaky", "quota"], help="Names from fake_gemini.PROFILES")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 8, 32], help="Concurrency levels")
+    parser.add_argument("--requests", type=int, default=64, help="Requests per endpoint and level")
+    parser.add_argument("--threads", type=int, default=8, help="Threadpool size for the app")
+    parser.add_argument("--repeat", type=float, default=0.3, help="Share of requests that reuse an earlier payload")
+    parser.add_argument("--scan-share", type=float, default=0.1, help="Share of uploads that need Deep Scan")
+    parser.add_argument("--json", help="Write results to this file")
+    parser.add_argument("--baseline", help="Compare against results saved with --json")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative regression")
+    parser.add_argument("--rate-limits", action="store_true", help="Enforce the Gemini RPM/TPM limits client-side")
+    parser.add_argument("--run-profile", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_profile:
+        # Child process: isolated caches, router state and metrics for one profile
+        os.environ["GEMINI_API_KEY"] = "fake-key"
+        os.environ["CACHE_BACKEND"] = "memory"
+        os.environ.setdefault("LLM_MAX_CONCURRENCY", str(max(args.levels)))
+        os.environ["RATE_LIMITS_ENABLED"] = "1" if args.rate_limits else "0"
+        sys.path.insert(0, HERE)
+        sys.path.insert(0, os.path.join(HERE, "..", "phase2_resume_extraction"))
+        import fake_gemini
+        fake_gemini.install(**fake_gemini.PROFILES[args.run_profile])
+        with contextlib.redirect_stdout(io.StringIO()):
+            run = asyncio.run(run_profile(args))
+        print(json.dumps(run))
+        return
+
+    runs = []
+    for profile in args.profiles:
+        run = run_profile_in_subprocess(profile, args)
+        print_report(run)
+        runs.append(run)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(runs, f, indent=2)
+        print(f"\nSaved results to {args.json}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(runs, json.load(f), args.tolerance)
+        if regressions:
+            print("\nRegressions against baseline:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("\nNo regressions against baseline.")
+
+
+if __name__ == "__main__":
+    main()
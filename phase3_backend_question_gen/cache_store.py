@@ -0,0 +1,356 @@
+import os
+import json
+import asyncio
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+# Persistent cache for generated questions (Level 1 of the fallback chain).
+# Backends share one small interface so main.py does not care where entries live.
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "sqlite")  # "sqlite" or "memory"
+CACHE_DB = os.getenv("CACHE_DB", "question_cache.db")
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+CACHE_TTL_SECONDS = int(os.getenv("CACHE_TTL_SECONDS", str(7 * 24 * 3600)))  # 0 disables expiry
+
+
+class CacheStore:
+    """
+    Minimal key/value interface for the cache backends.
+    Values must be JSON-serializable.
+
+    The a*-prefixed methods are for async code: SQLite calls can wait up to busy_timeout on
+    another process's write lock, so they run on a worker thread instead of the event loop.
+    """
+
+    # False for backends whose calls never block, which then run inline
+    blocking = True
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, ttl_seconds: int = CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: Any) -> None:
+        raise NotImplementedError
+
+    def add(self, key: str, value: Any) -> bool:
+        """Stores `value` only if `key` is absent or expired. Returns True if it was stored."""
+        raise NotImplementedError
+
+    def contains(self, key: str) -> bool:
+        """True if `key` has a live entry. Unlike get(), does not count as a hit or miss."""
+        raise NotImplementedError
+
+    def update(self, key: str, fn: Callable[[Optional[Any]], Any]) -> Any:
+        """
+        Atomically replaces the entry with `fn(current)` and returns the new value. `current` is
+        None if the key is absent or expired. Other updates of the store (from any process, for
+        SQLite) wait until this one is done, so `fn` should be quick and must not touch the store.
+        """
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    async def _offload(self, fn: Callable, *args) -> Any:
+        if self.blocking:
+            return await asyncio.to_thread(fn, *args)
+        return fn(*args)
+
+    async def aget(self, key: str) -> Optional[Any]:
+        return await self._offload(self.get, key)
+
+    async def aset(self, key: str, value: Any) -> None:
+        await self._offload(self.set, key, value)
+
+    async def aadd(self, key: str, value: Any) -> bool:
+        return await self._offload(self.add, key, value)
+
+    async def acontains(self, key: str) -> bool:
+        return await self._offload(self.contains, key)
+
+    async def aupdate(self, key: str, fn: Callable[[Optional[Any]], Any]) -> Any:
+        return await self._offload(self.update, key, fn)
+
+    async def adelete(self, key: str) -> None:
+        await self._offload(self.delete, key)
+
+    def _record(self, hit: bool):
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self).__name__,
+            "entries": len(self),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+class MemoryCacheStore(CacheStore):
+    """Process-local LRU cache. Useful for tests and single-worker dev runs."""
+
+    blocking = False
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, ttl_seconds: int = CACHE_TTL_SECONDS):
+        super().__init__(max_entries, ttl_seconds)
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and self.ttl_seconds and time.time() - entry[1] > self.ttl_seconds:
+                del self._data[key]
+                entry = None
+            self._record(entry is not None)
+            if entry is None:
+                return None
+            self._data.move_to_end(key)
+            return entry[0]
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._data[key] = (value, time.time())
+            self._data.move_to_end(key)
+            self.writes += 1
+            self._evict_over_cap()
+
+    def add(self, key: str, value: Any) -> bool:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and not (self.ttl_seconds and time.time() - entry[1] > self.ttl_seconds):
+                return False
+            self._data[key] = (value, time.time())
+            self._data.move_to_end(key)
+            self.writes += 1
+            self._evict_over_cap()
+            return True
+
+    def contains(self, key: str) -> bool:
+        with self._lock:
+            entry = self._data.get(key)
+            return entry is not None and not (self.ttl_seconds and time.time() - entry[1] > self.ttl_seconds)
+
+    def update(self, key: str, fn: Callable[[Optional[Any]], Any]) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            live = entry is not None and not (self.ttl_seconds and time.time() - entry[1] > self.ttl_seconds)
+            value = fn(entry[0] if live else None)
+            self._data[key] = (value, time.time())
+            self._data.move_to_end(key)
+            self.writes += 1
+            self._evict_over_cap()
+            return value
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def _evict_over_cap(self):
+        # Caller holds the lock; drops least recently used entries
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+
+class SQLiteCacheStore(CacheStore):
+    """
+    SQLite-backed LRU/TTL cache, safe to share between worker processes.
+
+    Lookups and inserts hit the primary key index, so their cost does not grow with
+    the number of entries. WAL mode lets readers proceed while another process writes.
+    Size-cap eviction runs every `evict_every` writes, so the table may briefly hold
+    up to that many entries over `max_entries`.
+    """
+
+    # Only refresh last_access when it is older than this, so hot reads don't turn into writes
+    TOUCH_INTERVAL_SECONDS = 60
+
+    def __init__(self, path: str = CACHE_DB, namespace: str = "questions",
+                 max_entries: int = CACHE_MAX_ENTRIES, ttl_seconds: int = CACHE_TTL_SECONDS,
+                 evict_every: int = 100):
+        super().__init__(max_entries, ttl_seconds)
+        self.path = path
+        self.namespace = namespace
+        self.evict_every = evict_every
+        self._local = threading.local()
+        self._init_schema()
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread (and per process after a fork)
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=10000")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _init_schema(self):
+        conn = self._conn()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache_entries (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            ) WITHOUT ROWID
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_lru ON cache_entries(namespace, last_access)")
+
+    def get(self, key: str) -> Optional[Any]:
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT value, created_at, last_access FROM cache_entries WHERE namespace = ? AND key = ?",
+            (self.namespace, key)
+        ).fetchone()
+        now = time.time()
+
+        if row is not None and self.ttl_seconds and now - row[1] > self.ttl_seconds:
+            self.delete(key)
+            row = None
+
+        self._record(row is not None)
+        if row is None:
+            return None
+
+        if now - row[2] > self.TOUCH_INTERVAL_SECONDS:
+            conn.execute(
+                "UPDATE cache_entries SET last_access = ? WHERE namespace = ? AND key = ?",
+                (now, self.namespace, key)
+            )
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any) -> None:
+        now = time.time()
+        self._conn().execute(
+            "INSERT OR REPLACE INTO cache_entries (namespace, key, value, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+            (self.namespace, key, json.dumps(value), now, now)
+        )
+        self.writes += 1
+        if self.writes % self.evict_every == 0:
+            self.evict()
+
+    def add(self, key: str, value: Any) -> bool:
+        # Single statement, so two processes racing for the same key cannot both win
+        now = time.time()
+        expired_before = now - self.ttl_seconds if self.ttl_seconds else float("-inf")
+        cur = self._conn().execute(
+            """
+            INSERT INTO cache_entries (namespace, key, value, created_at, last_access) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (namespace, key) DO UPDATE SET
+                value = excluded.value, created_at = excluded.created_at, last_access = excluded.last_access
+            WHERE cache_entries.created_at < ?
+            """,
+            (self.namespace, key, json.dumps(value), now, now, expired_before)
+        )
+        if cur.rowcount:
+            self.writes += 1
+            if self.writes % self.evict_every == 0:
+                self.evict()
+        return cur.rowcount > 0
+
+    def contains(self, key: str) -> bool:
+        row = self._conn().execute(
+            "SELECT created_at FROM cache_entries WHERE namespace = ? AND key = ?",
+            (self.namespace, key)
+        ).fetchone()
+        return row is not None and not (self.ttl_seconds and time.time() - row[0] > self.ttl_seconds)
+
+    def update(self, key: str, fn: Callable[[Optional[Any]], Any]) -> Any:
+        conn = self._conn()
+        # IMMEDIATE takes the write lock up front, so no other process can read-modify-write in between
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT value, created_at FROM cache_entries WHERE namespace = ? AND key = ?",
+                (self.namespace, key)
+            ).fetchone()
+            now = time.time()
+            live = row is not None and not (self.ttl_seconds and now - row[1] > self.ttl_seconds)
+            value = fn(json.loads(row[0]) if live else None)
+            conn.execute(
+                "INSERT OR REPLACE INTO cache_entries (namespace, key, value, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (self.namespace, key, json.dumps(value), now, now)
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self.writes += 1
+        if self.writes % self.evict_every == 0:
+            self.evict()
+        return value
+
+    def delete(self, key: str) -> None:
+        self._conn().execute(
+            "DELETE FROM cache_entries WHERE namespace = ? AND key = ?",
+            (self.namespace, key)
+        )
+
+    def evict(self) -> int:
+        """Drops expired entries, then the least recently used ones above max_entries."""
+        conn = self._conn()
+        removed = 0
+        if self.ttl_seconds:
+            cur = conn.execute(
+                "DELETE FROM cache_entries WHERE namespace = ? AND created_at < ?",
+                (self.namespace, time.time() - self.ttl_seconds)
+            )
+            removed += cur.rowcount
+        cur = conn.execute(
+            """
+            DELETE FROM cache_entries WHERE namespace = ? AND key IN (
+                SELECT key FROM cache_entries WHERE namespace = ?
+                ORDER BY last_access DESC LIMIT -1 OFFSET ?
+            )
+            """,
+            (self.namespace, self.namespace, self.max_entries)
+        )
+        removed += cur.rowcount
+        self.evictions += removed
+        return removed
+
+    def __len__(self) -> int:
+        row = self._conn().execute(
+            "SELECT COUNT(*) FROM cache_entries WHERE namespace = ?", (self.namespace,)
+        ).fetchone()
+        return row[0]
+
+
+def get_cache_store(namespace: str, **kwargs) -> CacheStore:
+    """Builds the configured cache backend for the given namespace."""
+    if CACHE_BACKEND == "memory":
+        return MemoryCacheStore(**kwargs)
+    if CACHE_BACKEND == "sqlite":
+        return SQLiteCacheStore(namespace=namespace, **kwargs)
+    raise ValueError(f"Unknown CACHE_BACKEND: {CACHE_BACKEND}")
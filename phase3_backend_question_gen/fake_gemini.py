@@ -0,0 +1,239 @@
+"""
+Deterministic stand-in for `google.generativeai`, used by the load test and benchmarks
+so they can run without network access or Gemini quota.
+
+    import fake_gemini
+    fake_gemini.install(latency=0.2)
+    import main  # every Gemini call now goes to the fake model
+
+    fake_gemini.install(**fake_gemini.PROFILES["quota"])  # switch to a failure profile
+
+Only the parts of the SDK this project uses are implemented. Latency jitter and injected
+failures come from a seeded RNG, so a given profile produces the same run every time.
+"""
+import sys
+import re
+import json
+import time
+import types
+import random
+import asyncio
+import threading
+
+# Behaviour of the fake model; tweak through install()
+PROFILE = {
+    "latency": 0.2,     # seconds per generate_content call
+    "jitter": 0.0,      # +/- fraction of latency, e.g. 0.5 -> 0.1s..0.3s for latency 0.2
+    "error_rate": 0.0,  # share of calls failing with a 500
+    "quota_after": 0,   # calls each model serves before answering 429 for good (0 = unlimited)
+    "malformed_rate": 0.0,  # share of evaluation replies with a formatting glitch (fence, trailing comma, truncation)
+    "seed": 1234,
+}
+
+# Named profiles for benchmarks
+PROFILES = {
+    "healthy": {"latency": 0.2, "jitter": 0.25, "error_rate": 0.0, "quota_after": 0, "malformed_rate": 0.0},
+    "slow": {"latency": 1.5, "jitter": 0.5, "error_rate": 0.0, "quota_after": 0, "malformed_rate": 0.0},
+    "flaky": {"latency": 0.2, "jitter": 0.25, "error_rate": 0.2, "quota_after": 0, "malformed_rate": 0.0},
+    # Every model runs dry after 40 calls: the router walks down the model list, then Level 3 takes over
+    "quota": {"latency": 0.2, "jitter": 0.25, "error_rate": 0.0, "quota_after": 40, "malformed_rate": 0.0},
+    "outage": {"latency": 0.05, "jitter": 0.0, "error_rate": 1.0, "quota_after": 0, "malformed_rate": 0.0},
+    "malformed": {"latency": 0.2, "jitter": 0.25, "error_rate": 0.0, "quota_after": 0, "malformed_rate": 0.3},
+}
+
+# Simple counters so callers can check how much concurrency actually reached the "API"
+STATS = {
+    "calls": 0,
+    "in_flight": 0,
+    "max_in_flight": 0,
+    "errors": 0,
+    "quota_errors": 0,
+}
+# Calls per model name, used for the quota profile
+MODEL_CALLS = {}
+
+_rng = random.Random(PROFILE["seed"])
+_lock = threading.Lock()
+
+
+class ResourceExhausted(Exception):
+    """Mirrors google.api_core.exceptions.ResourceExhausted."""
+    code = 429
+
+
+class InternalServerError(Exception):
+    """Mirrors google.api_core.exceptions.InternalServerError."""
+    code = 500
+
+
+def _prompt_text(contents) -> str:
+    if isinstance(contents, str):
+        return contents
+    return " ".join(part for part in contents if isinstance(part, str))
+
+
+_EVALUATION = {
+    "score": 7,
+    "feedback": "Solid answer with room for more depth.",
+    "missing_keywords": ["trade-offs"],
+    "improvements": "Mention trade-offs and a concrete example.",
+    "ideal_answer": "A complete answer explains the concept, a trade-off, and an example."
+}
+
+
+def _malformed(text: str) -> str:
+    """The glitches structured output still shows now and then."""
+    with _lock:
+        if not PROFILE["malformed_rate"] or _rng.random() >= PROFILE["malformed_rate"]:
+            return text
+        kind = _rng.randrange(3)
+    if kind == 0:
+        return f"Here is the evaluation:\n```json\n{text}\n```"
+    if kind == 1:
+        return text[:-1] + ",}"
+    return text[:int(len(text) * 0.8)]  # cut off at the output limit
+
+
+def _reply(contents) -> str:
+    prompt = _prompt_text(contents)
+
+    if "Evaluate the following answer" in prompt:
+        return _malformed(json.dumps(_EVALUATION))
+
+    if "Evaluate each of the following answers" in prompt:
+        indices = [int(i) for i in re.findall(r"### Item (\d+)", prompt)]
+        return _malformed(json.dumps({"evaluations": [dict(_EVALUATION, index=i) for i in indices]}))
+
+    if "Extract all text from this resume" in prompt:
+        return "Jane Doe\nSoftware Engineer\nSkills: Python, React, SQL\nExperience: 3 years building web services."
+
+    match = re.search(r"Generate exactly (\d+) interview questions", prompt)
+    count = int(match.group(1)) if match else 5
+    questions = [
+        {
+            "id": i + 1,
+            "text": f"Fake question {i + 1}: describe a project where you used this skill.",
+            "type": "technical",
+            "difficulty": "medium",
+            "context": "[Resume] Generated by the fake Gemini backend.",
+            "initial_code": ""
+        }
+        for i in range(count)
+    ]
+    return json.dumps({"questions": questions})
+
+
+def _plan_call(model_name: str) -> float:
+    """
+    Decides the outcome of one call up front: raises the injected error, or returns
+    how long the call should take.
+    """
+    with _lock:
+        MODEL_CALLS[model_name] = MODEL_CALLS.get(model_name, 0) + 1
+        quota_after = PROFILE["quota_after"]
+        if quota_after and MODEL_CALLS[model_name] > quota_after:
+            STATS["quota_errors"] += 1
+            raise ResourceExhausted(f"429 Resource has been exhausted (e.g. check quota) for {model_name}.")
+        if PROFILE["error_rate"] and _rng.random() < PROFILE["error_rate"]:
+            STATS["errors"] += 1
+            raise InternalServerError("500 An internal error has occurred.")
+        jitter = PROFILE["jitter"] * _rng.uniform(-1, 1)
+    return max(0.0, PROFILE["latency"] * (1 + jitter))
+
+
+class _Call:
+    """Tracks in-flight calls for STATS."""
+
+    def __enter__(self):
+        with _lock:
+            STATS["calls"] += 1
+            STATS["in_flight"] += 1
+            STATS["max_in_flight"] = max(STATS["max_in_flight"], STATS["in_flight"])
+
+    def __exit__(self, *exc):
+        with _lock:
+            STATS["in_flight"] -= 1
+
+
+class GenerateContentResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class AsyncStreamingResponse:
+    """Spreads the reply over `chunks` pieces, with the latency spread evenly between them."""
+
+    def __init__(self, text: str, latency: float, chunks: int = 10):
+        self._text = text
+        self._latency = latency
+        self._chunks = chunks
+
+    async def __aiter__(self):
+        size = max(1, len(self._text) // self._chunks + 1)
+        with _Call():
+            for start in range(0, len(self._text), size):
+                await asyncio.sleep(self._latency / self._chunks)
+                yield GenerateContentResponse(self._text[start:start + size])
+
+
+class GenerativeModel:
+    def __init__(self, model_name: str = "gemini-flash-latest", generation_config=None, **kwargs):
+        self.model_name = model_name
+        self.generation_config = generation_config
+
+    def generate_content(self, contents, **kwargs):
+        with _Call():
+            time.sleep(_plan_call(self.model_name))
+            return GenerateContentResponse(_reply(contents))
+
+    async def generate_content_async(self, contents, stream: bool = False, **kwargs):
+        if stream:
+            return AsyncStreamingResponse(_reply(contents), _plan_call(self.model_name))
+        with _Call():
+            await asyncio.sleep(_plan_call(self.model_name))
+            return GenerateContentResponse(_reply(contents))
+
+
+def configure(**kwargs):
+    pass
+
+
+def upload_file(path: str, display_name: str = "", **kwargs):
+    return types.SimpleNamespace(name=f"files/{display_name or path}")
+
+
+def delete_file(name: str, **kwargs):
+    pass
+
+
+def reset_stats():
+    """Zeroes the counters, refills every model's quota and reseeds the RNG."""
+    global _rng
+    with _lock:
+        for key in STATS:
+            STATS[key] = 0
+        MODEL_CALLS.clear()
+        _rng = random.Random(PROFILE["seed"])
+
+
+def install(**profile):
+    """
+    Replaces `google.generativeai` with this module for the rest of the process.
+    Must run before anything imports the real SDK. Calling it again just updates the profile.
+    """
+    PROFILE.update(profile)
+    reset_stats()
+    module = sys.modules[__name__]
+
+    google_pkg = sys.modules.get("google")
+    if google_pkg is None:
+        try:
+            import google as google_pkg
+        except ImportError:
+            google_pkg = types.ModuleType("google")
+            google_pkg.__path__ = []
+            sys.modules["google"] = google_pkg
+
+    google_pkg.generativeai = module
+    sys.modules["google.generativeai"] = module
+    return module
@@ -0,0 +1,127 @@
+import re
+import json
+from typing import Any, List, Tuple
+from metrics import registry
+
+# Tolerant parsing for structured model output. Even with a response schema, a reply can come
+# back in a markdown fence, wrapped in prose, with a trailing comma, or cut off at the output
+# limit. Repairing it locally is far cheaper than paying for another model call.
+
+JSON_PARSES = registry.counter(
+    "llm_json_parse_total",
+    "Structured model outputs by parse outcome: clean, repaired, or failed (the next model is called).",
+    ("component", "outcome")
+)
+
+_FENCE_START = re.compile(r"^```[a-zA-Z]*\s*")
+_FENCE_END = re.compile(r"\s*```$")
+# A bare token the output stopped in the middle of, e.g. `"score": tru`
+_PARTIAL_LITERAL = re.compile(r"(?<=[:\[,])\s*([^\s\"\[\]{},:]+)$")
+_LITERAL = re.compile(r"true|false|null|-?\d+(\.\d+)?([eE][+-]?\d+)?")
+
+
+def _string_start(text: str) -> int:
+    """Index of the opening quote of the string literal `text` ends with."""
+    i = len(text) - 2
+    while i >= 0:
+        if text[i] == '"':
+            backslashes = 0
+            while i - backslashes - 1 >= 0 and text[i - backslashes - 1] == "\\":
+                backslashes += 1
+            if backslashes % 2 == 0:
+                return i
+        i -= 1
+    return -1
+
+
+def _trim_dangling(text: str, in_object: bool) -> str:
+    """Drops the half-written member at the end of a truncated document."""
+    text = text.rstrip()
+    match = _PARTIAL_LITERAL.search(text)
+    if match and not _LITERAL.fullmatch(match.group(1)):
+        text = text[:match.start(1)].rstrip()
+    if text.endswith(","):
+        return text[:-1]
+    dangling_key = text.endswith(":")
+    if dangling_key:
+        text = text[:-1].rstrip()
+    if text.endswith('"') and (dangling_key or in_object):
+        start = _string_start(text)
+        before = text[:start].rstrip()
+        # A string right after "{" or "," inside an object is a key without its value
+        if start >= 0 and (dangling_key or before.endswith(("{", ","))):
+            text = before[:-1] if before.endswith(",") else before
+    return text
+
+
+def repair_json(text: str) -> str:
+    """
+    Best-effort fix-up of a JSON document: ignores prose around the first object or array,
+    removes trailing commas, and closes whatever a truncated response left open.
+    Raises ValueError if there is no JSON to recover.
+    """
+    starts = [i for i in (text.find("{"), text.find("[")) if i != -1]
+    if not starts:
+        raise ValueError("No JSON object in model output")
+    out: List[str] = []
+    stack: List[str] = []
+    in_string = escape = False
+    for ch in text[min(starts):]:
+        if in_string:
+            out.append(ch)
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch in "}]":
+            while out and out[-1].isspace():
+                out.pop()
+            if out and out[-1] == ",":
+                out.pop()
+            if not stack or ch != stack.pop():
+                raise ValueError("Mismatched brackets in model output")
+            out.append(ch)
+            if not stack:
+                break  # anything after the document is prose
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+        out.append(ch)
+
+    repaired = "".join(out)
+    if in_string:
+        repaired = (repaired[:-1] if escape else repaired) + '"'
+    if stack:
+        repaired = _trim_dangling(repaired, stack[-1] == "}") + "".join(reversed(stack))
+    return repaired
+
+
+def parse_json(text: str, component: str, required: Tuple[str, ...] = ()) -> Any:
+    """
+    json.loads with a local repair pass. `required` keys must be present in the resulting object,
+    so a repair that cut away the essentials still counts as a failure. Raises ValueError if the
+    output is unrecoverable.
+    """
+    cleaned = _FENCE_END.sub("", _FENCE_START.sub("", text.strip()))
+    outcome = "clean"
+    try:
+        try:
+            data = json.loads(cleaned)
+        except json.JSONDecodeError:
+            # strict=False: raw newlines inside strings are a common glitch too
+            data = json.loads(repair_json(cleaned), strict=False)
+            outcome = "repaired"
+        if required and not (isinstance(data, dict) and all(key in data for key in required)):
+            raise ValueError(f"missing {', '.join(required)}")
+    except ValueError as e:
+        JSON_PARSES.inc(component, "failed")
+        raise ValueError(f"Could not parse JSON from LLM response: {e}") from e
+    JSON_PARSES.inc(component, outcome)
+    if outcome == "repaired":
+        print(f"Repaired malformed JSON from the model ({component})")
+    return data
@@ -0,0 +1,142 @@
+import os
+import time
+import asyncio
+from typing import Any, AsyncIterator, List, Optional
+from dotenv import load_dotenv
+from model_router import ModelRouter, get_model_router
+from metrics import observe_model
+from rate_limiter import RateLimiter, get_rate_limiter
+
+# Shared async Gemini client used by question generation (Phase 3) and answer evaluation (Phase 4).
+# Calls run on the event loop instead of tying up a threadpool worker for the whole round trip.
+
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+
+
+class LLMClient:
+    def __init__(self, api_key: Optional[str] = None, timeout: float = LLM_TIMEOUT_SECONDS, max_concurrency: int = LLM_MAX_CONCURRENCY, router: Optional[ModelRouter] = None, limiter: Optional[RateLimiter] = None):
+        load_dotenv()
+        api_key = api_key or os.getenv("GEMINI_API_KEY")
+        if not api_key:
+            raise ValueError("GEMINI_API_KEY not found in environment variables")
+
+        self.api_key = api_key
+        self._configured = False
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.router = router or get_model_router()
+        # RPM/TPM quota per model; a RateLimited error means the caller should try its next model
+        self.limiter = limiter or get_rate_limiter()
+        # Caps in-flight Gemini calls across all requests; extra callers wait here instead of piling onto the API
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    def _configure(self):
+        # The SDK is imported and configured on first use rather than at startup
+        if not self._configured:
+            import google.generativeai as genai
+            genai.configure(api_key=self.api_key)
+            self._configured = True
+
+    async def _acquire(self, model_name: str, contents: Any) -> int:
+        """Waits for quota and returns the call's token estimate."""
+        estimated_tokens = self.limiter.estimate_tokens(contents)
+        try:
+            await self.limiter.acquire(model_name, estimated_tokens)
+        except BaseException:
+            # Nothing was sent, so this is no verdict on the model's health
+            self.router.release(model_name)
+            raise
+        return estimated_tokens
+
+    async def _settle(self, model_name: str, estimated_tokens: int, response: Any):
+        usage = getattr(response, "usage_metadata", None)
+        total = getattr(usage, "total_token_count", None) if usage is not None else None
+        if total:
+            # A write to the shared bucket store, so it runs on a worker thread
+            await asyncio.to_thread(self.limiter.settle, model_name, estimated_tokens, total)
+
+    async def candidates(self, preferred: List[str]) -> List[str]:
+        """Orders a caller's model list by current health; models with an open circuit are skipped."""
+        return await self.router.order(preferred)
+
+    async def generate(self, model_name: str, contents: Any, generation_config: Optional[dict] = None, timeout: Optional[float] = None) -> str:
+        """
+        Runs a single generate_content call against `model_name` and returns the response text.
+        Raises asyncio.TimeoutError if the call takes longer than `timeout` seconds, and
+        RateLimited (before anything is sent) if the model has no quota left.
+        """
+        self._configure()
+        model = self.router.get_model(model_name, generation_config)
+        estimated_tokens = await self._acquire(model_name, contents)
+        async with self._semaphore:
+            start = time.perf_counter()
+            try:
+                response = await asyncio.wait_for(
+                    model.generate_content_async(contents),
+                    timeout=timeout or self.timeout
+                )
+            except Exception as e:
+                await self.router.record_failure(model_name, e)
+                observe_model(model_name, time.perf_counter() - start, "error")
+                raise
+            finally:
+                self.router.release(model_name)
+            elapsed = time.perf_counter() - start
+            self.router.record_success(model_name, elapsed)
+            observe_model(model_name, elapsed, "ok")
+        await self._settle(model_name, estimated_tokens, response)
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None:
+            print(f"{model_name} usage: {usage.prompt_token_count} prompt tokens, {usage.candidates_token_count} output tokens")
+        return response.text
+
+    async def stream(self, model_name: str, contents: Any, generation_config: Optional[dict] = None, timeout: Optional[float] = None) -> AsyncIterator[str]:
+        """
+        Streams a generate_content call, yielding text chunks as Gemini produces them.
+        `timeout` bounds the wait for each chunk rather than the whole response.
+        """
+        self._configure()
+        model = self.router.get_model(model_name, generation_config)
+        timeout = timeout or self.timeout
+        estimated_tokens = await self._acquire(model_name, contents)
+        async with self._semaphore:
+            start = time.perf_counter()
+            try:
+                response = await asyncio.wait_for(
+                    model.generate_content_async(contents, stream=True),
+                    timeout=timeout
+                )
+                chunks = response.__aiter__()
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(chunks.__anext__(), timeout=timeout)
+                    except StopAsyncIteration:
+                        break
+                    try:
+                        text = chunk.text
+                    except ValueError:
+                        # Chunks that only carry a finish reason have no text parts
+                        continue
+                    if text:
+                        yield text
+                await self._settle(model_name, estimated_tokens, response)
+            except Exception as e:
+                await self.router.record_failure(model_name, e)
+                observe_model(model_name, time.perf_counter() - start, "error")
+                raise
+            finally:
+                self.router.release(model_name)
+            elapsed = time.perf_counter() - start
+            self.router.record_success(model_name, elapsed)
+            observe_model(model_name, elapsed, "ok")
+
+
+_default_client: Optional[LLMClient] = None
+
+def get_llm_client() -> LLMClient:
+    """Returns the process-wide client, creating it on first use."""
+    global _default_client
+    if _default_client is None:
+        _default_client = LLMClient()
+    return _default_client
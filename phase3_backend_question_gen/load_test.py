@@ -0,0 +1,109 @@
+"""
+Load test for /generate_questions and /evaluate_answer against the fake Gemini backend.
+
+Each level fires `--requests` calls with a fixed number of concurrent clients. Because the
+endpoints are async, throughput should grow with concurrency (roughly concurrency / latency)
+even with the threadpool squeezed down to `--threads` workers.
+
+Usage:
+    python load_test.py --latency 0.2 --threads 4 --levels 1 8 32 128
+
+Requires httpx (pip install httpx).
+"""
+import os
+import io
+import sys
+import time
+import asyncio
+import argparse
+import contextlib
+
+import fake_gemini
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def _tag(n: int) -> str:
+    """Spells n in letters: resume compaction drops number-heavy lines as contact details."""
+    letters = ""
+    while True:
+        n, r = divmod(n, 26)
+        letters += "abcdefghijklmnopqrstuvwxyz"[r]
+        if not n:
+            return letters
+
+
+async def run_level(client, endpoint: str, concurrency: int, total: int, offset: int = 0):
+    latencies = []
+    # Payload numbers continue from the previous level, so no request repeats an earlier (cached) one
+    counter = iter(range(offset, offset + total))
+
+    async def worker():
+        for i in counter:
+            tag = _tag(i)
+            if endpoint == "/generate_questions":
+                # Every word 3-gram carries the tag, so neither the exact nor the near-duplicate cache matches
+                payload = {"resume_text": f"Engineer {tag} built {tag} services and {tag} APIs in Python", "num_questions": 5}
+            else:
+                payload = {"question": "What is a closure?", "answer": f"A function bundled with its scope, as in module {tag}."}
+            start = time.perf_counter()
+            res = await client.post(endpoint, json=payload)
+            res.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - start
+    return {
+        "rps": total / wall,
+        "p50_ms": _percentile(latencies, 50) * 1000,
+        "p95_ms": _percentile(latencies, 95) * 1000,
+    }
+
+
+async def main(args):
+    import anyio
+    import httpx
+
+    # Squeeze the threadpool: async endpoints should not care
+    anyio.to_thread.current_default_thread_limiter().total_tokens = args.threads
+
+    import main as app_module
+
+    transport = httpx.ASGITransport(app=app_module.app)
+    # ASGITransport does not run lifespan events, so start the app explicitly
+    async with app_module.app.router.lifespan_context(app_module.app), httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=60) as client:
+        print(f"fake latency={args.latency}s threads={args.threads} requests/level={args.requests}")
+        print(f"{'endpoint':<22}{'conc':>6}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'max in-flight':>15}")
+        for endpoint in ("/generate_questions", "/evaluate_answer"):
+            offset = 0
+            for concurrency in args.levels:
+                fake_gemini.reset_stats()
+                total = max(args.requests, concurrency)
+                with contextlib.redirect_stdout(io.StringIO()):
+                    result = await run_level(client, endpoint, concurrency, total, offset)
+                offset += total
+                print(f"{endpoint:<22}{concurrency:>6}{result['rps']:>10.1f}{result['p50_ms']:>10.0f}"
+                      f"{result['p95_ms']:>10.0f}{fake_gemini.STATS['max_in_flight']:>15}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.2, help="Fake model latency in seconds")
+    parser.add_argument("--threads", type=int, default=4, help="Threadpool size for the app")
+    parser.add_argument("--requests", type=int, default=128, help="Requests per concurrency level")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 8, 32, 128])
+    args = parser.parse_args()
+
+    os.environ.setdefault("GEMINI_API_KEY", "fake-key")
+    os.environ["CACHE_BACKEND"] = "memory"
+    os.environ.setdefault("LLM_MAX_CONCURRENCY", str(max(args.levels)))
+    # Measures the app's own concurrency, not the free-tier quota
+    os.environ.setdefault("RATE_LIMITS_ENABLED", "0")
+    fake_gemini.install(latency=args.latency)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+    asyncio.run(main(args))
@@ -2,47 +2,114 @@ from fastapi import FastAPI, UploadFile, File, HTTPException
 from pydantic import BaseModel
 import sys
 import os
-import shutil
 import hashlib
 import json
+import asyncio
+import importlib
+from contextlib import asynccontextmanager
 from typing import List
 from dotenv import load_dotenv
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse, PlainTextResponse
 from question_bank import get_fallback_questions
+from cache_store import get_cache_store
+from model_router import get_model_router
+from rate_limiter import RATE_LIMIT_FILE_TOKENS, get_rate_limiter
+from semantic_cache import NearDuplicateCache, SEMANTIC_CACHE_ENABLED
+from single_flight import get_single_flight
+from metrics import registry, span, record_question_level, render_cache_stats
+from pregeneration import Pregenerator, PREGENERATION_ENABLED
+from sessions import InterviewSessions, SessionNotFound
 
 load_dotenv()
 
-CACHE_FILE = "question_cache.json"
+question_cache = get_cache_store("questions")
+
+# Parsed resumes keyed by a hash of the uploaded bytes, so re-uploads skip parsing and Deep Scan OCR
+RESUME_CACHE_MAX_ENTRIES = int(os.getenv("RESUME_CACHE_MAX_ENTRIES", "2000"))
+resume_cache = get_cache_store("resumes", max_entries=RESUME_CACHE_MAX_ENTRIES)
+resume_cache_counters = {"deep_scans_run": 0, "deep_scans_saved": 0}
+RESUME_FIELDS = ("text", "filename", "file_type", "extraction_method", "skills", "sections", "years_of_experience")
+
+# Level 1b: near-duplicate resumes/JDs reuse questions cached for an almost identical request
+near_duplicate_cache = NearDuplicateCache() if SEMANTIC_CACHE_ENABLED else None
 
 def get_cache_key(resume_text: str, role: str, num_questions: int, difficulty: str, job_description: str, auto_select_count: bool) -> str:
     """Creates a unique hash for the request parameters."""
     content = f"{resume_text[:5000]}{role}{num_questions}{difficulty}{job_description}{auto_select_count}"
     return hashlib.md5(content.encode()).hexdigest()
 
-def read_cache() -> dict:
-    if os.path.exists(CACHE_FILE):
-        try:
-            with open(CACHE_FILE, 'r') as f:
-                return json.load(f)
-        except:
-            return {}
-    return {}
-
-def write_cache(cache: dict):
-    with open(CACHE_FILE, 'w') as f:
-        json.dump(cache, f, indent=2)
-
 # Add Phase 2 to path to import parser
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'phase2_resume_extraction')))
 try:
-    from resume_parser import parse_resume
+    import resume_parser
+    from resume_parser import close_pdf_pool, parse_resume
+    from bulk_ingest import close_bulk_pool, get_bulk_pool, ingest
+    # Parsing stages show up in /metrics, and Deep Scan shares the Gemini quota with generation
+    resume_parser.configure(span, get_rate_limiter(), RATE_LIMIT_FILE_TOKENS)
 except ImportError as e:
     print(f"CRITICAL WARNING: Could not import resume_parser: {e}")
     # Define a dummy function to prevent NameError, but raise HTTP 500 when called
-    def parse_resume(f):
+    def parse_resume(source, filename=None):
         raise ImportError(f"Resume parser not loaded properly. Check server logs. Error: {e}")
 
-app = FastAPI(title="AI Mock Interview API")
+    def ingest(items, pool=None):
+        return parse_resume(items)
+
+    def close_pdf_pool():
+        pass
+    get_bulk_pool = close_bulk_pool = close_pdf_pool
+
+# Phase 4 evaluator, imported once with the rest of the app
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'phase4_answer_evaluation')))
+from evaluator import AnswerEvaluator, evaluation_cache
+from code_runner import CODE_RUNNER_ENABLED, close_sandbox_pool, get_sandbox_pool
+
+from question_generator import QuestionGenerator
+
+# Built once per process by the lifespan handler below
+question_generator = None
+answer_evaluator = None
+pregenerator = None
+
+# Heavy SDKs are imported lazily by the modules that use them. After startup they are loaded on a
+# background thread, so readiness is not delayed and the first real request does not pay for them.
+WARM_IMPORTS = os.getenv("WARM_IMPORTS", "1") == "1"
+WARM_IMPORT_MODULES = ("google.generativeai", "pypdf", "docx", "numpy")
+
+def warm_imports():
+    for module in WARM_IMPORT_MODULES:
+        try:
+            importlib.import_module(module)
+        except ImportError as e:
+            print(f"Warm-up import of {module} failed: {e}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global question_generator, answer_evaluator, pregenerator
+    try:
+        question_generator = QuestionGenerator()
+    except Exception as e:
+        print(f"Warning: Failed to initialize QuestionGenerator: {e}")
+        question_generator = None
+    answer_evaluator = AnswerEvaluator(llm_client=question_generator.llm if question_generator else None)
+    # Background warm-up of the question cache (speculative Level 2 calls, capped per resume)
+    pregenerator = Pregenerator(is_pregenerated, pregenerate_questions) if question_generator and PREGENERATION_ENABLED else None
+    if WARM_IMPORTS:
+        asyncio.get_running_loop().run_in_executor(None, warm_imports)
+    # Idle sandbox workers for coding answers, started off the startup path
+    if CODE_RUNNER_ENABLED:
+        # Building the pool probes network isolation with subprocesses, so that runs in the executor too
+        asyncio.get_running_loop().run_in_executor(None, lambda: get_sandbox_pool().warm())
+    yield
+    # The bulk upload pool is created by the first /upload_resumes request
+    close_bulk_pool()
+    close_pdf_pool()
+    if CODE_RUNNER_ENABLED:
+        close_sandbox_pool()
+
+app = FastAPI(title="AI Mock Interview API", lifespan=lifespan)
 
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -63,8 +130,6 @@ class QuestionRequest(BaseModel):
     num_questions: int = 5  # 1-20
     auto_select_count: bool = False
 
-from question_generator import QuestionGenerator
-
 class QuestionModel(BaseModel):
     id: int
     text: str
@@ -76,12 +141,22 @@ class QuestionModel(BaseModel):
 class QuestionResponse(BaseModel):
     questions: List[QuestionModel]
 
-# Initialize generator globally
-try:
-    question_generator = QuestionGenerator()
-except Exception as e:
-    print(f"Warning: Failed to initialize QuestionGenerator: {e}")
-    question_generator = None
+class PregenerateRequest(BaseModel):
+    resume_text: str
+    job_description: str = ""
+
+class AnswerItem(BaseModel):
+    question: str
+    answer: str = ""
+
+class InterviewEvaluationRequest(BaseModel):
+    items: List[AnswerItem]
+
+class CreateSessionRequest(BaseModel):
+    questions: List[QuestionModel]
+
+class SessionAnswer(BaseModel):
+    answer: str = ""
 
 @app.api_route("/", methods=["GET", "HEAD", "OPTIONS"])
 def read_root():
@@ -91,15 +166,70 @@ def read_root():
 def options_handler(path: str):
     return {}
 
+@app.get("/cache_stats")
+def cache_stats():
+    return {
+        "questions": question_cache.stats(),
+        "resumes": {**resume_cache.stats(), **resume_cache_counters},
+        "near_duplicates": near_duplicate_cache.stats() if near_duplicate_cache else None,
+        "evaluations": evaluation_cache.stats(),
+        "single_flight": get_single_flight().stats(),
+        "pregeneration": pregenerator.stats() if pregenerator else None,
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Stage timings, per-model latency histograms, fallback levels and cache counters in Prometheus text format."""
+    caches = {
+        "questions": question_cache.stats(),
+        "resumes": resume_cache.stats(),
+        "near_duplicates": near_duplicate_cache.stats() if near_duplicate_cache else None,
+        "evaluations": evaluation_cache.stats(),
+    }
+    return registry.render() + render_cache_stats(caches)
+
+@app.get("/metrics/models")
+def model_metrics():
+    """Per-model latency, error rate and circuit-breaker state from the shared router."""
+    return get_model_router().snapshot()
+
+@app.get("/metrics/quota")
+def quota_metrics():
+    """Remaining client-side RPM/TPM quota, queued calls and rejections per model."""
+    return get_rate_limiter().snapshot()
+
 @app.post("/upload_resume")
 async def upload_resume(file: UploadFile = File(...)):
-    temp_file = f"temp_{file.filename}"
     try:
-        with open(temp_file, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        # Parse the resume
-        data = parse_resume(temp_file)
+        contents = await file.read()
+        ext = os.path.splitext(file.filename)[1].lower()
+        resume_key = hashlib.sha256(contents).hexdigest() + ext
+
+        with span("resume_cache_lookup"):
+            cached = await resume_cache.aget(resume_key)
+        if cached is not None:
+            print(f"Resume cache hit ({resume_key[:12]}), skipping parsing")
+            if cached.get("extraction_method") == "ai_deep_scan":
+                resume_cache_counters["deep_scans_saved"] += 1
+            if pregenerator:
+                pregenerator.schedule(cached["text"])
+            return {
+                "filename": file.filename,
+                "extracted_text": cached["text"],
+                # Entries cached before structured extraction existed have no skills
+                "skills": cached.get("skills", []),
+                "years_of_experience": cached.get("years_of_experience"),
+                "message": "Resume processed successfully"
+            }
+
+        # Parse the resume in memory (CPU bound, so keep it off the event loop)
+        data = await run_in_threadpool(parse_resume, contents, file.filename)
+        if data.extraction_method == "ai_deep_scan":
+            resume_cache_counters["deep_scans_run"] += 1
+        await resume_cache.aset(resume_key, data.model_dump())
+        if pregenerator:
+            # Start on the likely question settings while the user is still configuring the interview
+            pregenerator.schedule(data.text)
         
         # Logging for accuracy audit
         print(f"\n--- EXTRACTED RESUME TEXT (FIRST 300 CHARS) ---\n{data.text[:300]}\n---------------------------------------------\n")
@@ -107,6 +237,8 @@ async def upload_resume(file: UploadFile = File(...)):
         return {
             "filename": file.filename,
             "extracted_text": data.text,
+            "skills": data.skills,
+            "years_of_experience": data.years_of_experience,
             "message": "Resume processed successfully"
         }
     except Exception as e:
@@ -114,12 +246,41 @@ async def upload_resume(file: UploadFile = File(...)):
         traceback.print_exc()
         print(f"Error during file processing: {e}", flush=True)
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        if os.path.exists(temp_file):
-            os.remove(temp_file)
 
-@app.post("/generate_questions", response_model=QuestionResponse)
-def generate_questions(request: QuestionRequest):
+@app.post("/upload_resumes")
+async def upload_resumes(files: List[UploadFile] = File(...)):
+    """
+    Bulk upload: streams one JSON line per file (ResumeData fields plus status, error, seconds
+    and the file's index in the upload) as each one finishes. Files already in the resume cache are returned first;
+    the rest are parsed on a process pool, with scans going through a bounded Deep Scan queue.
+    """
+    cached_records, misses, miss_keys = [], [], []
+    for index, file in enumerate(files):
+        contents = await file.read()
+        resume_key = hashlib.sha256(contents).hexdigest() + os.path.splitext(file.filename)[1].lower()
+        cached = await resume_cache.aget(resume_key)
+        if cached is not None:
+            cached_records.append({**cached, "filename": os.path.basename(file.filename), "status": "ok", "error": "", "seconds": 0.0, "index": index})
+        else:
+            misses.append((file.filename, contents))
+            miss_keys.append((index, resume_key))
+
+    def records():
+        # A sync generator, so Starlette runs it on the threadpool instead of the event loop
+        for record in cached_records:
+            yield json.dumps(record) + "\n"
+        for record in ingest(misses, pool=get_bulk_pool()):
+            # ingest() numbers the misses; report positions in the uploaded list
+            record["index"], resume_key = miss_keys[record["index"]]
+            if record["status"] == "ok":
+                if record["extraction_method"] == "ai_deep_scan":
+                    resume_cache_counters["deep_scans_run"] += 1
+                resume_cache.set(resume_key, {k: record[k] for k in RESUME_FIELDS})
+            yield json.dumps(record) + "\n"
+
+    return StreamingResponse(records(), media_type="application/x-ndjson")
+
+def validate_question_request(request: QuestionRequest):
     if not question_generator:
          raise HTTPException(status_code=500, detail="QuestionGenerator not initialized")
 
@@ -132,9 +293,8 @@ def generate_questions(request: QuestionRequest):
     if request.difficulty not in valid_difficulties:
         raise HTTPException(status_code=400, detail=f"difficulty must be one of: {valid_difficulties}")
 
-    # Level 1: Cache Check
-    cache = read_cache()
-    key = get_cache_key(
+def question_cache_key(request: QuestionRequest) -> str:
+    return get_cache_key(
         request.resume_text, 
         "Software Engineer", 
         request.num_questions, 
@@ -142,14 +302,49 @@ def generate_questions(request: QuestionRequest):
         request.job_description,
         request.auto_select_count
     )
-    
-    if key in cache:
+
+def similarity_bucket(request: QuestionRequest) -> str:
+    # Near-duplicate matches only count when the question settings are identical
+    return f"{request.difficulty}|{request.num_questions}|{request.auto_select_count}"
+
+def get_cached_questions(request: QuestionRequest, key: str):
+    """Level 1 lookup: exact cache key first, then the near-duplicate tier."""
+    with span("question_cache_lookup"):
+        cached = question_cache.get(key)
+    if cached is not None:
         print(f"Level 1: Serving questions from cache ({key})")
-        return QuestionResponse(questions=cache[key])
+        record_question_level("1")
+        return cached
+
+    if near_duplicate_cache:
+        with span("near_duplicate_lookup"):
+            similar_key = near_duplicate_cache.lookup(request.resume_text, request.job_description, similarity_bucket(request))
+            cached = question_cache.get(similar_key) if similar_key else None
+        if cached is not None:
+            print(f"Level 1b: Serving questions cached for a near-duplicate request ({similar_key})")
+            record_question_level("1b")
+            return cached
+    return None
+
+def store_cached_questions(request: QuestionRequest, key: str, questions: list):
+    question_cache.set(key, questions)
+    if near_duplicate_cache:
+        near_duplicate_cache.add(key, request.resume_text, request.job_description, similarity_bucket(request))
+
+@app.post("/generate_questions", response_model=QuestionResponse)
+async def generate_questions(request: QuestionRequest):
+    validate_question_request(request)
+
+    # Level 1: Cache Check
+    key = question_cache_key(request)
+    
+    cached = await run_in_threadpool(get_cached_questions, request, key)
+    if cached is not None:
+        return QuestionResponse(questions=cached)
 
     try:
         # Level 2: AI Generation
-        questions_data = question_generator.generate_questions(
+        questions_data = await question_generator.generate_questions(
             resume_text=request.resume_text, 
             role="Software Engineer",
             num_questions=request.num_questions,
@@ -159,8 +354,8 @@ def generate_questions(request: QuestionRequest):
         )
         
         # Save to cache on success
-        cache[key] = questions_data
-        write_cache(cache)
+        await run_in_threadpool(store_cached_questions, request, key, questions_data)
+        record_question_level("2")
         
         return QuestionResponse(questions=questions_data)
         
@@ -170,13 +365,103 @@ def generate_questions(request: QuestionRequest):
         
         # Level 3: Static Fallback for Quota or other AI errors
         print("Level 3: Falling back to Static Question Bank")
-        questions_data = get_fallback_questions(request.resume_text, request.num_questions)
+        with span("question_bank_fallback"):
+            questions_data = get_fallback_questions(request.resume_text, request.num_questions, request.difficulty)
+        record_question_level("3")
         
         # Return static questions if AI failed
         return QuestionResponse(questions=questions_data)
 
+async def is_pregenerated(resume_text: str, job_description: str, difficulty: str, num_questions: int) -> bool:
+    request = QuestionRequest(resume_text=resume_text, job_description=job_description, difficulty=difficulty, num_questions=num_questions)
+    return await question_cache.acontains(question_cache_key(request))
+
+async def pregenerate_questions(resume_text: str, job_description: str, difficulty: str, num_questions: int):
+    request = QuestionRequest(resume_text=resume_text, job_description=job_description, difficulty=difficulty, num_questions=num_questions)
+    questions_data = await question_generator.generate_questions(
+        resume_text=request.resume_text,
+        role="Software Engineer",
+        num_questions=request.num_questions,
+        difficulty=request.difficulty,
+        job_description=request.job_description,
+        auto_select_count=request.auto_select_count
+    )
+    await run_in_threadpool(store_cached_questions, request, question_cache_key(request), questions_data)
+
+@app.post("/pregenerate")
+async def pregenerate(request: PregenerateRequest):
+    """
+    Warms the question cache for a resume/JD pair, e.g. once the user has entered a job description.
+    Returns immediately; generation runs in the background.
+    """
+    if not pregenerator:
+        return {"scheduled": 0}
+    return {"scheduled": pregenerator.schedule(request.resume_text, request.job_description)}
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/generate_questions/stream")
+async def generate_questions_stream(request: QuestionRequest):
+    """
+    Server-sent events version of /generate_questions. Emits one `question` event per question
+    as soon as it is generated, then a `done` event with the source (cache, ai or fallback).
+    """
+    validate_question_request(request)
+    key = question_cache_key(request)
+
+    async def events():
+        # Level 1: Cache Check
+        cached = await run_in_threadpool(get_cached_questions, request, key)
+        if cached is not None:
+            for question in cached:
+                yield sse_event("question", question)
+            yield sse_event("done", {"count": len(cached), "source": "cache"})
+            return
+
+        streamed = []
+        try:
+            # Level 2: AI Generation, one question at a time
+            async for question in question_generator.stream_questions(
+                resume_text=request.resume_text,
+                role="Software Engineer",
+                num_questions=request.num_questions,
+                difficulty=request.difficulty,
+                job_description=request.job_description,
+                auto_select_count=request.auto_select_count
+            ):
+                try:
+                    question = QuestionModel(**question).model_dump()
+                except Exception as e:
+                    print(f"Skipping malformed streamed question: {e}")
+                    continue
+                streamed.append(question)
+                yield sse_event("question", question)
+
+            if streamed:
+                # Same cache entry the non-streaming path would have written
+                await run_in_threadpool(store_cached_questions, request, key, streamed)
+                record_question_level("2")
+                yield sse_event("done", {"count": len(streamed), "source": "ai"})
+                return
+        except Exception as e:
+            print(f"Error in API generation: {e}")
+
+        # Level 3: Static Fallback, topping up whatever the AI already sent
+        print("Level 3: Falling back to Static Question Bank")
+        sent_texts = {q["text"] for q in streamed}
+        remaining = max(request.num_questions - len(streamed), 0)
+        with span("question_bank_fallback"):
+            fallback = [q for q in get_fallback_questions(request.resume_text, request.num_questions, request.difficulty) if q["text"] not in sent_texts]
+        record_question_level("3")
+        for question in fallback[:remaining]:
+            yield sse_event("question", question)
+        yield sse_event("done", {"count": len(streamed) + len(fallback[:remaining]), "source": "fallback"})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @app.post("/evaluate_answer")
-def evaluate_answer(data: dict):
+async def evaluate_answer(data: dict):
     question = data.get("question")
     answer = data.get("answer")
     
@@ -184,25 +469,94 @@ def evaluate_answer(data: dict):
         raise HTTPException(status_code=400, detail="Missing question or answer")
         
     try:
-        # Import dynamically to ensure path is ready or use the sys.path hack
-        sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'phase4_answer_evaluation')))
-        from evaluator import AnswerEvaluator
-        
-        evaluator = AnswerEvaluator()
-        result = evaluator.evaluate(question, answer)
+        result = await answer_evaluator.evaluate(question, answer)
         
         return {
             "score": result.score,
             "feedback": result.feedback,
             "missing_keywords": result.missing_keywords,
             "improvements": result.improvements,
-            "ideal_answer": result.ideal_answer
+            "ideal_answer": result.ideal_answer,
+            "tests_passed": result.tests_passed,
+            "tests_total": result.tests_total,
+            "runtime_ms": result.runtime_ms
         }
     except Exception as e:
         print(f"Evaluation Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/evaluate_interview")
+async def evaluate_interview(request: InterviewEvaluationRequest):
+    if not request.items:
+        raise HTTPException(status_code=400, detail="No answers to evaluate")
+
+    try:
+        results = await answer_evaluator.evaluate_batch([(item.question, item.answer) for item in request.items])
+
+        return {"results": [result.model_dump() for result in results]}
+    except Exception as e:
+        print(f"Evaluation Error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def evaluate_session_answer(question: dict, answer: str) -> dict:
+    result = await answer_evaluator.evaluate(question["text"], answer)
+    return result.model_dump()
+
+interview_sessions = InterviewSessions(evaluate_session_answer)
+
+def get_session_or_404(session_id: str) -> dict:
+    try:
+        return interview_sessions.status(session_id)
+    except SessionNotFound:
+        raise HTTPException(status_code=404, detail="Interview session not found or expired")
+
+@app.post("/sessions")
+def create_session(request: CreateSessionRequest):
+    """Starts an interview session for a generated question list."""
+    if not request.questions:
+        raise HTTPException(status_code=400, detail="A session needs at least one question")
+    session_id = interview_sessions.create([q.model_dump() for q in request.questions])
+    return {"session_id": session_id, "num_questions": len(request.questions)}
+
+@app.get("/sessions/{session_id}")
+def get_session(session_id: str):
+    return get_session_or_404(session_id)
+
+@app.put("/sessions/{session_id}/answers/{index}")
+async def submit_session_answer(session_id: str, index: int, request: SessionAnswer):
+    """Stores one answer and grades it in the background while the candidate moves on."""
+    try:
+        await interview_sessions.submit_answer(session_id, index, request.answer)
+    except SessionNotFound:
+        raise HTTPException(status_code=404, detail="Interview session not found or expired")
+    except IndexError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"session_id": session_id, "index": index, "status": "evaluating"}
+
+@app.get("/sessions/{session_id}/report")
+async def session_report(session_id: str):
+    """Evaluations for every question, in order; waits only for grading still in flight."""
+    try:
+        results = await interview_sessions.report(session_id)
+    except SessionNotFound:
+        raise HTTPException(status_code=404, detail="Interview session not found or expired")
+    scores = [r["score"] for r in results]
+    return {
+        "session_id": session_id,
+        "results": results,
+        "average_score": round(sum(scores) / len(scores), 2) if scores else 0,
+    }
+
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    from cache_store import CACHE_BACKEND
+    # Workers share caches, sessions, circuit breakers and quota through the SQLite store (CACHE_DB)
+    API_WORKERS = int(os.getenv("API_WORKERS", "1"))
+    if API_WORKERS > 1 and CACHE_BACKEND == "memory":
+        print("WARNING: CACHE_BACKEND=memory gives every worker its own cache, sessions and quota")
+    if API_WORKERS > 1:
+        # Multi-process mode needs an import string so every worker can load the app itself
+        uvicorn.run("main:app", host="0.0.0.0", port=8000, workers=API_WORKERS)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8000)
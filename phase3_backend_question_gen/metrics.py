@@ -0,0 +1,173 @@
+import os
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# In-process performance metrics shared by all phases, exposed by main.py as Prometheus text at /metrics.
+# Recording a sample is a perf_counter() call, a bisect over the bucket bounds and a locked increment,
+# so spans can wrap hot paths such as cache lookups. METRICS_ENABLED=0 turns every span into a no-op.
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+METRICS_PREFIX = "mock_interview"
+
+# Seconds; spans range from sub-millisecond cache lookups to multi-second Gemini calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (+Inf last), sum]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = [(labels, list(series[0]), series[1]) for labels, series in sorted(self._series.items())]
+        for labels, counts, total in snapshot:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{float(bound)!r}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics: Dict[str, object] = {}
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(f"{METRICS_PREFIX}_{name}", documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(f"{METRICS_PREFIX}_{name}", documentation, labelnames, buckets))
+
+    def _register(self, metric):
+        # Modules imported twice under different paths must not register duplicates
+        return self.metrics.setdefault(metric.name, metric)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+STAGE_SECONDS = registry.histogram(
+    "stage_duration_seconds", "Time spent in each pipeline stage.", ("stage", "outcome")
+)
+MODEL_SECONDS = registry.histogram(
+    "model_request_duration_seconds", "Latency of individual Gemini calls by model.", ("model", "outcome")
+)
+QUESTION_SOURCE = registry.counter(
+    "question_requests_total",
+    "Question requests by fallback level: 1 exact cache, 1b near-duplicate cache, 2 AI, 3 static bank.",
+    ("level",)
+)
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """Times the enclosed block into stage_duration_seconds; outcome is "error" if it raises."""
+    if not METRICS_ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage, outcome)
+
+
+def observe_model(model_name: str, seconds: float, outcome: str) -> None:
+    if METRICS_ENABLED:
+        MODEL_SECONDS.observe(seconds, model_name, outcome)
+
+
+def record_question_level(level: str) -> None:
+    if METRICS_ENABLED:
+        QUESTION_SOURCE.inc(level)
+
+
+def render_cache_stats(caches: Dict[str, Optional[dict]]) -> str:
+    """Prometheus text for CacheStore.stats() dicts, keyed by cache name. None entries are skipped."""
+    series = {
+        "hits": ("counter", "Cache lookups that found a live entry."),
+        "misses": ("counter", "Cache lookups that found nothing."),
+        "writes": ("counter", "Cache writes."),
+        "evictions": ("counter", "Entries removed for size or age."),
+        "entries": ("gauge", "Entries currently stored."),
+        "hit_ratio": ("gauge", "hits / (hits + misses) since startup."),
+    }
+    lines = []
+    for field, (kind, documentation) in series.items():
+        name = f"{METRICS_PREFIX}_cache_{field}" + ("_total" if kind == "counter" else "")
+        lines += [f"# HELP {name} {documentation}", f"# TYPE {name} {kind}"]
+        for cache_name, stats in caches.items():
+            if stats is not None and field in stats:
+                lines.append(f'{name}{{cache="{_escape(cache_name)}"}} {_format_value(stats[field])}')
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,196 @@
+import os
+import time
+import asyncio
+import threading
+from typing import Any, Dict, List, Optional
+from cache_store import CacheStore, get_cache_store
+
+# Shared model router: caches GenerativeModel instances, tracks per-model latency and errors,
+# and trips a circuit breaker so requests stop paying for calls to a model that is out of quota or down.
+# Opened circuits are published to the shared cache store, so with several workers one 429 benches
+# the model everywhere instead of every worker discovering it separately.
+
+ROUTER_QUOTA_COOLDOWN_SECONDS = float(os.getenv("ROUTER_QUOTA_COOLDOWN_SECONDS", "60"))
+ROUTER_ERROR_COOLDOWN_SECONDS = float(os.getenv("ROUTER_ERROR_COOLDOWN_SECONDS", "15"))
+ROUTER_FAILURE_THRESHOLD = int(os.getenv("ROUTER_FAILURE_THRESHOLD", "3"))  # consecutive 5xx/timeouts before opening
+ROUTER_EWMA_ALPHA = 0.2
+ROUTER_PROBE_TIMEOUT_SECONDS = 60  # a half-open probe slot that nobody used is handed out again after this
+ROUTER_SYNC_SECONDS = float(os.getenv("ROUTER_SYNC_SECONDS", "1"))  # how often circuits opened by other workers are read
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+def classify_error(error: Exception) -> str:
+    """Returns "quota", "server" or "other" for a failed Gemini call."""
+    code = getattr(error, "code", None)
+    code = code if isinstance(code, int) else None
+    message = str(error).lower()
+    if code == 429 or "quota" in message or "resource exhausted" in message or "429" in message:
+        return "quota"
+    if (code is not None and code >= 500) or isinstance(error, (TimeoutError, asyncio.TimeoutError)) or "503" in message or "500" in message:
+        return "server"
+    return "other"
+
+
+class ModelHealth:
+    def __init__(self, name: str):
+        self.name = name
+        self.state = CLOSED
+        self.calls = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.latency_ewma: Optional[float] = None
+        self.error_rate = 0.0
+        self.open_until = 0.0
+        self.last_error = ""
+        self.probe_started = 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "calls": self.calls,
+            "failures": self.failures,
+            "error_rate": round(self.error_rate, 4),
+            "latency_ewma_ms": round(self.latency_ewma * 1000, 1) if self.latency_ewma is not None else None,
+            "open_for_seconds": round(max(self.open_until - time.time(), 0), 1),
+            "last_error": self.last_error,
+        }
+
+
+class ModelRouter:
+    def __init__(self, failure_threshold: int = ROUTER_FAILURE_THRESHOLD,
+                 quota_cooldown: float = ROUTER_QUOTA_COOLDOWN_SECONDS,
+                 error_cooldown: float = ROUTER_ERROR_COOLDOWN_SECONDS,
+                 shared: Optional[CacheStore] = None):
+        self.failure_threshold = failure_threshold
+        self.quota_cooldown = quota_cooldown
+        self.error_cooldown = error_cooldown
+        # model name -> {"open_until", "error"} for circuits opened by any worker
+        self.shared = shared or get_cache_store("circuits", ttl_seconds=int(max(quota_cooldown, error_cooldown)) + 1)
+        self._synced_at = 0.0
+        self._health: Dict[str, ModelHealth] = {}
+        self._models: Dict[tuple, Any] = {}
+        self._lock = threading.Lock()
+
+    def _get_health(self, model_name: str) -> ModelHealth:
+        health = self._health.get(model_name)
+        if health is None:
+            health = self._health[model_name] = ModelHealth(model_name)
+        return health
+
+    def get_model(self, model_name: str, generation_config: Optional[dict] = None):
+        """Returns a cached GenerativeModel for this name/config pair."""
+        key = (model_name, repr(sorted((generation_config or {}).items())))
+        model = self._models.get(key)
+        if model is None:
+            import google.generativeai as genai  # deferred: the SDK takes ~0.4s to import
+            model = self._models[key] = genai.GenerativeModel(model_name, generation_config=generation_config)
+        return model
+
+    async def order(self, candidates: List[str]) -> List[str]:
+        """
+        Returns the candidates worth trying, best first. A model whose cooldown has elapsed gets a
+        single half-open probe; otherwise healthy models are ranked by observed latency, with
+        `candidates` order breaking ties and ranking models that have no samples yet.
+        Models with an open circuit are left out, so the list can be empty.
+        """
+        now = time.time()
+        await self._sync(candidates, now)
+        probes, healthy = [], []
+        with self._lock:
+            for preference, name in enumerate(candidates):
+                health = self._get_health(name)
+                if health.state == OPEN and now >= health.open_until:
+                    health.state = HALF_OPEN
+                if health.state == HALF_OPEN:
+                    if now - health.probe_started > ROUTER_PROBE_TIMEOUT_SECONDS:
+                        health.probe_started = now
+                        probes.append(name)
+                elif health.state == CLOSED:
+                    latency = health.latency_ewma if health.latency_ewma is not None else float("inf")
+                    healthy.append((latency, preference, name))
+        return probes + [name for _, _, name in sorted(healthy)]
+
+    async def _sync(self, candidates: List[str], now: float):
+        """Adopts circuits that other workers opened since the last sync."""
+        if now - self._synced_at < ROUTER_SYNC_SECONDS:
+            return
+        self._synced_at = now
+        entries = await asyncio.gather(*(self.shared.aget(name) for name in candidates))
+        opened = dict(zip(candidates, entries))
+        with self._lock:
+            for name, entry in opened.items():
+                if entry is None or entry["open_until"] <= now:
+                    continue
+                health = self._get_health(name)
+                if health.open_until < entry["open_until"]:
+                    health.state = OPEN
+                    health.open_until = entry["open_until"]
+                    health.last_error = entry["error"]
+
+    def record_success(self, model_name: str, latency: float):
+        with self._lock:
+            health = self._get_health(model_name)
+            health.calls += 1
+            health.consecutive_failures = 0
+            health.error_rate = (1 - ROUTER_EWMA_ALPHA) * health.error_rate
+            if health.latency_ewma is None:
+                health.latency_ewma = latency
+            else:
+                health.latency_ewma = (1 - ROUTER_EWMA_ALPHA) * health.latency_ewma + ROUTER_EWMA_ALPHA * latency
+            if health.state != CLOSED:
+                print(f"Router: {model_name} recovered, closing circuit")
+            health.state = CLOSED
+            health.probe_started = 0.0
+
+    async def record_failure(self, model_name: str, error: Exception):
+        kind = classify_error(error)
+        with self._lock:
+            health = self._get_health(model_name)
+            health.calls += 1
+            health.failures += 1
+            health.consecutive_failures += 1
+            health.error_rate = (1 - ROUTER_EWMA_ALPHA) * health.error_rate + ROUTER_EWMA_ALPHA
+            health.last_error = f"{kind}: {str(error)[:200]}"
+            health.probe_started = 0.0
+
+            cooldown = None
+            if kind == "quota":
+                cooldown = self.quota_cooldown
+            elif kind == "server" and (health.state == HALF_OPEN or health.consecutive_failures >= self.failure_threshold):
+                cooldown = self.error_cooldown
+            elif health.state == HALF_OPEN:
+                # The probe failed for some other reason; let the next request probe again
+                health.state = OPEN
+                health.open_until = time.time()
+
+            if cooldown is not None:
+                print(f"Router: opening circuit for {model_name} for {cooldown:.0f}s ({kind} error)")
+                health.state = OPEN
+                health.open_until = time.time() + cooldown
+                opened = {"open_until": health.open_until, "error": health.last_error}
+            else:
+                opened = None
+        if opened is not None:
+            await self.shared.aset(model_name, opened)
+
+    def release(self, model_name: str):
+        """Frees a half-open probe slot when the attempt ended without a verdict (e.g. cancelled)."""
+        with self._lock:
+            self._get_health(model_name).probe_started = 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {name: health.snapshot() for name, health in self._health.items()}
+
+
+_default_router: Optional[ModelRouter] = None
+
+def get_model_router() -> ModelRouter:
+    """Returns the process-wide router shared by generation and evaluation."""
+    global _default_router
+    if _default_router is None:
+        _default_router = ModelRouter()
+    return _default_router
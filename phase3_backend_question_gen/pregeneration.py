@@ -0,0 +1,111 @@
+import os
+import asyncio
+import hashlib
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from cache_store import CacheStore, get_cache_store
+from metrics import registry
+from rate_limiter import BACKGROUND, priority_scope
+
+# Speculative question generation: as soon as a resume is parsed (and again once a job description
+# is known), the most likely /generate_questions configurations are generated in the background and
+# written to the question cache, so the user's real request is usually a Level 1 hit.
+#
+# Speculative work is capped per resume and limited to a few concurrent calls, so it cannot eat
+# the quota that interactive requests need. Its model calls are scheduled at background priority, so
+# the rate limiter holds them back while quota runs low.
+
+PREGENERATION_ENABLED = os.getenv("PREGENERATION_ENABLED", "1") == "1"
+# "difficulty:count" pairs, most likely first
+PREGENERATION_CONFIGS = os.getenv("PREGENERATION_CONFIGS", "mixed:5")
+PREGENERATION_MAX_PER_RESUME = int(os.getenv("PREGENERATION_MAX_PER_RESUME", "3"))
+PREGENERATION_MAX_CONCURRENCY = int(os.getenv("PREGENERATION_MAX_CONCURRENCY", "4"))
+PREGENERATION_BUDGET_TTL_SECONDS = 24 * 3600
+
+PREGENERATIONS = registry.counter(
+    "pregenerations_total",
+    "Speculative question generations by outcome (generated, cached, over_budget, failed).",
+    ("outcome",)
+)
+
+
+def parse_configs(spec: str) -> List[Tuple[str, int]]:
+    configs = []
+    for item in spec.split(","):
+        difficulty, _, count = item.strip().partition(":")
+        if difficulty:
+            configs.append((difficulty, int(count or 5)))
+    return configs
+
+
+class Pregenerator:
+    """
+    Schedules background generations for a resume. `is_cached(resume, jd, difficulty, count)`
+    tells whether the question cache already has that configuration; `generate(...)` produces
+    and stores it. Both are supplied by main.py, which owns the cache keys.
+    """
+
+    def __init__(self, is_cached: Callable[[str, str, str, int], Awaitable[bool]],
+                 generate: Callable[[str, str, str, int], Awaitable[None]],
+                 configs: Optional[List[Tuple[str, int]]] = None,
+                 max_per_resume: int = PREGENERATION_MAX_PER_RESUME,
+                 max_concurrency: int = PREGENERATION_MAX_CONCURRENCY,
+                 budgets: Optional[CacheStore] = None):
+        self.is_cached = is_cached
+        self.generate = generate
+        self.configs = configs if configs is not None else parse_configs(PREGENERATION_CONFIGS)
+        self.max_per_resume = max_per_resume
+        # Spent speculative calls per resume; shared between workers when the cache is SQLite
+        self.budgets = budgets or get_cache_store("pregeneration_budget", ttl_seconds=PREGENERATION_BUDGET_TTL_SECONDS)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._tasks: Set[asyncio.Task] = set()
+
+    def schedule(self, resume_text: str, job_description: str = "") -> int:
+        """Starts background generation for every configured setting. Returns how many were scheduled."""
+        if not resume_text.strip():
+            return 0
+        for difficulty, count in self.configs:
+            task = asyncio.create_task(self._pregenerate(resume_text, job_description, difficulty, count))
+            # Keep a reference until done, otherwise the task can be garbage collected mid-flight
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        return len(self.configs)
+
+    async def _take_budget(self, resume_text: str) -> bool:
+        key = hashlib.sha256(resume_text.encode()).hexdigest()
+        allowed = []
+
+        def take(spent: Optional[int]) -> int:
+            spent = spent or 0
+            allowed.append(spent < self.max_per_resume)
+            return spent + 1 if allowed[0] else spent
+
+        # Atomic, so workers uploading the same resume cannot both spend the last call
+        await self.budgets.aupdate(key, take)
+        return allowed[0]
+
+    async def _pregenerate(self, resume_text: str, job_description: str, difficulty: str, count: int):
+        try:
+            if await self.is_cached(resume_text, job_description, difficulty, count):
+                PREGENERATIONS.inc("cached")
+                return
+            if not await self._take_budget(resume_text):
+                PREGENERATIONS.inc("over_budget")
+                return
+            async with self._semaphore:
+                print(f"Pregenerating {difficulty}/{count} questions (JD: {'yes' if job_description.strip() else 'no'})")
+                with priority_scope(BACKGROUND):
+                    await self.generate(resume_text, job_description, difficulty, count)
+            PREGENERATIONS.inc("generated")
+        except Exception as e:
+            # Speculative work never falls back to the static bank; the real request still can
+            print(f"Pregeneration of {difficulty}/{count} failed: {e}")
+            PREGENERATIONS.inc("failed")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": PREGENERATION_ENABLED,
+            "configs": [f"{d}:{c}" for d, c in self.configs],
+            "max_per_resume": self.max_per_resume,
+            "in_flight": len(self._tasks),
+            **{outcome: int(PREGENERATIONS.value(outcome)) for outcome in ("generated", "cached", "over_budget", "failed")},
+        }
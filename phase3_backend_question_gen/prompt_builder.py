@@ -0,0 +1,145 @@
+import os
+import re
+import sys
+from typing import Dict, List, Tuple
+
+# Section headers and skills come from Phase 2's structured extraction
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'phase2_resume_extraction')))
+from resume_structure import extract_structure, section_header
+
+# Prompt compaction for question generation: normalizes and de-duplicates resume/JD text, drops
+# sections that never lead to good questions (references, postal addresses, contact lines), and
+# trims what is left to a token budget so long resumes stop inflating latency and cost.
+
+PROMPT_RESUME_TOKEN_BUDGET = int(os.getenv("PROMPT_RESUME_TOKEN_BUDGET", "3000"))
+PROMPT_JD_TOKEN_BUDGET = int(os.getenv("PROMPT_JD_TOKEN_BUDGET", "600"))
+
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+
+# Sections dropped whole, up to the next recognizable header
+BOILERPLATE_SECTIONS = {"references", "declaration", "personal", "interests"}
+_EMAIL = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)*\.[A-Za-z]{2,}")
+# Optional country and area code, then digit groups joined by single separators ("555-123-4567",
+# "+91 98765 43210"), or an unbroken +country or 10-digit number. Never part of a longer number
+# ("1718000000.123"); date ranges like "2019.06 - 2021.08" split into short matches.
+_PHONE = re.compile(
+    r"(?<!\w)(?<!\d[.-])(?:(?:\+\d{1,3}[\s.-]?)?(?:\(\d{2,4}\)[\s.-]?)?\d{2,5}(?:[\s.-]\d{2,5}){1,4}|\+\d{10,13}|\d{10})"
+    r"(?!\w|[.-]\d)"
+)
+# Digit groups of a date: a year or a month ("06 2019", "2019.06", "12.2020")
+_DATE_PART = re.compile(r"(19|20)\d\d|0?[1-9]|1[0-2]")
+_STREET = re.compile(
+    r"\b\d{1,5}\s+(\w+\s){0,3}(street|st|avenue|ave|road|rd|lane|ln|boulevard|blvd|drive|dr|court|ct|way|nagar|colony)\b\.?",
+    re.IGNORECASE
+)
+_POSTAL = re.compile(r"\b(\d{5}(-\d{4})?|\d{6}|[A-Z]{1,2}\d[A-Z\d]?\s*\d[A-Z]{2})\b")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Local token estimate: one token per punctuation mark and per short word, plus one per
+    extra 6 characters of long words. Close enough to Gemini's tokenizer for budgeting.
+    """
+    return sum(1 + (len(t) - 1) // 6 for t in _TOKEN.findall(text))
+
+
+def normalize_lines(text: str) -> List[str]:
+    """Collapses runs of whitespace, drops blank lines and repeated lines (page headers/footers)."""
+    seen = set()
+    lines = []
+    for raw in text.splitlines():
+        line = " ".join(raw.split())
+        key = line.lower()
+        if not line or key in seen:
+            continue
+        seen.add(key)
+        lines.append(line)
+    return lines
+
+
+def is_phone_number(text: str) -> bool:
+    """At least 7 digits, and not just years and months."""
+    groups = re.findall(r"\d+", text)
+    return sum(len(g) for g in groups) >= 7 and not all(_DATE_PART.fullmatch(g) for g in groups)
+
+
+def _drop_phone(match: re.Match) -> str:
+    return "" if is_phone_number(match.group(0)) else match.group(0)
+
+
+def _is_contact_line(line: str) -> bool:
+    if len(line) > 120:
+        return False
+    stripped = _PHONE.sub(_drop_phone, _EMAIL.sub("", line))
+    if stripped != line and len(stripped.strip(" |,-:")) < 25:
+        return True
+    return bool(_STREET.search(line) and _POSTAL.search(line))
+
+
+def strip_boilerplate(lines: List[str]) -> List[str]:
+    kept = []
+    skipping = False
+    for line in lines:
+        header = section_header(line)
+        if header is not None:
+            skipping = header[0] in BOILERPLATE_SECTIONS
+        if skipping or _is_contact_line(line):
+            continue
+        kept.append(line)
+    return kept
+
+
+def fit_to_budget(lines: List[str], max_tokens: int) -> List[str]:
+    """Keeps whole lines from the top (summary, skills, recent roles come first) until the budget is spent."""
+    kept, used = [], 0
+    for line in lines:
+        cost = estimate_tokens(line) + 1
+        if used + cost > max_tokens:
+            break
+        kept.append(line)
+        used += cost
+    return kept
+
+
+def compact_text(text: str, max_tokens: int, strip_sections: bool = True) -> Tuple[str, Dict[str, int]]:
+    lines = normalize_lines(text)
+    if strip_sections:
+        lines = strip_boilerplate(lines)
+    kept = fit_to_budget(lines, max_tokens)
+    if strip_sections and len(kept) < len(lines):
+        # Skills listed only in the lines cut by the budget still reach the model
+        skills = extract_structure(text).skills
+        detected = "Skills (detected): " + ", ".join(skills)
+        if skills and estimate_tokens(detected) <= max_tokens // 4:
+            kept = [detected] + fit_to_budget(lines, max_tokens - estimate_tokens(detected) - 1)
+    compacted = "\n".join(kept)
+    return compacted, {"tokens_in": estimate_tokens(text), "tokens_out": estimate_tokens(compacted)}
+
+
+def compact_instructions(prompt: str) -> str:
+    """Drops the source-code indentation and blank lines that f-string prompts carry into every call."""
+    return "\n".join(line.strip() for line in prompt.splitlines() if line.strip())
+
+
+if __name__ == "__main__":
+    # Job history lines with dates must survive; contact lines must not
+    kept = [
+        "Software Engineer 2019.06 - 2021.08",
+        "Intern | 06.2020 - 12.2020",
+        "Acme Corp 01 2019 - 12 2021",
+        "Backend Developer, Globex (2018 - 2020)",
+        "Data Analyst 03/2017 - 05/2019",
+        "Python developer #3 1718000000.123",
+    ]
+    dropped = [
+        "jane.doe@example.com | +1 555 123 4567",
+        "Phone: (555) 123-4567",
+        "+91 98765 43210",
+        "Mobile: 9876543210",
+        "12 Baker Street, London NW1 6XE",
+    ]
+    for line in kept:
+        assert compact_text(line, 3000)[0] == line, line
+    for line in dropped:
+        assert compact_text(line, 3000)[0] == "", line
+    print(f"OK: kept {len(kept)} dated lines, dropped {len(dropped)} contact lines")
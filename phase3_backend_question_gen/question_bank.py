@@ -1,133 +1,117 @@
-from typing import List, Dict, Any
+import os
+import sys
+import json
+import random
+from typing import List, Dict, Any, Optional, Tuple
+
+# Skills are detected by Phase 2's structured extraction (skills.json holds the names and aliases)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'phase2_resume_extraction')))
+from resume_structure import extract_structure
 
 # A static collection of high-quality interview questions for common stacks
 # This serves as the Level 3 (Final) fallback when all AI models hit quota limits.
+# The questions live in question_bank.json and are indexed once at import time.
+
+QUESTION_BANK_FILE = os.getenv(
+    "QUESTION_BANK_FILE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "question_bank.json")
+)
+BEHAVIORAL_KEY = "general_behavioral"
 
-QUESTION_BANK: Dict[str, List[Dict[str, Any]]] = {
-    "python": [
-        {
-            "id": 1001,
-            "text": "Explain the difference between a list and a tuple in Python. When would you use one over the other?",
-            "type": "technical",
-            "difficulty": "easy",
-            "context": "Core Python proficiency.",
-            "initial_code": ""
-        },
-        {
-            "id": 1002,
-            "text": "What are Python decorators and how do they work? Provide a simple use case.",
-            "type": "technical",
-            "difficulty": "medium",
-            "context": "Advanced Python concepts.",
-            "initial_code": ""
-        },
-        {
-            "id": 1003,
-            "text": "Write a function that takes a string and returns it reversed. Example: 'hello' -> 'olleh'.",
-            "type": "coding",
-            "difficulty": "easy",
-            "context": "Basic algorithmic thinking in Python.",
-            "initial_code": "def reverse_string(s):\n    # Your code here\n    pass"
-        }
-    ],
-    "javascript": [
-        {
-            "id": 2001,
-            "text": "What is the difference between '==' and '===' in JavaScript?",
-            "type": "technical",
-            "difficulty": "easy",
-            "context": "JS fundamentals.",
-            "initial_code": ""
-        },
-        {
-            "id": 2002,
-            "text": "Explain the concept of 'closures' in JavaScript with an example.",
-            "type": "technical",
-            "difficulty": "medium",
-            "context": "Scope and memory management in JS.",
-            "initial_code": ""
-        },
-        {
-            "id": 2003,
-            "text": "Write a function that filters an array of numbers to return only the even ones.",
-            "type": "coding",
-            "difficulty": "easy",
-            "context": "Array manipulation in JS.",
-            "initial_code": "function filterEvens(arr) {\n    // Your code here\n}"
-        }
-    ],
-    "react": [
-        {
-            "id": 3001,
-            "text": "What are React Hooks? Explain useState and useEffect.",
-            "type": "technical",
-            "difficulty": "easy",
-            "context": "Modern React development.",
-            "initial_code": ""
-        },
-        {
-            "id": 3002,
-            "text": "What is the Virtual DOM, and how does React use it to improve performance?",
-            "type": "technical",
-            "difficulty": "medium",
-            "context": "React architecture.",
-            "initial_code": ""
-        }
-    ],
-    "general_behavioral": [
-        {
-            "id": 4001,
-            "text": "Tell me about a challenging project you worked on. What were the obstacles and how did you overcome them?",
-            "type": "behavioral",
-            "difficulty": "medium",
-            "context": "Problem-solving and resilience.",
-            "initial_code": ""
-        },
-        {
-            "id": 4002,
-            "text": "Where do you see yourself in two years in terms of your career growth?",
-            "type": "behavioral",
-            "difficulty": "easy",
-            "context": "Ambition and career alignment.",
-            "initial_code": ""
-        },
-        {
-            "id": 4003,
-            "text": "How do you handle disagreement with a teammate or supervisor?",
-            "type": "behavioral",
-            "difficulty": "easy",
-            "context": "Conflict resolution and teamwork.",
-            "initial_code": ""
-        }
-    ]
+# Relative sampling weights. A specific difficulty strongly prefers matching questions but can
+# still borrow from neighbours when a skill has too few of them.
+DIFFICULTY_WEIGHTS = {
+    "easy": {"easy": 1.0, "medium": 0.2, "hard": 0.05},
+    "medium": {"easy": 0.2, "medium": 1.0, "hard": 0.2},
+    "hard": {"easy": 0.05, "medium": 0.2, "hard": 1.0},
+    "mixed": {"easy": 1.0, "medium": 1.0, "hard": 1.0},
 }
+TYPE_WEIGHTS = {"technical": 0.7, "coding": 0.3, "behavioral": 1.0}
+BEHAVIORAL_SHARE = 0.2  # share of slots reserved for behavioral questions (at least one)
+
+
+class QuestionBankIndex:
+    """Questions bucketed by skill, difficulty and type for O(k) sampling."""
+
+    def __init__(self, questions: Dict[str, List[Dict[str, Any]]]):
+        self.questions = questions
+        self.buckets: Dict[str, Dict[Tuple[str, str], List[Dict[str, Any]]]] = {}
+        for skill, skill_questions in questions.items():
+            buckets = self.buckets.setdefault(skill, {})
+            for q in skill_questions:
+                buckets.setdefault((q["difficulty"], q["type"]), []).append(q)
+
+    def match_skills(self, skills: List[str]) -> List[str]:
+        """The detected skills the bank has questions for, in order of first mention."""
+        return [s for s in skills if s != BEHAVIORAL_KEY and s in self.questions]
+
+    def sample(self, skills: List[str], count: int, difficulty: str = "mixed", rng: Optional[random.Random] = None,
+               exclude_ids: Optional[set] = None) -> List[Dict[str, Any]]:
+        """
+        Picks up to `count` distinct questions, cycling over `skills` and choosing each
+        question's (difficulty, type) bucket by weight. Cost grows with `count`, not bank size.
+        """
+        rng = rng or random
+        difficulty_weights = DIFFICULTY_WEIGHTS.get(difficulty, DIFFICULTY_WEIGHTS["mixed"])
+        seen = set(exclude_ids or ())
+        picked = []
+        skills = [s for s in skills if self.buckets.get(s)]
+        if not skills or count <= 0:
+            return picked
+
+        skills = skills[:]
+        rng.shuffle(skills)
+        for attempt in range(count * 8):
+            if len(picked) >= count:
+                break
+            buckets = self.buckets[skills[attempt % len(skills)]]
+            keys = list(buckets)
+            weights = [difficulty_weights.get(d, 0.1) * TYPE_WEIGHTS.get(t, 0.5) for d, t in keys]
+            q = rng.choice(buckets[rng.choices(keys, weights=weights)[0]])
+            if q["id"] not in seen:
+                seen.add(q["id"])
+                picked.append(q)
 
-def get_fallback_questions(resume_text: str, num_questions: int = 5) -> List[Dict[str, Any]]:
+        # Small banks: random draws keep colliding, so sweep what is left in preference order
+        if len(picked) < count:
+            remaining = [
+                q for s in skills for q in self.questions[s]
+                if q["id"] not in seen
+            ]
+            remaining.sort(key=lambda q: -difficulty_weights.get(q["difficulty"], 0.1))
+            picked.extend(remaining[:count - len(picked)])
+        return picked
+
+
+def load_question_bank(path: str = QUESTION_BANK_FILE) -> QuestionBankIndex:
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return QuestionBankIndex(data["questions"])
+
+
+question_index = load_question_bank()
+QUESTION_BANK: Dict[str, List[Dict[str, Any]]] = question_index.questions
+
+
+def get_fallback_questions(resume_text: str, num_questions: int = 5, difficulty: str = "mixed",
+                           skills: Optional[List[str]] = None) -> List[Dict[str, Any]]:
     """
-    Detects skills from resume text and pulls matching questions from the bank.
-    Always includes at least one behavioral question.
+    Samples bank questions for the resume's skills (detected from the text unless given).
+    Includes at least one behavioral question whenever more than one question is requested.
     """
-    resume_lower = resume_text.lower()
-    selected = []
-    
     # 1. Detect technical matches
-    for skill, questions in QUESTION_BANK.items():
-        if skill != "general_behavioral" and skill in resume_lower:
-            selected.extend(questions)
-            
-    # 2. Add behavioral if we have space
-    selected.extend(QUESTION_BANK["general_behavioral"])
-    
-    # 3. Unique IDs and Limit
-    seen_ids = set()
-    unique_selected = []
-    for q in selected:
-        if q["id"] not in seen_ids:
-            unique_selected.append(q)
-            seen_ids.add(q["id"])
-            
-    # 4. Fallback if empty (e.g. no skills detected)
-    if not unique_selected:
-        unique_selected = QUESTION_BANK["general_behavioral"]
-        
-    return unique_selected[:num_questions]
+    skills = question_index.match_skills(extract_structure(resume_text).skills if skills is None else skills)
+
+    # 2. Reserve behavioral slots (all of them if no skills were detected)
+    if skills and num_questions > 1:
+        num_behavioral = max(1, round(num_questions * BEHAVIORAL_SHARE))
+    else:
+        num_behavioral = num_questions if not skills else 0
+
+    # 3. Sample technical questions, then fill the rest with behavioral ones
+    selected = question_index.sample(skills, num_questions - num_behavioral, difficulty)
+    selected += question_index.sample(
+        [BEHAVIORAL_KEY], num_questions - len(selected), difficulty,
+        exclude_ids={q["id"] for q in selected}
+    )
+    return selected
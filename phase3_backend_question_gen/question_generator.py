@@ -1,8 +1,11 @@
-import os
 import json
+import hashlib
 import typing_extensions
-import google.generativeai as genai
-from dotenv import load_dotenv
+from typing import AsyncIterator, Optional
+from llm_client import LLMClient, get_llm_client
+from single_flight import SingleFlight, get_single_flight
+from metrics import span
+from prompt_builder import compact_text, compact_instructions, estimate_tokens, PROMPT_RESUME_TOKEN_BUDGET, PROMPT_JD_TOKEN_BUDGET
 
 # Use TypedDict for schema definition as it's often more reliable for simple JSON constraints with Gemini
 class Question(typing_extensions.TypedDict):
@@ -16,23 +19,79 @@ class Question(typing_extensions.TypedDict):
 class InterviewScript(typing_extensions.TypedDict):
     questions: list[Question]
 
-class QuestionGenerator:
+class QuestionStreamParser:
+    """
+    Pulls complete question objects out of a partially received InterviewScript JSON document,
+    so each question can be sent on as soon as its closing brace arrives.
+    """
+
     def __init__(self):
-        load_dotenv()
-        api_key = os.getenv("GEMINI_API_KEY")
-        if not api_key:
-            raise ValueError("GEMINI_API_KEY not found in environment variables")
-        
-        genai.configure(api_key=api_key)
-        # Using a model that supports JSON mode well
-        self.model = genai.GenerativeModel('gemini-flash-latest',
-                                           generation_config={"response_mime_type": "application/json"})
+        self.buffer = ""
+        self.pos = 0
+        self.in_array = False
+        self.in_string = False
+        self.escape = False
+        self.depth = 0
+        self.obj_start = None
 
-    def generate_questions(self, resume_text: str, role: str = "Software Engineer", num_questions: int = 5, difficulty: str = "mixed", job_description: str = "", auto_select_count: bool = False) -> list[Question]:
-        """
-        Generates interview questions based on the provided resume text and target role.
-        """
-        
+    def feed(self, text: str) -> list[Question]:
+        self.buffer += text
+        buf = self.buffer
+        found = []
+        i = self.pos
+        while i < len(buf):
+            ch = buf[i]
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                self.in_string = True
+            elif not self.in_array:
+                # The first array in the document is the questions list (or the document itself)
+                if ch == "[":
+                    self.in_array = True
+            elif ch == "{":
+                if self.depth == 0:
+                    self.obj_start = i
+                self.depth += 1
+            elif ch == "}":
+                self.depth -= 1
+                if self.depth == 0 and self.obj_start is not None:
+                    try:
+                        found.append(json.loads(buf[self.obj_start:i + 1]))
+                    except json.JSONDecodeError:
+                        pass
+                    self.obj_start = None
+            elif ch == "]" and self.depth == 0:
+                self.in_array = False
+            i += 1
+
+        # Drop text we no longer need to look at
+        keep_from = self.obj_start if self.obj_start is not None else i
+        self.buffer = buf[keep_from:]
+        self.pos = i - keep_from
+        if self.obj_start is not None:
+            self.obj_start = 0
+        return found
+
+class QuestionGenerator:
+    CANDIDATE_MODELS = [
+        'gemini-2.5-flash',
+        'gemini-2.0-flash',
+        'gemini-flash-latest',
+        'gemini-2.5-flash-lite'
+    ]
+
+    def __init__(self, llm_client: Optional[LLMClient] = None, flights: Optional[SingleFlight] = None):
+        # Raises ValueError when GEMINI_API_KEY is missing
+        self.llm = llm_client or get_llm_client()
+        self.flights = flights or get_single_flight()
+
+    def _build_prompt(self, resume_text: str, role: str, num_questions: int, difficulty: str, job_description: str, auto_select_count: bool) -> str:
         # Build difficulty instruction
         if difficulty == "mixed":
             difficulty_instruction = "Mix of easy, medium, and hard questions."
@@ -45,10 +104,14 @@ class QuestionGenerator:
         else:
             quantity_instruction = f"Generate exactly {num_questions} interview questions."
 
+        # Compact resume and JD into their token budgets
+        resume_text, resume_stats = compact_text(resume_text, PROMPT_RESUME_TOKEN_BUDGET)
+        job_description, jd_stats = compact_text(job_description, PROMPT_JD_TOKEN_BUDGET, strip_sections=False)
+
         # Build job description section
         job_desc_section = "None provided."
         if job_description.strip():
-            job_desc_section = f"---\n{job_description[:2000]}\n---"
+            job_desc_section = f"---\n{job_description}\n---"
         
         prompt = f"""
         You are an expert technical and HR interviewer. 
@@ -89,26 +152,40 @@ class QuestionGenerator:
         
         Return a JSON object with a single key "questions" containing these objects.
         """
+        prompt = compact_instructions(prompt)
+        print(
+            f"Prompt tokens (est.): {estimate_tokens(prompt)} "
+            f"(resume {resume_stats['tokens_in']}->{resume_stats['tokens_out']}, "
+            f"JD {jd_stats['tokens_in']}->{jd_stats['tokens_out']})"
+        )
+        return prompt
+
+    async def generate_questions(self, resume_text: str, role: str = "Software Engineer", num_questions: int = 5, difficulty: str = "mixed", job_description: str = "", auto_select_count: bool = False) -> list[Question]:
+        """
+        Generates interview questions based on the provided resume text and target role.
+        """
+        with span("prompt_build"):
+            prompt = self._build_prompt(resume_text, role, num_questions, difficulty, job_description, auto_select_count)
+        # Identical concurrent requests (e.g. one resume/JD sent to a whole cohort) share one Gemini call
+        key = "questions:" + hashlib.sha256(prompt.encode()).hexdigest()
+        return await self.flights.do(key, lambda: self._generate_from_prompt(prompt))
+
+    async def _generate_from_prompt(self, prompt: str) -> list[Question]:
+        models = await self.llm.candidates(self.CANDIDATE_MODELS)
+        if not models:
+            raise RuntimeError("All question generation models are unavailable (circuit breakers open)")
 
-        candidate_models = [
-            'gemini-2.5-flash',
-            'gemini-2.0-flash',
-            'gemini-flash-latest',
-            'gemini-2.5-flash-lite'
-        ]
-        
         last_error = None
-        for model_name in candidate_models:
+        for model_name in models:
             try:
                 print(f"Generating questions with model: {model_name}")
-                model = genai.GenerativeModel(model_name, generation_config={"response_mime_type": "application/json"})
-                response = model.generate_content(prompt)
+                text = await self.llm.generate(model_name, prompt, generation_config={"response_mime_type": "application/json"})
                 
                 # Handle empty response
-                if not response.text:
+                if not text:
                     continue
                     
-                data = json.loads(response.text)
+                data = json.loads(text)
                 
                 # Simple validation to ensure we got what we expected
                 if "questions" in data:
@@ -129,6 +206,40 @@ class QuestionGenerator:
             raise last_error
         return []
 
+    async def stream_questions(self, resume_text: str, role: str = "Software Engineer", num_questions: int = 5, difficulty: str = "mixed", job_description: str = "", auto_select_count: bool = False) -> AsyncIterator[Question]:
+        """
+        Streaming variant of generate_questions: yields each question as soon as Gemini has finished writing it.
+        """
+        with span("prompt_build"):
+            prompt = self._build_prompt(resume_text, role, num_questions, difficulty, job_description, auto_select_count)
+
+        models = await self.llm.candidates(self.CANDIDATE_MODELS)
+        if not models:
+            raise RuntimeError("All question generation models are unavailable (circuit breakers open)")
+
+        last_error = None
+        for model_name in models:
+            parser = QuestionStreamParser()
+            emitted = 0
+            try:
+                print(f"Streaming questions with model: {model_name}")
+                async for chunk in self.llm.stream(model_name, prompt, generation_config={"response_mime_type": "application/json"}):
+                    for question in parser.feed(chunk):
+                        emitted += 1
+                        yield question
+                if emitted:
+                    return
+                print(f"No questions parsed from {model_name} stream")
+            except Exception as e:
+                print(f"Error with {model_name}: {e}")
+                last_error = e
+                # Switching models mid-stream would repeat questions the client already has
+                if emitted:
+                    raise
+
+        if last_error:
+            raise last_error
+
 if __name__ == "__main__":
     # Quick sanity check
     gen = QuestionGenerator()
@@ -0,0 +1,282 @@
+import os
+import json
+import time
+import asyncio
+import itertools
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple
+from cache_store import CacheStore, get_cache_store
+from metrics import registry
+
+# Client-side quota accounting for Gemini. Every call (generation, evaluation, Deep Scan) takes
+# one request and its estimated tokens from per-model RPM/TPM token buckets before it is sent.
+#
+# Waiters are served interactive-first, then in arrival order. Background work (pregeneration)
+# may only use capacity above a reserved share, so it backs off well before users feel it.
+# A call that could not start within its priority's wait limit is rejected immediately with
+# RateLimited; callers treat that like a failed model and move on, instead of spending a call
+# that Gemini would answer with a 429.
+#
+# Bucket levels live in the shared cache store, so with the SQLite backend all workers draw from
+# one quota. Waiter ordering is per process: each worker serves its own queue by priority.
+
+INTERACTIVE = 0
+BACKGROUND = 1
+
+RATE_LIMITS_ENABLED = os.getenv("RATE_LIMITS_ENABLED", "1") == "1"
+RATE_LIMIT_MAX_WAIT_SECONDS = float(os.getenv("RATE_LIMIT_MAX_WAIT_SECONDS", "5"))
+RATE_LIMIT_BACKGROUND_MAX_WAIT_SECONDS = float(os.getenv("RATE_LIMIT_BACKGROUND_MAX_WAIT_SECONDS", "30"))
+RATE_LIMIT_BACKGROUND_RESERVE = float(os.getenv("RATE_LIMIT_BACKGROUND_RESERVE", "0.3"))  # share kept for interactive calls
+RATE_LIMIT_OUTPUT_TOKENS = int(os.getenv("RATE_LIMIT_OUTPUT_TOKENS", "1500"))  # expected output per call
+RATE_LIMIT_FILE_TOKENS = int(os.getenv("RATE_LIMIT_FILE_TOKENS", "2000"))  # uploaded file (Deep Scan) estimate
+RATE_LIMIT_POLL_SECONDS = 0.05
+
+# Free-tier limits; override with GEMINI_RATE_LIMITS='{"gemini-2.5-flash": {"rpm": 1000, "tpm": 1000000}}'
+DEFAULT_RATE_LIMITS = {
+    "gemini-2.5-flash": {"rpm": 10, "tpm": 250000},
+    "gemini-flash-latest": {"rpm": 10, "tpm": 250000},
+    "gemini-2.0-flash": {"rpm": 15, "tpm": 1000000},
+    "gemini-2.5-flash-lite": {"rpm": 15, "tpm": 250000},
+}
+FALLBACK_RATE_LIMIT = {
+    "rpm": int(os.getenv("RATE_LIMIT_DEFAULT_RPM", "10")),
+    "tpm": int(os.getenv("RATE_LIMIT_DEFAULT_TPM", "250000")),
+}
+
+RATE_LIMIT_DECISIONS = registry.counter(
+    "rate_limit_decisions_total",
+    "Scheduler decisions per model and priority: immediate, waited or rejected.",
+    ("model", "priority", "outcome")
+)
+RATE_LIMIT_WAIT = registry.histogram(
+    "rate_limit_wait_seconds", "Time calls spent queued for quota.", ("priority",)
+)
+
+_PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+# Priority of the calls made from the current task; background pipelines set it with priority_scope()
+current_priority: contextvars.ContextVar[int] = contextvars.ContextVar("llm_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def priority_scope(priority: int) -> Iterator[None]:
+    token = current_priority.set(priority)
+    try:
+        yield
+    finally:
+        current_priority.reset(token)
+
+
+class RateLimited(Exception):
+    """Raised before a call is sent, when the model has no quota left within the caller's wait limit."""
+
+
+class TokenBucket:
+    """Capacity and refill rate of one limit; the current level is kept in the shared store."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+
+    def refill(self, level: float, elapsed: float) -> float:
+        return min(self.capacity, level + max(elapsed, 0.0) * self.rate)
+
+    def wait_time(self, level: float, amount: float) -> float:
+        """Seconds until `amount` is available (requests larger than the bucket wait for a full one)."""
+        deficit = min(amount, self.capacity) - level
+        return max(0.0, deficit / self.rate) if self.rate else float("inf")
+
+
+class _ModelQuota:
+    def __init__(self, rpm: int, tpm: int):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.waiting: Dict[int, tuple] = {}  # seq -> (priority, tokens)
+        self.granted = 0
+        self.rejected = 0
+
+    def levels(self, state: Optional[Dict[str, float]], now: float) -> Tuple[float, float]:
+        """Current (requests, tokens) levels from a stored state; no state means both buckets are full."""
+        if state is None:
+            return self.requests.capacity, self.tokens.capacity
+        elapsed = now - state["at"]
+        return self.requests.refill(state["requests"], elapsed), self.tokens.refill(state["tokens"], elapsed)
+
+
+class RateLimiter:
+    def __init__(self, limits: Optional[Dict[str, Dict[str, int]]] = None,
+                 max_wait: float = RATE_LIMIT_MAX_WAIT_SECONDS,
+                 background_max_wait: float = RATE_LIMIT_BACKGROUND_MAX_WAIT_SECONDS,
+                 background_reserve: float = RATE_LIMIT_BACKGROUND_RESERVE,
+                 enabled: bool = RATE_LIMITS_ENABLED,
+                 buckets: Optional[CacheStore] = None):
+        self.limits = limits if limits is not None else load_rate_limits()
+        # An idle bucket refills completely within a minute, so an expired entry is simply a full one
+        self.buckets = buckets or get_cache_store("rate_limits", ttl_seconds=120)
+        self.max_wait = {INTERACTIVE: max_wait, BACKGROUND: background_max_wait}
+        self.background_reserve = background_reserve
+        self.enabled = enabled
+        self._quotas: Dict[str, _ModelQuota] = {}
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def _quota(self, model_name: str) -> _ModelQuota:
+        quota = self._quotas.get(model_name)
+        if quota is None:
+            limit = self.limits.get(model_name, FALLBACK_RATE_LIMIT)
+            quota = self._quotas[model_name] = _ModelQuota(limit["rpm"], limit["tpm"])
+        return quota
+
+    @staticmethod
+    def estimate_tokens(contents: Any) -> int:
+        """Input estimate for a prompt (text parts plus uploaded files) and the expected output."""
+        from prompt_builder import estimate_tokens
+        parts = [contents] if isinstance(contents, str) else list(contents)
+        total = sum(estimate_tokens(p) if isinstance(p, str) else RATE_LIMIT_FILE_TOKENS for p in parts)
+        return total + RATE_LIMIT_OUTPUT_TOKENS
+
+    def _try_take(self, model_name: str, seq: int, priority: int, tokens: int) -> float:
+        """Takes quota and returns 0 if this waiter can go now, otherwise the estimated wait."""
+        with self._lock:
+            quota = self._quota(model_name)
+            # Everyone queued ahead (higher priority, or same priority and earlier) is served first
+            ahead = [w for s, w in quota.waiting.items() if (w[0], s) < (priority, seq)]
+            need_requests = 1 + len(ahead)
+            need_tokens = tokens + sum(w[1] for w in ahead)
+            if priority == BACKGROUND:
+                need_requests += quota.requests.capacity * self.background_reserve
+                need_tokens += quota.tokens.capacity * self.background_reserve
+
+        def wait_for(state: Optional[Dict[str, float]], now: float) -> float:
+            requests, token_level = quota.levels(state, now)
+            return max(quota.requests.wait_time(requests, need_requests), quota.tokens.wait_time(token_level, need_tokens))
+
+        # Read first: most polls of a waiting call end here, without a write to the shared store
+        wait = wait_for(self.buckets.get(model_name), time.time())
+        if wait > 0.0:
+            return wait
+
+        def take(state: Optional[Dict[str, float]]) -> Optional[Dict[str, float]]:
+            nonlocal wait
+            now = time.time()
+            wait = wait_for(state, now)
+            if wait > 0.0:
+                return state  # another worker got there first
+            requests, token_level = quota.levels(state, now)
+            return {"requests": requests - 1, "tokens": token_level - tokens, "at": now}
+
+        self.buckets.update(model_name, take)
+        if wait == 0.0:
+            with self._lock:
+                quota.waiting.pop(seq, None)
+                quota.granted += 1
+        return wait
+
+    def _register(self, model_name: str, priority: int, tokens: int) -> int:
+        seq = next(self._seq)
+        with self._lock:
+            self._quota(model_name).waiting[seq] = (priority, tokens)
+        return seq
+
+    def _unregister(self, model_name: str, seq: int):
+        with self._lock:
+            self._quota(model_name).waiting.pop(seq, None)
+
+    def _reject(self, model_name: str, seq: int, priority: int, wait: float):
+        with self._lock:
+            quota = self._quota(model_name)
+            quota.waiting.pop(seq, None)
+            quota.rejected += 1
+        RATE_LIMIT_DECISIONS.inc(model_name, _PRIORITY_NAMES[priority], "rejected")
+        raise RateLimited(f"{model_name}: no quota within {self.max_wait[priority]:.0f}s (next slot in ~{wait:.1f}s)")
+
+    def _step(self, model_name: str, seq: int, priority: int, tokens: int, start: float) -> float:
+        """One scheduling attempt: 0 once granted, otherwise how long to sleep before retrying."""
+        wait = self._try_take(model_name, seq, priority, tokens)
+        if wait == 0.0:
+            waited = time.monotonic() - start
+            label = _PRIORITY_NAMES[priority]
+            RATE_LIMIT_DECISIONS.inc(model_name, label, "waited" if waited > 0.001 else "immediate")
+            RATE_LIMIT_WAIT.observe(waited, label)
+            return 0.0
+        if time.monotonic() + wait > start + self.max_wait[priority]:
+            self._reject(model_name, seq, priority, wait)
+        return min(wait, RATE_LIMIT_POLL_SECONDS)
+
+    async def acquire(self, model_name: str, tokens: int, priority: Optional[int] = None) -> None:
+        """Waits for one request and `tokens` tokens of quota, or raises RateLimited."""
+        if not self.enabled:
+            return
+        priority = current_priority.get() if priority is None else priority
+        seq = self._register(model_name, priority, tokens)
+        start = time.monotonic()
+        try:
+            # The bucket check can wait on the SQLite write lock; keep it off the event loop
+            while (delay := await asyncio.to_thread(self._step, model_name, seq, priority, tokens, start)):
+                await asyncio.sleep(delay)
+        finally:
+            self._unregister(model_name, seq)
+
+    def acquire_blocking(self, model_name: str, tokens: int, priority: Optional[int] = None) -> None:
+        """acquire() for synchronous callers running on worker threads (Deep Scan)."""
+        if not self.enabled:
+            return
+        priority = current_priority.get() if priority is None else priority
+        seq = self._register(model_name, priority, tokens)
+        start = time.monotonic()
+        try:
+            while (delay := self._step(model_name, seq, priority, tokens, start)):
+                time.sleep(delay)
+        finally:
+            self._unregister(model_name, seq)
+
+    def settle(self, model_name: str, estimated_tokens: int, actual_tokens: int) -> None:
+        """Corrects the token bucket once Gemini reports the real usage of a call."""
+        if not self.enabled:
+            return
+
+        def correct(state: Optional[Dict[str, float]]) -> Optional[Dict[str, float]]:
+            if state is None:
+                return None  # the bucket has refilled completely in the meantime
+            return {**state, "tokens": state["tokens"] - (actual_tokens - estimated_tokens)}
+
+        self.buckets.update(model_name, correct)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            quotas = list(self._quotas.items())
+        now = time.time()
+        result = {}
+        for name, quota in quotas:
+            requests, token_level = quota.levels(self.buckets.get(name), now)
+            result[name] = {
+                "rpm_limit": int(quota.requests.capacity),
+                "tpm_limit": int(quota.tokens.capacity),
+                "requests_available": round(requests, 2),
+                "tokens_available": int(token_level),
+                "queued": len(quota.waiting),
+                "granted": quota.granted,
+                "rejected": quota.rejected,
+            }
+        return {"enabled": self.enabled, "models": result}
+
+
+def load_rate_limits() -> Dict[str, Dict[str, int]]:
+    limits = {name: dict(limit) for name, limit in DEFAULT_RATE_LIMITS.items()}
+    overrides = os.getenv("GEMINI_RATE_LIMITS")
+    if overrides:
+        for name, limit in json.loads(overrides).items():
+            limits[name] = {**limits.get(name, FALLBACK_RATE_LIMIT), **limit}
+    return limits
+
+
+_default_limiter: Optional[RateLimiter] = None
+
+def get_rate_limiter() -> RateLimiter:
+    """Returns the process-wide scheduler shared by generation, evaluation and Deep Scan."""
+    global _default_limiter
+    if _default_limiter is None:
+        _default_limiter = RateLimiter()
+    return _default_limiter
@@ -0,0 +1,210 @@
+"""
+Multi-worker scaling benchmark.
+
+Starts the API with uvicorn at each `--workers` count (fake Gemini backend, one shared SQLite
+cache as in production), drives it over real HTTP from `--clients` load-generator processes
+for `--duration` seconds, and reports requests/s, latency and scaling efficiency relative to a
+single worker. With enough cores, throughput should grow close to linearly with workers.
+
+The default mix is one text-PDF upload (unique bytes, so every upload is parsed), one cached
+question generation and one cached evaluation per three requests: the CPU-bound parse path and
+the shared-cache path that every worker hits.
+
+The load generators need CPU too; for a clean result run on a machine with at least
+max(--workers) + --clients cores.
+
+Usage:
+    python scaling_benchmark.py --workers 1 2 4 --clients 4 --duration 15
+    python scaling_benchmark.py --mix upload --json scaling.json
+
+Requires httpx and uvicorn.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import signal
+import asyncio
+import argparse
+import tempfile
+import itertools
+import subprocess
+import multiprocessing
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PHASE2 = os.path.join(HERE, "..", "phase2_resume_extraction")
+ENDPOINTS = {"upload": "/upload_resume", "generate": "/generate_questions", "evaluate": "/evaluate_answer"}
+
+
+def __getattr__(name):
+    # uvicorn loads "scaling_benchmark:fake_app" in every worker process; build it on first access there
+    if name != "fake_app":
+        raise AttributeError(name)
+    sys.path.insert(0, HERE)
+    sys.path.insert(0, PHASE2)
+    import fake_gemini
+    fake_gemini.install(latency=float(os.getenv("SCALING_FAKE_LATENCY", "0.05")))
+    import main
+    return main.app
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _payload(kind: str, client_id: int, i: int, pdf: bytes) -> dict:
+    if kind == "upload":
+        # A trailing PDF comment makes the bytes (and the resume cache key) unique per request
+        data = pdf + f"\n% client {client_id} request {i}\n".encode()
+        return {"files": {"file": (f"resume_{client_id}_{i}.pdf", data, "application/pdf")}}
+    if kind == "generate":
+        return {"json": {"resume_text": f"Candidate {i % 8}. Python developer with React, SQL and Docker experience.",
+                         "num_questions": 5}}
+    return {"json": {"question": "What is a closure in JavaScript?",
+                     "answer": f"A function bundled with its lexical scope, variant {i % 8}."}}
+
+
+async def _drive(port: int, client_id: int, concurrency: int, warmup: float, duration: float, mix: list) -> dict:
+    import httpx
+    sys.path.insert(0, PHASE2)
+    from bench_pdf_extraction import make_pdf
+
+    pdf = make_pdf(2)
+    counter = itertools.count()
+    latencies, errors = [], 0
+    start = time.perf_counter()
+    record_from, stop_at = start + warmup, start + warmup + duration
+
+    async def worker(client):
+        nonlocal errors
+        while time.perf_counter() < stop_at:
+            i = next(counter)
+            kind = mix[i % len(mix)]
+            sent = time.perf_counter()
+            res = await client.post(ENDPOINTS[kind], **_payload(kind, client_id, i, pdf))
+            if sent >= record_from:
+                latencies.append(time.perf_counter() - sent)
+                if res.status_code != 200:
+                    errors += 1
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=120, limits=limits) as client:
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+    return {"latencies": latencies, "errors": errors, "wall": time.perf_counter() - record_from}
+
+
+def run_client(job: tuple) -> dict:
+    return asyncio.run(_drive(*job))
+
+
+def start_server(workers: int, port: int, tmpdir: str, latency: float) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.update({
+        "GEMINI_API_KEY": "fake-key",
+        "CACHE_BACKEND": "sqlite",
+        "CACHE_DB": os.path.join(tmpdir, f"scaling_{workers}.db"),
+        "SCALING_FAKE_LATENCY": str(latency),
+        # Measure the app's own scaling: no free-tier quota, no speculative generation
+        "RATE_LIMITS_ENABLED": "0",
+        "PREGENERATION_ENABLED": "0",
+    })
+    command = [sys.executable, "-m", "uvicorn", "scaling_benchmark:fake_app", "--host", "127.0.0.1",
+               "--port", str(port), "--workers", str(workers), "--log-level", "warning"]
+    return subprocess.Popen(command, cwd=HERE, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+
+
+def wait_until_ready(server: subprocess.Popen, port: int, timeout: float = 60):
+    import httpx
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Server exited during startup:\n{server.stderr.read()[-2000:]}")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("Server did not become ready")
+
+
+def stop_server(server: subprocess.Popen):
+    server.send_signal(signal.SIGINT)
+    try:
+        server.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        server.kill()
+        server.wait()
+
+
+def run_workers(workers: int, args, tmpdir: str) -> dict:
+    port = _free_port()
+    server = start_server(workers, port, tmpdir, args.latency)
+    try:
+        wait_until_ready(server, port)
+        jobs = [(port, client_id, args.concurrency, args.warmup, args.duration, args.mix) for client_id in range(args.clients)]
+        with multiprocessing.get_context("spawn").Pool(args.clients) as pool:
+            results = pool.map(run_client, jobs)
+    finally:
+        stop_server(server)
+
+    latencies = [latency for r in results for latency in r["latencies"]]
+    return {
+        "workers": workers,
+        "requests": len(latencies),
+        "rps": round(sum(len(r["latencies"]) / r["wall"] for r in results), 1),
+        "p50_ms": round(_percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(_percentile(latencies, 95) * 1000, 1),
+        "errors": sum(r["errors"] for r in results),
+    }
+
+
+def main():
+    cores = os.cpu_count() or 1
+    default_workers = sorted({1, 2} | {n for n in (4, 8, 16) if n <= cores})
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=default_workers, help="uvicorn worker counts to compare")
+    parser.add_argument("--clients", type=int, default=max(1, min(4, cores // 2)), help="Load generator processes")
+    parser.add_argument("--concurrency", type=int, default=16, help="In-flight requests per load generator")
+    parser.add_argument("--duration", type=float, default=10, help="Measured seconds per worker count")
+    parser.add_argument("--warmup", type=float, default=2, help="Unmeasured seconds before each run")
+    parser.add_argument("--latency", type=float, default=0.05, help="Fake model latency in seconds")
+    parser.add_argument("--mix", nargs="+", choices=sorted(ENDPOINTS), default=["upload", "generate", "evaluate"])
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    if max(args.workers) + args.clients > cores:
+        print(f"NOTE: {cores} core(s) for up to {max(args.workers)} workers and {args.clients} load generators; "
+              "scaling will be capped by the machine, not the app")
+
+    runs = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        print(f"mix={'/'.join(args.mix)} clients={args.clients}x{args.concurrency} duration={args.duration}s")
+        print(f"{'workers':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'errors':>8}{'speedup':>9}{'efficiency':>12}")
+        for workers in args.workers:
+            run = run_workers(workers, args, tmpdir)
+            base = runs[0] if runs else run
+            run["speedup"] = round(run["rps"] / base["rps"] * base["workers"], 2) if base["rps"] else 0.0
+            run["efficiency"] = round(run["speedup"] / workers, 2)
+            runs.append(run)
+            print(f"{workers:>8}{run['rps']:>10.1f}{run['p50_ms']:>10.1f}{run['p95_ms']:>10.1f}{run['errors']:>8}"
+                  f"{run['speedup']:>9.2f}{run['efficiency']:>12.0%}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(runs, f, indent=2)
+        print(f"\nSaved results to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+import os
+import re
+import zlib
+from functools import lru_cache
+from typing import TYPE_CHECKING, List, Optional
+from cache_store import CacheStore, get_cache_store, CACHE_MAX_ENTRIES
+
+# Second question-cache tier: finds a cached QuestionResponse for a resume/JD pair that is nearly
+# identical to an earlier one (re-uploads with whitespace or small edits). Runs fully offline.
+#
+# Each text gets a MinHash signature over normalized word shingles. Signatures are split into LSH
+# bands; a band hash points at the cache keys that share it, so a lookup reads a handful of rows
+# instead of comparing against every cached resume.
+
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.9"))  # estimated Jaccard similarity
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "1") == "1"
+
+NUM_PERM = 128
+BANDS = 32
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 3
+MAX_KEYS_PER_BAND = 8
+
+# numpy is imported on first use so it stays off the API's cold start path
+if TYPE_CHECKING:
+    import numpy as np
+
+
+@lru_cache(maxsize=1)
+def _permutations():
+    import numpy as np
+    rng = np.random.RandomState(1337)
+    perm_a = rng.randint(1, (1 << 31) - 1, size=NUM_PERM).astype(np.uint64)
+    perm_b = rng.randint(0, (1 << 31) - 1, size=NUM_PERM).astype(np.uint64)
+    return perm_a, perm_b, np.uint64((1 << 31) - 1)
+
+_WORD = re.compile(r"[a-z0-9+#]+")
+
+
+def shingles(text: str) -> List[str]:
+    """Lowercased word 3-grams; punctuation and whitespace differences disappear here."""
+    words = _WORD.findall(text.lower())
+    if len(words) < SHINGLE_SIZE:
+        return [" ".join(words)] if words else []
+    return list({" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)})
+
+
+def minhash(text: str) -> Optional["np.ndarray"]:
+    import numpy as np
+    grams = shingles(text)
+    if not grams:
+        return None
+    perm_a, perm_b, prime = _permutations()
+    hashes = np.fromiter((zlib.crc32(g.encode()) for g in grams), dtype=np.uint64, count=len(grams))
+    return ((np.outer(perm_a, hashes) + perm_b[:, None]) % prime).min(axis=1)
+
+
+def similarity(a: Optional["np.ndarray"], b: Optional["np.ndarray"]) -> float:
+    """Estimated Jaccard similarity; two empty texts count as identical."""
+    import numpy as np
+    if a is None or b is None:
+        return 1.0 if a is None and b is None else 0.0
+    return float(np.mean(a == b))
+
+
+class NearDuplicateCache:
+    def __init__(self, threshold: float = SEMANTIC_CACHE_THRESHOLD,
+                 signatures: Optional[CacheStore] = None, bands: Optional[CacheStore] = None):
+        self.threshold = threshold
+        self.signatures = signatures or get_cache_store("question_signatures")
+        # Every signature writes one row per band
+        self.bands = bands or get_cache_store("question_bands", max_entries=CACHE_MAX_ENTRIES * BANDS)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _band_keys(bucket: str, signature: "np.ndarray") -> List[str]:
+        return [
+            f"{bucket}:{band}:{zlib.crc32(signature[band * ROWS:(band + 1) * ROWS].tobytes())}"
+            for band in range(BANDS)
+        ]
+
+    def lookup(self, resume_text: str, job_description: str, bucket: str) -> Optional[str]:
+        """
+        Returns the question-cache key of the most similar earlier request in `bucket`
+        (same difficulty/count settings), or None if nothing clears the threshold.
+        """
+        import numpy as np
+        resume_sig = minhash(resume_text)
+        if resume_sig is None:
+            return None
+        jd_sig = minhash(job_description)
+
+        candidates = {}
+        for band_key in self._band_keys(bucket, resume_sig):
+            for cache_key in self.bands.get(band_key) or []:
+                candidates[cache_key] = None
+
+        best_key, best_score = None, self.threshold
+        for cache_key in candidates:
+            stored = self.signatures.get(cache_key)
+            if stored is None:
+                continue
+            stored_jd = np.array(stored["jd"], dtype=np.uint64) if stored["jd"] is not None else None
+            if similarity(jd_sig, stored_jd) < self.threshold:
+                continue
+            score = similarity(resume_sig, np.array(stored["resume"], dtype=np.uint64))
+            if score >= best_score:
+                best_key, best_score = cache_key, score
+
+        if best_key is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            print(f"Near-duplicate cache match ({best_score:.2f} similarity) -> {best_key}")
+        return best_key
+
+    def add(self, cache_key: str, resume_text: str, job_description: str, bucket: str):
+        resume_sig = minhash(resume_text)
+        if resume_sig is None:
+            return
+        jd_sig = minhash(job_description)
+        self.signatures.set(cache_key, {
+            "resume": resume_sig.tolist(),
+            "jd": jd_sig.tolist() if jd_sig is not None else None,
+        })
+        def append(keys: Optional[List[str]]) -> List[str]:
+            keys = [k for k in (keys or []) if k != cache_key]
+            return (keys + [cache_key])[-MAX_KEYS_PER_BAND:]
+
+        # Read-modify-write under the store's write lock, so workers adding to one band keep both keys
+        for band_key in self._band_keys(bucket, resume_sig):
+            self.bands.update(band_key, append)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "signatures": len(self.signatures),
+        }
@@ -0,0 +1,140 @@
+import os
+import uuid
+import time
+import asyncio
+import hashlib
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from cache_store import CacheStore, get_cache_store
+
+# Server-side interview sessions. The question list is stored under a session ID when the
+# interview starts; each answer is graded in the background as soon as it is submitted, so the
+# final report only waits for the last answer instead of a whole interview's worth of grading.
+#
+# Questions, answers and evaluations live in separate keys of the shared cache store, so two
+# workers handling answers for the same session never overwrite each other's writes.
+# Each evaluation records a hash of the answer it graded: grading of a replaced answer can still
+# finish and write (mid-write here, or on another worker), and such a result is treated as pending.
+
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", str(6 * 3600)))
+SESSION_MAX_ENTRIES = int(os.getenv("SESSION_MAX_ENTRIES", "50000"))
+
+
+class SessionNotFound(KeyError):
+    pass
+
+
+def _digest(answer: str) -> str:
+    return hashlib.sha256(answer.encode()).hexdigest()
+
+
+class InterviewSessions:
+    """
+    `evaluate(question, answer)` grades one answer and returns a JSON-serializable dict;
+    main.py supplies it so this module does not depend on the evaluator.
+    """
+
+    def __init__(self, evaluate: Callable[[Dict[str, Any], str], Awaitable[Dict[str, Any]]],
+                 store: Optional[CacheStore] = None):
+        self.evaluate = evaluate
+        # One entry for the question list, plus one per answer and per evaluation
+        self.store = store or get_cache_store("sessions", max_entries=SESSION_MAX_ENTRIES, ttl_seconds=SESSION_TTL_SECONDS)
+        self._tasks: Dict[Tuple[str, int], asyncio.Task] = {}
+
+    def create(self, questions: List[Dict[str, Any]]) -> str:
+        session_id = uuid.uuid4().hex
+        self.store.set(session_id, {"questions": questions, "created_at": time.time()})
+        return session_id
+
+    def get_questions(self, session_id: str) -> List[Dict[str, Any]]:
+        return self._questions(session_id, self.store.get(session_id))
+
+    async def aget_questions(self, session_id: str) -> List[Dict[str, Any]]:
+        return self._questions(session_id, await self.store.aget(session_id))
+
+    @staticmethod
+    def _questions(session_id: str, session: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        if session is None:
+            raise SessionNotFound(session_id)
+        return session["questions"]
+
+    async def submit_answer(self, session_id: str, index: int, answer: str) -> None:
+        """
+        Records the answer and starts grading it in the background. Re-submitting an answer
+        replaces the old one and cancels its grading if it is still running locally.
+        """
+        questions = await self.aget_questions(session_id)
+        if not 0 <= index < len(questions):
+            raise IndexError(f"Question index {index} is out of range (0-{len(questions) - 1})")
+
+        await self.store.aset(f"{session_id}:answer:{index}", answer)
+        await self.store.adelete(f"{session_id}:evaluation:{index}")
+
+        previous = self._tasks.pop((session_id, index), None)
+        if previous is not None:
+            previous.cancel()
+        task = asyncio.create_task(self._grade(session_id, index, questions[index], answer))
+        self._tasks[(session_id, index)] = task
+        task.add_done_callback(lambda _: self._forget(session_id, index, task))
+
+    def _forget(self, session_id: str, index: int, task: asyncio.Task):
+        if self._tasks.get((session_id, index)) is task:
+            del self._tasks[(session_id, index)]
+        if not task.cancelled() and task.exception() is not None:
+            # report() grades the answer again, so a background failure only needs logging
+            print(f"Background evaluation failed for session {session_id} question {index}: {task.exception()}")
+
+    async def _grade(self, session_id: str, index: int, question: Dict[str, Any], answer: str) -> Dict[str, Any]:
+        """Returns the stored entry: the evaluation plus the digest of the answer it graded."""
+        result = await self.evaluate(question, answer)
+        graded = {"answer": _digest(answer), "result": result}
+        await self.store.aset(f"{session_id}:evaluation:{index}", graded)
+        return graded
+
+    def status(self, session_id: str) -> Dict[str, Any]:
+        questions = self.get_questions(session_id)
+        answered, evaluated = [], []
+        for index in range(len(questions)):
+            answer = self.store.get(f"{session_id}:answer:{index}")
+            if answer is not None:
+                answered.append(index)
+            graded = self.store.get(f"{session_id}:evaluation:{index}")
+            if graded is not None and graded.get("answer") == _digest(answer or ""):
+                evaluated.append(index)
+        return {
+            "session_id": session_id,
+            "questions": questions,
+            "answered": answered,
+            "evaluated": evaluated,
+        }
+
+    async def report(self, session_id: str) -> List[Dict[str, Any]]:
+        """
+        Returns one evaluation per question, in order. Finished evaluations are read from the
+        store, in-flight ones in this worker are awaited, and anything else (graded on another
+        worker that has not finished, or never started) is graded now; the evaluation cache and
+        request coalescing keep that from costing a second model call.
+        """
+        questions = await self.aget_questions(session_id)
+
+        async def result_for(index: int) -> Dict[str, Any]:
+            answer = await self.store.aget(f"{session_id}:answer:{index}") or ""
+            digest = _digest(answer)
+            stored = await self.store.aget(f"{session_id}:evaluation:{index}")
+            if stored is not None and stored.get("answer") == digest:
+                return stored["result"]
+            task = self._tasks.get((session_id, index))
+            if task is not None:
+                try:
+                    graded = await asyncio.shield(task)
+                    if graded["answer"] == digest:
+                        return graded["result"]
+                    # this worker graded an answer that another worker has since replaced
+                except asyncio.CancelledError:
+                    if not task.cancelled():
+                        raise  # the report request itself was cancelled
+                    # otherwise the answer was replaced; grade whatever is stored now
+                except Exception:
+                    pass  # already logged by _forget; grade again below
+            return (await self._grade(session_id, index, questions[index], answer))["result"]
+
+        return list(await asyncio.gather(*(result_for(index) for index in range(len(questions)))))
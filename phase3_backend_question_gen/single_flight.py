@@ -0,0 +1,111 @@
+import os
+import uuid
+import time
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional
+from cache_store import CacheStore, get_cache_store
+
+# Request coalescing: concurrent calls with the same key share one in-flight LLM call.
+# Inside a process, followers await the leader's future. Across worker processes, the leader holds
+# a lease in the shared cache store and publishes its result there for followers to pick up.
+
+# Renewed while the leader works, so this only bounds how long a crashed leader holds up other workers
+SINGLE_FLIGHT_LEASE_SECONDS = int(os.getenv("SINGLE_FLIGHT_LEASE_SECONDS", "90"))
+SINGLE_FLIGHT_POLL_SECONDS = float(os.getenv("SINGLE_FLIGHT_POLL_SECONDS", "0.1"))
+SINGLE_FLIGHT_RESULT_TTL_SECONDS = 120
+
+
+class SingleFlight:
+    def __init__(self, leases: Optional[CacheStore] = None, results: Optional[CacheStore] = None,
+                 lease_seconds: int = SINGLE_FLIGHT_LEASE_SECONDS, poll_interval: float = SINGLE_FLIGHT_POLL_SECONDS):
+        self.leases = leases or get_cache_store("flight_leases", ttl_seconds=lease_seconds)
+        self.results = results or get_cache_store("flight_results", ttl_seconds=SINGLE_FLIGHT_RESULT_TTL_SECONDS)
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.owner = uuid.uuid4().hex
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.calls = 0
+        self.coalesced_local = 0
+        self.coalesced_remote = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]],
+                 encode: Callable[[Any], Any] = lambda value: value,
+                 decode: Callable[[Any], Any] = lambda value: value) -> Any:
+        """
+        Runs `fn()` once per `key` across concurrent callers and returns its result to all of them.
+        `encode`/`decode` convert the result to and from JSON for followers in other processes.
+        """
+        self.calls += 1
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced_local += 1
+        else:
+            # The work runs in its own task, so a caller that is cancelled (e.g. a replaced answer)
+            # leaves it running for the followers instead of cancelling it under them
+            task = asyncio.create_task(self._run_shared(key, fn, encode, decode))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._finish(key, task))
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Mark retrieved so an unawaited failure doesn't log "exception was never retrieved"
+            task.exception()
+
+    async def _run_shared(self, key, fn, encode, decode):
+        while True:
+            # A leader in another worker may have finished just before we got here
+            published = await self.results.aget(key)
+            if published is not None:
+                self.coalesced_remote += 1
+                return decode(published)
+
+            if await self.leases.aadd(key, self.owner):
+                done = asyncio.Event()
+                renewal = asyncio.create_task(self._renew_lease(key, done))
+                try:
+                    result = await fn()
+                    await self.results.aset(key, encode(result))
+                    return result
+                finally:
+                    done.set()
+                    await renewal  # lets a renewal already in progress land before the delete
+                    await self.leases.adelete(key)
+
+            # Another worker is already on it: wait for its result, or for the lease to go away
+            deadline = time.time() + self.lease_seconds
+            while time.time() < deadline:
+                await asyncio.sleep(self.poll_interval)
+                published = await self.results.aget(key)
+                if published is not None:
+                    self.coalesced_remote += 1
+                    return decode(published)
+                if await self.leases.aget(key) is None:
+                    break  # leader failed or gave up; try to become the leader ourselves
+
+    async def _renew_lease(self, key: str, done: asyncio.Event):
+        # A router chain of model timeouts and rate-limit waits can outlast one lease
+        while not done.is_set():
+            try:
+                await asyncio.wait_for(done.wait(), timeout=self.lease_seconds / 3)
+            except asyncio.TimeoutError:
+                await self.leases.aset(key, self.owner)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "calls": self.calls,
+            "coalesced_local": self.coalesced_local,
+            "coalesced_remote": self.coalesced_remote,
+            "in_flight": len(self._inflight),
+        }
+
+
+_default_flights: Optional[SingleFlight] = None
+
+def get_single_flight() -> SingleFlight:
+    global _default_flights
+    if _default_flights is None:
+        _default_flights = SingleFlight()
+    return _default_flights
@@ -0,0 +1,119 @@
+"""
+Cold start profile and budget check for the API.
+
+Starts fresh interpreters that import `main`, run the lifespan startup and serve one request,
+the same path a scale-to-zero instance takes before its first response. Reports the median
+of `--runs` cold starts, split into import, startup and first request (the total also covers
+interpreter start-up), and exits with status 1 if the total exceeds `--budget-ms`, so it can
+gate CI.
+
+`--importtime` also prints the slowest modules from a `python -X importtime` run of `import main`.
+
+Usage:
+    python startup_check.py --budget-ms 1500
+    python startup_check.py --importtime --top 25
+
+Requires httpx (pip install httpx). No Gemini calls are made.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Runs inside the child interpreter; times are relative to the moment the child started running code
+CHILD = """
+import time, json, asyncio
+t0 = time.perf_counter()
+import main
+t1 = time.perf_counter()
+
+async def run():
+    import httpx
+    transport = httpx.ASGITransport(app=main.app)
+    async with main.app.router.lifespan_context(main.app):
+        t2 = time.perf_counter()
+        async with httpx.AsyncClient(transport=transport, base_url="http://startup") as client:
+            response = await client.get("/")
+            response.raise_for_status()
+        t3 = time.perf_counter()
+    return t2, t3
+
+t2, t3 = asyncio.run(run())
+print(json.dumps({"import_ms": (t1 - t0) * 1000, "startup_ms": (t2 - t1) * 1000, "first_request_ms": (t3 - t2) * 1000}))
+"""
+
+
+def child_env(tmpdir: str) -> dict:
+    env = dict(os.environ)
+    env.setdefault("GEMINI_API_KEY", "startup-check")
+    env["CACHE_DB"] = os.path.join(tmpdir, "startup_check.db")
+    # Measure readiness, not the background warm-up that follows it
+    env.setdefault("WARM_IMPORTS", "0")
+    return env
+
+
+def cold_start(env: dict) -> dict:
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, "-c", CHILD], cwd=HERE, env=env, capture_output=True, text=True)
+    total_ms = (time.perf_counter() - start) * 1000
+    if completed.returncode != 0:
+        raise RuntimeError(f"Cold start failed:\n{completed.stderr[-2000:]}")
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result["total_ms"] = total_ms
+    return result
+
+
+def import_profile(env: dict, top: int):
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"],
+                               cwd=HERE, env=env, capture_output=True, text=True)
+    rows = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = [part.strip() for part in line[len("import time:"):].split("|")]
+        try:
+            rows.append((int(cumulative_us), int(self_us), name))
+        except ValueError:
+            continue  # header line
+    rows.sort(reverse=True)
+    print("\nSlowest imports (python -X importtime -c 'import main'):")
+    print(f"{'cumulative ms':>14}{'self ms':>10}  module")
+    for cumulative_us, self_us, name in rows[:top]:
+        print(f"{cumulative_us / 1000:>14.1f}{self_us / 1000:>10.1f}  {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("COLD_START_BUDGET_MS", "2000")),
+                        help="Fail if the median cold start (process spawn to first response) exceeds this")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--importtime", action="store_true", help="Print the slowest imports")
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        env = child_env(tmpdir)
+        cold_start(env)  # populate __pycache__ so every measured run sees the same bytecode state
+        runs = [cold_start(env) for _ in range(args.runs)]
+        if args.importtime:
+            import_profile(env, args.top)
+
+    print(f"\nCold start over {args.runs} runs (median):")
+    for field in ("import_ms", "startup_ms", "first_request_ms", "total_ms"):
+        print(f"  {field:<18}{statistics.median(r[field] for r in runs):>10.1f}")
+
+    total = statistics.median(r["total_ms"] for r in runs)
+    if total > args.budget_ms:
+        print(f"\nFAIL: cold start {total:.0f}ms exceeds the {args.budget_ms:.0f}ms budget")
+        sys.exit(1)
+    print(f"\nOK: cold start {total:.0f}ms is within the {args.budget_ms:.0f}ms budget")
+
+
+if __name__ == "__main__":
+    main()
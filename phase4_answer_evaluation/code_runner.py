@@ -0,0 +1,518 @@
+import os
+import re
+import sys
+import json
+import signal
+import asyncio
+import tempfile
+import threading
+import subprocess
+from collections import deque
+from functools import lru_cache
+from typing import Dict, List, Optional
+from pydantic import BaseModel
+
+# Execution grading for the question bank's coding questions: the candidate's code is run against
+# hidden test cases in a separate, resource-limited process, and the pass rate becomes the score.
+# Workers are started ahead of time and sit blocked on stdin, so a submission doesn't pay for
+# interpreter startup. Each worker runs a single submission and is then replaced, so nothing one
+# candidate's code does can leak into the next run.
+#
+# Candidate code gets CPU, memory and zero-byte file size limits, a wall-clock timeout, a stripped
+# environment, an empty working directory, an unprivileged user when the server runs as root, and
+# no network when `unshare` is available. Python code runs under an audit hook that only allows
+# reading the standard library; node runs under its permission model. This is defence in depth,
+# not a full security boundary: run the API in a container if untrusted users can reach it.
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'phase2_resume_extraction')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'phase3_backend_question_gen')))
+from resume_structure import tokenize
+from question_bank import QUESTION_BANK
+from metrics import registry, span
+
+# Test cases per bank question id; like the reference answers, never sent to the browser
+HIDDEN_TESTS_FILE = os.getenv(
+    "HIDDEN_TESTS_FILE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "hidden_tests.json")
+)
+
+CODE_RUNNER_ENABLED = os.getenv("CODE_RUNNER_ENABLED", "1") == "1"
+CODE_RUNNER_WARM_WORKERS = int(os.getenv("CODE_RUNNER_WARM_WORKERS", "2"))  # idle workers per language
+CODE_RUNNER_TIMEOUT_SECONDS = float(os.getenv("CODE_RUNNER_TIMEOUT_SECONDS", "5"))  # wall clock, per submission
+CODE_RUNNER_CPU_SECONDS = int(os.getenv("CODE_RUNNER_CPU_SECONDS", "2"))
+CODE_RUNNER_MEMORY_MB = int(os.getenv("CODE_RUNNER_MEMORY_MB", "256"))
+NODE_BINARY = os.getenv("NODE_BINARY", "node")
+CODE_RUNNER_ISOLATE_NETWORK = os.getenv("CODE_RUNNER_ISOLATE_NETWORK", "1") == "1"
+
+CODE_EXECUTIONS = registry.counter(
+    "code_executions_total",
+    "Coding answers run against hidden tests, by outcome: passed (all tests), failed, or error.",
+    ("language", "outcome")
+)
+
+# Fenced code in an answer ("```python ... ```"); prose around it is ignored
+_CODE_FENCE = re.compile(r"```[a-zA-Z0-9+#]*\n(.*?)```", re.DOTALL)
+
+# Each worker is a small supervisor plus one child process, both started ahead of time. The child
+# runs the candidate's code and reports the JSON of each return value over a pipe; only the
+# supervisor holds the expected outputs and decides pass or fail (same JSON type, same JSON text),
+# so the code can neither rig the comparison nor forge the verdict. The child is forked before the
+# job arrives, so the expected outputs are never in its memory. Only exception type names come
+# back, never exception text.
+_SUPERVISOR = r"""
+import os, re, sys, json, signal, resource, sysconfig
+language, cpu, memory_mb = sys.argv[1], int(sys.argv[2]), int(sys.argv[3])
+MAX_OUTPUT = 1 << 20
+NAME = re.compile(r"[A-Za-z_][A-Za-z0-9_.]{0,63}")
+STDLIB = sysconfig.get_paths()["stdlib"]
+TAGS = {str: "string", int: "number", float: "number", bool: "boolean", list: "array", dict: "object", type(None): "null"}
+
+def tag(value):
+    return TAGS.get(type(value), "other")
+
+def world_readable(path):
+    path = os.path.realpath(path)
+    if not os.stat(path).st_mode & 0o004:
+        return False
+    while path != os.sep:
+        path = os.path.dirname(path)
+        if not os.stat(path).st_mode & 0o001:
+            return False
+    return True
+
+def limit_child():
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu + 1))
+    resource.setrlimit(resource.RLIMIT_FSIZE, (0, 0))
+    if language == "python":
+        # V8 reserves address space up front, so node gets a heap limit instead
+        resource.setrlimit(resource.RLIMIT_AS, (memory_mb << 20, memory_mb << 20))
+    # An interpreter installed under a private home directory would stop importing as nobody
+    if os.getuid() == 0 and (language != "python" or world_readable(STDLIB)):
+        try:
+            os.setgroups([])
+            os.setgid(65534)
+            os.setuid(65534)
+        except OSError:
+            pass  # inside a user namespace only root is mapped
+
+def guard_python():
+    # Audit hooks can't be removed once added: reads only inside the standard library, no writes,
+    # no processes, signals, sockets or ctypes
+    allowed = tuple(os.path.realpath(p) + os.sep for p in (STDLIB, os.getcwd()))
+    write_flags = os.O_WRONLY | os.O_RDWR | os.O_CREAT | os.O_APPEND | os.O_TRUNC
+    blocked_imports = {"ctypes", "_ctypes", "socket", "_socket", "subprocess", "_posixsubprocess",
+                       "multiprocessing", "_multiprocessing", "mmap", "pty", "fcntl"}
+    blocked_events = ("os.", "socket.", "ctypes.", "subprocess.", "shutil.", "resource.", "pty.", "mmap.",
+                      "sqlite3.", "urllib.", "http.", "ftplib.", "smtplib.", "telnetlib.", "webbrowser.", "glob.")
+
+    def readable(path):
+        if isinstance(path, int):
+            return True
+        return (os.path.realpath(os.fsdecode(path)) + os.sep).startswith(allowed)
+
+    def guard(event, args):
+        if event == "open":
+            path, mode, flags = args
+            if (isinstance(mode, str) and any(c in mode for c in "wax+")) or (flags or 0) & write_flags or not readable(path):
+                raise PermissionError("blocked in the sandbox")
+        elif event in ("os.listdir", "os.scandir"):
+            if not readable("." if args[0] is None else args[0]):
+                raise PermissionError("blocked in the sandbox")
+        elif event == "import":
+            if args[0].partition(".")[0] in blocked_imports:
+                raise PermissionError("blocked in the sandbox")
+        elif event.startswith(blocked_events):
+            raise PermissionError("blocked in the sandbox")
+
+    sys.dont_write_bytecode = True
+    sys.addaudithook(guard)
+
+def python_child(job_fd, result_fd):
+    import time
+    limit_child()
+    with os.fdopen(job_fd, "rb") as f:
+        job = json.loads(f.read())
+    null = os.open(os.devnull, os.O_RDWR)
+    for fd in (0, 1, 2):
+        os.dup2(null, fd)
+    send = lambda message: os.write(result_fd, (json.dumps(message) + "\n").encode())
+    guard_python()
+    namespace = {"__name__": "__answer__"}
+    try:
+        exec(compile(job["code"], "<answer>", "exec"), namespace)
+    except BaseException as e:
+        return send({"error": type(e).__name__})
+    fn = namespace.get(job["function"])
+    if not callable(fn):
+        return send({"missing": True})
+    for args in job["args"]:
+        start = time.perf_counter()
+        try:
+            value = fn(*args)
+            kind = tag(value)
+            message = {"type": kind, "value": json.dumps(value) if kind != "other" else ""}
+        except BaseException as e:
+            message = {"exception": type(e).__name__}
+        message["ms"] = (time.perf_counter() - start) * 1000
+        send(message)
+
+def node_child(job_fd, result_fd):
+    limit_child()
+    null = os.open(os.devnull, os.O_RDWR)
+    os.dup2(job_fd, 0)
+    os.dup2(result_fd, 1)
+    os.dup2(null, 2)
+    os.closerange(3, 256)
+    node, harness = sys.argv[4], sys.argv[5]
+    os.execvp(node, [node, "--experimental-permission", f"--max-old-space-size={memory_mb}", "-e", harness])
+
+job_r, job_w = os.pipe()
+result_r, result_w = os.pipe()
+pid = os.fork()
+if pid == 0:
+    try:
+        os.close(job_w)
+        os.close(result_r)
+        (python_child if language == "python" else node_child)(job_r, result_w)
+    finally:
+        os._exit(0)
+os.close(job_r)
+os.close(result_w)
+
+job = json.loads(sys.stdin.readline())
+try:
+    os.write(job_w, json.dumps({"code": job["code"], "function": job["function"],
+                                "args": [case["args"] for case in job["tests"]]}).encode())
+except OSError:
+    pass  # the child is already gone; reported below
+os.close(job_w)
+
+chunks, size, overflow = [], 0, False
+while True:
+    chunk = os.read(result_r, 65536)
+    if not chunk:
+        break
+    size += len(chunk)
+    if size > MAX_OUTPUT:
+        overflow = True
+        os.kill(pid, signal.SIGKILL)
+        break
+    chunks.append(chunk)
+_, status = os.waitpid(pid, 0)
+
+messages = []
+for line in b"".join(chunks).splitlines():
+    try:
+        message = json.loads(line)
+    except ValueError:
+        continue
+    if isinstance(message, dict):
+        messages.append(message)
+
+def name(value):
+    return value if isinstance(value, str) and NAME.fullmatch(value) else "Error"
+
+def matches(message, expected):
+    if message.get("type") != tag(expected) or not isinstance(message.get("value"), str):
+        return False
+    try:
+        value = json.loads(message["value"])
+    except Exception:
+        return False
+    return json.dumps(value, sort_keys=True) == json.dumps(expected, sort_keys=True)
+
+error, tests = "", []
+first = messages[0] if messages else {}
+if "error" in first:
+    error = name(first["error"])
+elif first.get("missing"):
+    error = f"Function {job['function']} is not defined"
+reports = [message for message in messages if "ms" in message]
+for case, message in zip(job["tests"], reports):
+    ms = message["ms"] if isinstance(message["ms"], (int, float)) and 0 <= message["ms"] < 1e7 else 0.0
+    if "exception" in message:
+        tests.append({"passed": False, "ms": ms, "error": name(message["exception"])})
+    else:
+        tests.append({"passed": matches(message, case["expected"]), "ms": ms, "error": ""})
+
+signaled = os.WTERMSIG(status) if os.WIFSIGNALED(status) else 0
+if overflow:
+    error = "Output limit exceeded"
+elif signaled in (signal.SIGXCPU, signal.SIGKILL):
+    error = f"CPU time limit exceeded ({cpu}s)"
+elif signaled == signal.SIGABRT and language == "javascript":
+    error = f"Memory limit exceeded ({memory_mb} MB)"  # V8 aborts at the heap limit
+elif not error and len(tests) < len(job["tests"]):
+    error = "Program exited before finishing the tests"
+sys.stdout.write(json.dumps({"error": error, "tests": tests}))
+sys.stdout.flush()
+"""
+
+# The node child. It sees the code, the function name and the arguments, never the expected outputs.
+_NODE_HARNESS = r"""
+const vm = require('vm');
+let input = '';
+process.stdin.setEncoding('utf8');
+process.stdin.on('data', chunk => { input += chunk; });
+process.stdin.on('end', () => run(JSON.parse(input)));
+const send = message => process.stdout.write(JSON.stringify(message) + '\n');
+
+function errorName(e) {
+  try {
+    return typeof e.name === 'string' ? e.name : 'Error';
+  } catch (_) {
+    return 'Error';
+  }
+}
+
+function tag(value) {
+  if (value === null) return 'null';
+  if (Array.isArray(value)) return 'array';
+  const type = typeof value;
+  if (type === 'string' || type === 'number' || type === 'boolean') return type;
+  return type === 'object' ? 'object' : 'other';
+}
+
+function run(job) {
+  let fn;
+  try {
+    const context = vm.createContext({});
+    // The trailing line also finds functions declared with const/let, which don't become globals
+    vm.runInContext(job.code + `\n;globalThis.__answer = typeof ${job.function} === 'function' ? ${job.function} : undefined;`, context);
+    fn = context.__answer;
+  } catch (e) {
+    return send({error: errorName(e)});
+  }
+  if (typeof fn !== 'function') return send({missing: true});
+  for (const args of job.args) {
+    const start = performance.now();
+    let message;
+    try {
+      const value = fn(...args);
+      const kind = tag(value);
+      message = {type: kind, value: kind === 'other' ? '' : JSON.stringify(value)};
+    } catch (e) {
+      message = {exception: errorName(e)};
+    }
+    message.ms = performance.now() - start;
+    send(message);
+  }
+}
+"""
+
+LANGUAGES = ("python", "javascript")
+
+
+class ExecutionReport(BaseModel):
+    language: str
+    passed: int
+    total: int
+    runtime_ms: float  # summed over the tests, excluding worker startup
+    error: str = ""  # error type of a compile failure, missing function, timeout or resource limit
+    failures: List[str] = []  # exception types of failing tests; inputs and messages stay hidden
+
+    @property
+    def score(self) -> int:
+        return round(10 * self.passed / self.total) if self.total else 0
+
+    def summary(self) -> str:
+        text = f"Passed {self.passed} of {self.total} hidden tests ({self.runtime_ms:.2f} ms)."
+        if self.error:
+            text += f" Error: {self.error}"
+        elif self.failures:
+            text += f" Failures: {'; '.join(self.failures[:3])}"
+        elif self.passed < self.total:
+            text += " Failing tests returned a wrong result."
+        return text
+
+
+@lru_cache(maxsize=1)
+def _hidden_tests() -> Dict[str, dict]:
+    """Question text (normalized) -> {"language", "function", "tests"} for bank questions with hidden tests."""
+    with open(HIDDEN_TESTS_FILE, "r", encoding="utf-8") as f:
+        specs = json.load(f)
+    tests = {}
+    for questions in QUESTION_BANK.values():
+        for q in questions:
+            spec = specs.get(str(q["id"]))
+            if spec and q["type"] == "coding":
+                tests[" ".join(tokenize(q["text"]))] = spec
+    return tests
+
+
+def hidden_tests_for(question: str) -> Optional[dict]:
+    if not CODE_RUNNER_ENABLED:
+        return None
+    return _hidden_tests().get(" ".join(tokenize(question)))
+
+
+def extract_code(answer: str) -> str:
+    blocks = _CODE_FENCE.findall(answer)
+    return "\n".join(blocks) if blocks else answer
+
+
+def _network_isolation() -> List[str]:
+    """Command prefix that gives workers an empty network namespace, or [] if this host can't."""
+    if not CODE_RUNNER_ISOLATE_NETWORK:
+        return []
+    for prefix in (["unshare", "--net"], ["unshare", "--user", "--map-root-user", "--net"]):
+        try:
+            if subprocess.run(prefix + ["true"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=5).returncode == 0:
+                return prefix
+        except (OSError, subprocess.TimeoutExpired):
+            continue
+    print("Code runner: network namespaces are unavailable; sandboxed code keeps network access")
+    return []
+
+
+def _sandbox_env() -> Dict[str, str]:
+    # Nothing from the server's environment (API keys included) reaches candidate code
+    return {"PATH": os.environ.get("PATH", "/usr/bin:/bin"), "LANG": "C.UTF-8", "PYTHONIOENCODING": "utf-8"}
+
+
+class SandboxPool:
+    """Pre-started, single-use worker processes per language."""
+
+    def __init__(self, warm_workers: int = CODE_RUNNER_WARM_WORKERS):
+        self.warm_workers = warm_workers
+        self._idle: Dict[str, deque] = {language: deque() for language in LANGUAGES}
+        self._lock = threading.Lock()
+        self._tempdir = tempfile.TemporaryDirectory(prefix="code-runner-")
+        self._workdir = self._tempdir.name
+        os.chmod(self._workdir, 0o711)  # workers may drop to an unprivileged user
+        self._prefix = _network_isolation()
+
+    def _command(self, language: str) -> List[str]:
+        command = self._prefix + [sys.executable, "-I", "-B", "-c", _SUPERVISOR, language,
+                                  str(CODE_RUNNER_CPU_SECONDS), str(CODE_RUNNER_MEMORY_MB)]
+        return command + ([NODE_BINARY, _NODE_HARNESS] if language == "javascript" else [])
+
+    def _spawn(self, language: str) -> subprocess.Popen:
+        return subprocess.Popen(
+            self._command(language),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            cwd=self._workdir,
+            env=_sandbox_env(),
+            start_new_session=True,  # supervisor and child share a process group of their own
+        )
+
+    @staticmethod
+    def _kill(worker: subprocess.Popen):
+        try:
+            os.killpg(worker.pid, signal.SIGKILL)
+        except OSError:
+            pass
+        worker.communicate()
+
+    def _refill(self, language: str):
+        while True:
+            with self._lock:
+                if len(self._idle[language]) >= self.warm_workers:
+                    return
+            worker = self._spawn(language)
+            with self._lock:
+                self._idle[language].append(worker)
+
+    def _take(self, language: str) -> subprocess.Popen:
+        with self._lock:
+            while self._idle[language]:
+                worker = self._idle[language].popleft()
+                if worker.poll() is None:
+                    return worker
+        return self._spawn(language)  # pool empty or exhausted: cold start
+
+    def warm(self):
+        for language in LANGUAGES:
+            try:
+                self._refill(language)
+            except OSError as e:
+                print(f"Code runner: could not start {language} workers: {e}")
+
+    def run(self, language: str, job: dict) -> dict:
+        """Runs one job in a fresh worker. Returns {"error", "tests"}; raises OSError if the runtime is missing."""
+        worker = self._take(language)
+        try:
+            # The replacement starts up while this submission runs
+            self._refill(language)
+        except OSError:
+            pass
+        try:
+            stdout, _ = worker.communicate(json.dumps(job).encode() + b"\n", timeout=CODE_RUNNER_TIMEOUT_SECONDS)
+        except subprocess.TimeoutExpired:
+            self._kill(worker)
+            return {"error": f"Time limit exceeded ({CODE_RUNNER_TIMEOUT_SECONDS:g}s)", "tests": []}
+        try:
+            return json.loads(stdout.decode("utf-8", "replace"))
+        except ValueError:
+            return {"error": f"Sandbox worker exited with code {worker.returncode}", "tests": []}
+
+    def close(self):
+        with self._lock:
+            for workers in self._idle.values():
+                while workers:
+                    self._kill(workers.popleft())
+        self._tempdir.cleanup()
+
+
+_pool: Optional[SandboxPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_sandbox_pool() -> SandboxPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = SandboxPool()
+        return _pool
+
+
+def close_sandbox_pool():
+    """Stops idle workers and removes the working directory; the next use starts a new pool."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.close()
+
+
+def execute(question: str, answer: str) -> Optional[ExecutionReport]:
+    """Runs `answer` against the hidden tests of `question`. None if it has none or the runtime is unavailable."""
+    spec = hidden_tests_for(question)
+    if spec is None:
+        return None
+    language = spec["language"]
+    job = {"code": extract_code(answer), "function": spec["function"], "tests": spec["tests"]}
+    try:
+        with span("code_execution"):
+            result = get_sandbox_pool().run(language, job)
+    except OSError as e:
+        print(f"Code runner: {language} is unavailable ({e}); grading without execution")
+        return None
+    tests = result.get("tests", [])
+    report = ExecutionReport(
+        language=language,
+        passed=sum(1 for test in tests if test["passed"]),
+        total=len(spec["tests"]),
+        runtime_ms=round(sum(test["ms"] for test in tests), 3),
+        error=result.get("error", ""),
+        failures=list(dict.fromkeys(test["error"] for test in tests if test["error"])),
+    )
+    outcome = "error" if report.error else "passed" if report.passed == report.total else "failed"
+    CODE_EXECUTIONS.inc(language, outcome)
+    return report
+
+
+async def run_hidden_tests(question: str, answer: str) -> Optional[ExecutionReport]:
+    """execute() on a worker thread, so the event loop keeps serving while the code runs."""
+    if hidden_tests_for(question) is None:
+        return None
+    return await asyncio.get_running_loop().run_in_executor(None, execute, question, answer)
+
+
+if __name__ == "__main__":
+    question = next(q["text"] for questions in QUESTION_BANK.values() for q in questions if q["id"] == 1003)
+    get_sandbox_pool().warm()
+    print(execute(question, "def reverse_string(s):\n    return s[::-1]"))
+    close_sandbox_pool()
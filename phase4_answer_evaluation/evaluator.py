@@ -1,63 +1,209 @@
 from pydantic import BaseModel
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
 import os
-import google.generativeai as genai
+import sys
+import json
+import hashlib
+import asyncio
+import typing_extensions
 from dotenv import load_dotenv
 
+# Shared async LLM client lives with the backend (Phase 3)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'phase3_backend_question_gen')))
+from llm_client import LLMClient, get_llm_client
+from single_flight import get_single_flight
+from cache_store import CacheStore, get_cache_store
+from metrics import span
+from json_repair import parse_json
+
+# Skill keywords for questions that come without any (Phase 2's structured extraction)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'phase2_resume_extraction')))
+from resume_structure import skills_in
+from local_scorer import score_answers
+from code_runner import ExecutionReport, hidden_tests_for, run_hidden_tests
+
 load_dotenv()
 
+# Batch grading: rough input-token budget per LLM call (~4 chars per token) and a cap on
+# answers per call so the structured output stays well inside the model's output limit.
+EVAL_BATCH_TOKEN_BUDGET = int(os.getenv("EVAL_BATCH_TOKEN_BUDGET", "6000"))
+EVAL_BATCH_MAX_ITEMS = int(os.getenv("EVAL_BATCH_MAX_ITEMS", "8"))
+
+# Graded answers are cached so retries, re-renders and common canned answers skip Gemini entirely.
+# Only real LLM grades are stored; fallback and skipped results are never cached.
+EVAL_CACHE_MAX_ENTRIES = int(os.getenv("EVAL_CACHE_MAX_ENTRIES", "20000"))
+EVAL_CACHE_TTL_SECONDS = int(os.getenv("EVAL_CACHE_TTL_SECONDS", str(3 * 24 * 3600)))
+
+# Local first pass: answers the offline scorer grades below this keep that grade and skip Gemini
+# (0 disables it). Either way the local scorer is the fallback when every model fails.
+EVAL_LOCAL_GRADE_BELOW = int(os.getenv("EVAL_LOCAL_GRADE_BELOW", "0"))
+
 class EvaluationResult(BaseModel):
     score: int  # 0-10
     feedback: str
     missing_keywords: List[str]
     improvements: str = ""
     ideal_answer: str = ""  # The "sample/ideal" answer
+    # Set when a coding answer was run against hidden tests (code_runner); the score then comes from them
+    tests_passed: Optional[int] = None
+    tests_total: Optional[int] = None
+    runtime_ms: Optional[float] = None
+
+# Response schema for single-answer grading (the EvaluationResult fields)
+class EvaluationOutput(typing_extensions.TypedDict):
+    score: int
+    feedback: str
+    missing_keywords: list[str]
+    improvements: str
+    ideal_answer: str
+
+# Response schema for batch grading; `index` ties each evaluation back to its question
+class BatchEvaluationItem(typing_extensions.TypedDict):
+    index: int
+    score: int
+    feedback: str
+    missing_keywords: list[str]
+    improvements: str
+    ideal_answer: str
+
+class BatchEvaluation(typing_extensions.TypedDict):
+    evaluations: list[BatchEvaluationItem]
+
+evaluation_cache = get_cache_store("evaluations", max_entries=EVAL_CACHE_MAX_ENTRIES, ttl_seconds=EVAL_CACHE_TTL_SECONDS)
+
+
+def normalize_text(text: str) -> str:
+    """Case and whitespace changes don't change the grade; trailing sentence punctuation doesn't either."""
+    return " ".join(text.split()).casefold().rstrip(".!?;, ")
+
+
+def evaluation_cache_key(question: str, answer: str, context_keywords: List[str]) -> str:
+    keywords = sorted({normalize_text(k) for k in context_keywords if k.strip()})
+    payload = json.dumps([normalize_text(question), normalize_text(answer), keywords])
+    return "evaluation:" + hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _keywords_line(question: str) -> str:
+    keywords = skills_in(question)
+    return f"Keywords: {', '.join(keywords)}\n" if keywords else ""
+
 
 class AnswerEvaluator:
-    def __init__(self):
-        # In a real app, this would load models or connect to LLM
-        pass
+    # Try these models in order
+    CANDIDATE_MODELS = [
+        'gemini-2.0-flash',
+        'gemini-flash-latest',
+        'gemini-2.5-flash-lite'
+    ]
+
+    def __init__(self, llm_client: Optional[LLMClient] = None, cache: Optional[CacheStore] = None):
+        self.llm = llm_client
+        self.cache = cache or evaluation_cache
+
+    @staticmethod
+    def _is_unanswered(answer: str) -> bool:
+        return not answer or answer.strip() == "" or "no answer provided" in answer.lower()
+
+    @staticmethod
+    def _skipped_result() -> EvaluationResult:
+        return EvaluationResult(
+            score=0,
+            feedback="This question was not answered or skipped.",
+            missing_keywords=[],
+            improvements="Please provide a detailed response to receive feedback.",
+            ideal_answer="A good answer would address the specific technical or behavioral aspects of the question."
+        )
     
-    def evaluate(self, question: str, answer: str, context_keywords: List[str] = []) -> EvaluationResult:
+    async def evaluate(self, question: str, answer: str, context_keywords: Optional[List[str]] = None) -> EvaluationResult:
+        context_keywords = context_keywords or []
         # Check for empty or placeholder answers
-        if not answer or answer.strip() == "" or "no answer provided" in answer.lower():
+        if self._is_unanswered(answer):
             print("Answer is empty or placeholder. Skipping AI evaluation.")
-            return EvaluationResult(
-                score=0,
-                feedback="This question was not answered or skipped.",
-                missing_keywords=[],
-                improvements="Please provide a detailed response to receive feedback.",
-                ideal_answer="A good answer would address the specific technical or behavioral aspects of the question."
-            )
+            return self._skipped_result()
 
         api_key = os.getenv("GEMINI_API_KEY")
         if not api_key:
              print("Warning: GEMINI_API_KEY not found, using fallback evaluation.")
-             return self._fallback_evaluate(question, answer, context_keywords, "API Key missing")
-             
-        genai.configure(api_key=api_key)
-        
-        # Try these models in order
-        candidate_models = [
-            'gemini-2.0-flash',
-            'gemini-flash-latest',
-            'gemini-2.5-flash-lite'
-        ]
+             execution = await run_hidden_tests(question, answer)
+             return self._apply_execution(self._fallback_evaluate(question, answer, context_keywords, "API Key missing"), execution, offline=True)
+
+        # Coding answers with hidden tests are graded by running them, never by the local scorer
+        if EVAL_LOCAL_GRADE_BELOW and hidden_tests_for(question) is None:
+            local = self._local_grades([(question, answer)], [0], context_keywords)[0]
+            if local.score < EVAL_LOCAL_GRADE_BELOW:
+                return local
+
+        key = evaluation_cache_key(question, answer, context_keywords)
+        with span("evaluation_cache_lookup"):
+            cached = await self.cache.aget(key)
+        if cached is not None:
+            return EvaluationResult(**cached)
+
+        execution = await run_hidden_tests(question, answer)
+
+        async def grade():
+            result = await self._evaluate_with_llm(question, answer, context_keywords, execution)
+            await self.cache.aset(key, result.model_dump())
+            return result
+
+        # Concurrent requests grading the same answer share one Gemini call
+        try:
+            return await get_single_flight().do(
+                key,
+                grade,
+                encode=lambda result: result.model_dump(),
+                decode=lambda data: EvaluationResult(**data)
+            )
+        except Exception as e:
+            return self._apply_execution(self._fallback_evaluate(question, answer, context_keywords, str(e)), execution, offline=True)
+
+    @staticmethod
+    def _apply_execution(result: EvaluationResult, execution: Optional[ExecutionReport], offline: bool = False) -> EvaluationResult:
+        """Hidden test results override whatever score the model or the local scorer gave."""
+        if execution is not None:
+            if offline:
+                # The local scorer knows nothing about the tests, so its feedback leads with them
+                result.feedback = f"{execution.summary()} {result.feedback}"
+            result.score = execution.score
+            result.tests_passed = execution.passed
+            result.tests_total = execution.total
+            result.runtime_ms = execution.runtime_ms
+        return result
+
+    async def _evaluate_with_llm(self, question: str, answer: str, context_keywords: List[str],
+                                 execution: Optional[ExecutionReport] = None) -> EvaluationResult:
+        """
+        Grades one answer with the first healthy model. Raises if every model fails. With an
+        execution report the score is already decided; the model only writes the feedback.
+        """
+        llm = self.llm or get_llm_client()
         
+        models = await llm.candidates(self.CANDIDATE_MODELS)
+        if not models:
+            raise RuntimeError("All evaluation models are unavailable (circuit breakers open)")
+
         last_error = None
+        # Derived from the question, so the cache key (question, answer, given keywords) still covers them
+        context_keywords = context_keywords or skills_in(question)
 
-        for model_name in candidate_models:
+        execution_block = ""
+        if execution is not None:
+            execution_block = f"""
+                Hidden test results (authoritative, already run): {execution.summary()}
+                The score is set from these results. Base the feedback on them, explain likely causes of any
+                failures, and comment on code quality; do not repeat the test counts.
+                """
+
+        for model_name in models:
             try:
                 print(f"Attempting evaluation with {model_name}...")
-                model = genai.GenerativeModel(model_name)
-                
                 prompt = f"""
                 You are an expert technical interviewer. Evaluate the following answer to the question provided.
                 
                 Question: {question}
                 Answer: {answer}
                 Context Keywords (optional): {', '.join(context_keywords)}
-                
+                {execution_block}
                 INSTRUCTIONS:
                 - If the question is a "coding" question, evaluate the code for logic, correctness, efficiency, and clarity.
                 - If the question is "behavioral" or "technical", evaluate based on relevance, depth, and communication.
@@ -66,65 +212,197 @@ class AnswerEvaluator:
                 - ALSO provide specific, brief "improvements" on how to make the answer better.
                 - FINALLY, provide a highly professional, concise "ideal_answer" (max 3 sentences) that demonstrates the perfect response to this question. For coding questions, provide the optimized code.
                 
-                Output ONLY a valid JSON object with keys: 
-                - "score" (int)
-                - "feedback" (string)
-                - "missing_keywords" (list of strings)
-                - "improvements" (string)
-                - "ideal_answer" (string)
+                Return a JSON object with "score", "feedback", "missing_keywords", "improvements" and "ideal_answer".
                 """
-                
-                response = model.generate_content(prompt)
-                text = response.text.strip()
-                
-                # Robust cleanup
-                if text.startswith("```json"):
-                    text = text[7:]
-                if text.startswith("```"):
-                    text = text[3:]
-                if text.endswith("```"):
-                    text = text[:-3]
-                text = text.strip()
-                
-                import json
-                try:
-                    data = json.loads(text)
-                except json.JSONDecodeError:
-                    # Last resort cleanup
-                    start = text.find("{")
-                    end = text.rfind("}") + 1
-                    if start != -1 and end != -1:
-                        data = json.loads(text[start:end])
-                    else:
-                        raise ValueError("Could not parse JSON from LLM response")
-                
-                return EvaluationResult(
+                generation_config = {"response_mime_type": "application/json", "response_schema": EvaluationOutput}
+
+                text = await llm.generate(model_name, prompt, generation_config=generation_config)
+                # A formatting glitch is repaired here instead of costing another model call
+                data = parse_json(text, "evaluation", required=("score",))
+
+                return self._apply_execution(EvaluationResult(
                     score=data.get("score", 0),
                     feedback=data.get("feedback", "No feedback provided."),
                     missing_keywords=data.get("missing_keywords", []),
                     improvements=data.get("improvements", "No specific improvements suggested."),
                     ideal_answer=data.get("ideal_answer", "No ideal answer provided.")
-                )
+                ), execution)
             except Exception as e:
                 print(f"Model {model_name} failed: {e}")
                 last_error = e
                 # Continue to next model
         
-        return self._fallback_evaluate(question, answer, context_keywords, str(last_error))
+        raise last_error
+
+    async def evaluate_batch(self, items: List[Tuple[str, str]], context_keywords: Optional[List[str]] = None) -> List[EvaluationResult]:
+        """
+        Grades a whole interview. Unanswered questions are scored locally; the rest are packed
+        into as few structured-output LLM calls as the token budget allows, run in parallel.
+        Coding answers with hidden tests are run in the sandbox alongside them. Results come back
+        in the same order as `items`.
+        """
+        context_keywords = context_keywords or []
+        results: List[Optional[EvaluationResult]] = [None] * len(items)
+        keys = {}
+        pending = []
+        for index, (question, answer) in enumerate(items):
+            if self._is_unanswered(answer):
+                results[index] = self._skipped_result()
+                continue
+            keys[index] = evaluation_cache_key(question, answer, context_keywords)
+        with span("evaluation_cache_lookup"):
+            cached = await asyncio.gather(*(self.cache.aget(key) for key in keys.values()))
+        for index, entry in zip(keys, cached):
+            if entry is not None:
+                results[index] = EvaluationResult(**entry)
+            else:
+                pending.append(index)
+
+        # Coding answers with hidden tests go through evaluate(): run first, then a feedback-only call
+        executed = [index for index in pending if hidden_tests_for(items[index][0]) is not None]
+        pending = [index for index in pending if index not in executed]
+
+        if pending and EVAL_LOCAL_GRADE_BELOW:
+            local = self._local_grades(items, pending, context_keywords)
+            for index, result in local.items():
+                if result.score < EVAL_LOCAL_GRADE_BELOW:
+                    results[index] = result
+            pending = [index for index in pending if results[index] is None]
+            print(f"Batch evaluation: {len(local) - len(pending)} answer(s) graded locally")
+
+        if executed:
+            print(f"Batch evaluation: running {len(executed)} coding answer(s) against hidden tests")
+        executing = asyncio.gather(*(self.evaluate(items[i][0], items[i][1], context_keywords) for i in executed))
+
+        if pending and not os.getenv("GEMINI_API_KEY"):
+            print("Warning: GEMINI_API_KEY not found, using fallback evaluation.")
+            for index, result in self._fallback_evaluate_many(items, pending, context_keywords, "API Key missing").items():
+                results[index] = result
+            pending = []
+
+        chunks = self._chunk_by_budget(items, pending)
+        if chunks:
+            print(f"Batch evaluation: {len(pending)} answers in {len(chunks)} LLM call(s)")
+        chunk_results, executed_results = await asyncio.gather(
+            asyncio.gather(*(self._evaluate_chunk(items, chunk, context_keywords) for chunk in chunks)),
+            executing
+        )
+        for index, result in zip(executed, executed_results):
+            results[index] = result
+
+        for chunk, chunk_result in zip(chunks, chunk_results):
+            if isinstance(chunk_result, Exception):
+                # Every model failed for this chunk; retrying per answer would only burn more quota
+                for index, result in self._fallback_evaluate_many(items, chunk, context_keywords, str(chunk_result)).items():
+                    results[index] = result
+                continue
+            for index, result in chunk_result.items():
+                results[index] = result
+                await self.cache.aset(keys[index], result.model_dump())
+
+        # Anything the batch call dropped gets graded on its own
+        missing = [index for index in pending if results[index] is None]
+        if missing:
+            print(f"Batch evaluation: re-grading {len(missing)} answer(s) individually")
+            singles = await asyncio.gather(*(self.evaluate(items[i][0], items[i][1], context_keywords) for i in missing))
+            for index, result in zip(missing, singles):
+                results[index] = result
+
+        return results
+
+    @staticmethod
+    def _chunk_by_budget(items: List[Tuple[str, str]], indices: List[int]) -> List[List[int]]:
+        chunks, current, current_tokens = [], [], 0
+        for index in indices:
+            question, answer = items[index]
+            tokens = (len(question) + len(answer)) // 4 + 1
+            if current and (current_tokens + tokens > EVAL_BATCH_TOKEN_BUDGET or len(current) >= EVAL_BATCH_MAX_ITEMS):
+                chunks.append(current)
+                current, current_tokens = [], 0
+            current.append(index)
+            current_tokens += tokens
+        if current:
+            chunks.append(current)
+        return chunks
+
+    async def _evaluate_chunk(self, items: List[Tuple[str, str]], indices: List[int], context_keywords: List[str]):
+        """Returns {index: EvaluationResult} for one chunk, or the last error if every model failed."""
+        llm = self.llm or get_llm_client()
+        # Without shared keywords, each item carries the skills its own question mentions
+        answers_block = "\n".join(
+            f"### Item {index}\nQuestion: {items[index][0]}\nAnswer: {items[index][1]}\n"
+            + ("" if context_keywords else _keywords_line(items[index][0]))
+            for index in indices
+        )
+        prompt = f"""
+        You are an expert technical interviewer. Evaluate each of the following answers to the question it belongs to.
+        
+        {answers_block}
+        Context Keywords (optional): {', '.join(context_keywords)}
+        
+        INSTRUCTIONS:
+        - If a question is a "coding" question, evaluate the code for logic, correctness, efficiency, and clarity.
+        - If a question is "behavioral" or "technical", evaluate based on relevance, depth, and communication.
+        - Provide a score (0-10) and CONCISE, SIMPLE feedback (max 2 sentences).
+        - For coding questions, be specific about potential bugs or better approaches.
+        - ALSO provide specific, brief "improvements" on how to make the answer better.
+        - FINALLY, provide a highly professional, concise "ideal_answer" (max 3 sentences). For coding questions, provide the optimized code.
+        
+        Return a JSON object with a single key "evaluations": one object per item, with "index" set to the item number.
+        """
+        generation_config = {"response_mime_type": "application/json", "response_schema": BatchEvaluation}
+
+        last_error = RuntimeError("All evaluation models are unavailable (circuit breakers open)")
+        for model_name in await llm.candidates(self.CANDIDATE_MODELS):
+            try:
+                print(f"Attempting batch evaluation of {len(indices)} answers with {model_name}...")
+                text = await llm.generate(model_name, prompt, generation_config=generation_config)
+                data = parse_json(text, "batch_evaluation", required=("evaluations",))
+                results = {}
+                for item in data["evaluations"]:
+                    index = item.get("index")
+                    # Items cut off before their score are left out and re-graded individually
+                    if index in indices and "score" in item:
+                        results[index] = EvaluationResult(
+                            score=item.get("score", 0),
+                            feedback=item.get("feedback", "No feedback provided."),
+                            missing_keywords=item.get("missing_keywords", []),
+                            improvements=item.get("improvements", "No specific improvements suggested."),
+                            ideal_answer=item.get("ideal_answer", "No ideal answer provided.")
+                        )
+                return results
+            except Exception as e:
+                print(f"Model {model_name} failed batch evaluation: {e}")
+                last_error = e
+
+        return last_error
+
+    @staticmethod
+    def _local_grades(items: List[Tuple[str, str]], indices: List[int], context_keywords: List[str]) -> Dict[int, EvaluationResult]:
+        """Offline grades (local_scorer) for items[indices], in one vectorized pass."""
+        with span("local_scoring"):
+            # Same fallback as the model prompt, so offline grades still list missing skills
+            scored = score_answers([items[i] for i in indices], [context_keywords or skills_in(items[i][0]) for i in indices])
+        return {index: EvaluationResult(**result) for index, result in zip(indices, scored)}
+
+    def _fallback_evaluate_many(self, items: List[Tuple[str, str]], indices: List[int], context_keywords: List[str],
+                                error_msg: str = "") -> Dict[int, EvaluationResult]:
+        print(f"Evaluation service unavailable ({error_msg}); grading {len(indices)} answer(s) locally")
+        results = self._local_grades(items, indices, context_keywords)
+        for result in results.values():
+            result.feedback += " (Graded offline: the AI evaluator was unavailable.)"
+        return results
 
     def _fallback_evaluate(self, question: str, answer: str, context_keywords: List[str], error_msg: str = "") -> EvaluationResult:
-        # Original simple logic
-        score = 5
-        feedback = f"Evaluation service unavailable. Error: {error_msg}"
-        return EvaluationResult(score=score, feedback=feedback, missing_keywords=[], improvements="Check API Quota or Connection.")
+        return self._fallback_evaluate_many([(question, answer)], [0], context_keywords, error_msg)[0]
 
 if __name__ == "__main__":
     # Test logic
     evaluator = AnswerEvaluator()
-    res = evaluator.evaluate(
+    res = asyncio.run(evaluator.evaluate(
         "What is React?", 
         "React is a JavaScript library for building user interfaces.", 
         ["library", "javascript", "interface"]
-    )
+    ))
     print(f"Score: {res.score}")
     print(f"Feedback: {res.feedback}")
@@ -0,0 +1,257 @@
+import os
+import re
+import sys
+import json
+import math
+from functools import lru_cache
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Tuple
+
+# Local answer scoring, no LLM: keyword coverage, TF-IDF similarity to a reference answer (or to
+# the question, for AI-generated questions that have none), and length/structure heuristics.
+# Used when Gemini is unavailable and, optionally, as a cheap first pass before it. The TF-IDF
+# part works on whole batches with sparse numpy arrays; hundreds of answers take milliseconds.
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'phase2_resume_extraction')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'phase3_backend_question_gen')))
+from resume_structure import tokenize
+from question_bank import QUESTION_BANK
+
+# numpy is imported on first use so it stays off the API's cold start path
+if TYPE_CHECKING:
+    import numpy as np
+
+# Reference answers and key points for the static question bank, keyed by question id. Kept out of
+# question_bank.json so they are never sent to the browser along with the questions.
+REFERENCE_ANSWERS_FILE = os.getenv(
+    "REFERENCE_ANSWERS_FILE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "reference_answers.json")
+)
+
+# Feature weights; a feature that does not apply (no keywords) is left out and the rest renormalized
+WEIGHTS = {"coverage": 0.35, "similarity": 0.35, "length": 0.15, "structure": 0.15}
+# Cosine similarity that already counts as a full match: paraphrases rarely share more vocabulary
+SIMILARITY_FULL = {"reference": 0.5, "question": 0.3}
+TARGET_WORDS = {"technical": 50, "behavioral": 70, "coding": 4}
+
+_CODING_QUESTION = re.compile(r"\b(write|implement|code)\b.*\b(function|program|method|class|algorithm)\b|\bcode\b", re.IGNORECASE)
+_BEHAVIORAL_QUESTION = re.compile(
+    r"tell me about|describe a (time|situation)|how do you (handle|deal|manage|prioriti)|where do you see|"
+    r"give an example of a time|your (greatest|biggest) (strength|weakness)|why do you want",
+    re.IGNORECASE
+)
+_CODE_MARKERS = re.compile(r"\breturn\b|=>|\bdef\b|\bfunction\b|[{};]|\bfor\b|\bwhile\b|\[.*\]|\(.*\)")
+_EXAMPLE_MARKERS = re.compile(r"\bfor (example|instance)\b|\be\.g\b|\bsuch as\b|\bexample\b", re.IGNORECASE)
+_SENTENCE_END = re.compile(r"[.!?](\s|$)")
+# STAR-style cues for behavioral answers: situation, action, result
+_STAR_CUES = (
+    {"project", "situation", "when", "team", "deadline", "client", "company", "challenge", "problem"},
+    {"decided", "implemented", "built", "led", "worked", "talked", "proposed", "created", "organized", "started", "listen"},
+    {"result", "outcome", "improved", "reduced", "increased", "delivered", "learned", "launched", "resolved", "succes"},
+)
+
+
+# Plural folding only ("closures" -> "closure"), done on the whole text in one regex pass
+_PLURAL = re.compile(r"\b([a-z0-9+#]{2,}[a-rt-z0-9+#])s\b")
+
+
+def fold(text: str) -> str:
+    return _PLURAL.sub(r"\1", text.lower())
+
+
+STOPWORDS = frozenset(fold(
+    "a an the and or but if then else of to in on at by for with from as is are was were be been being it its "
+    "this that these those i you he she we they me my your our their them us do does did done have has had "
+    "can could will would should may might must not no so than too very just also about into over under "
+    "what which who whom how why when where there here all any each some such only own same other more most "
+    "one two use used using get got make made"
+).split())
+
+
+def terms(text: str) -> List[str]:
+    return [t for t in tokenize(fold(text)) if t not in STOPWORDS]
+
+
+@lru_cache(maxsize=1)
+def _references() -> Dict[str, dict]:
+    """Question text (normalized) -> {"type", "keywords", "answer"} for every bank question with a reference."""
+    with open(REFERENCE_ANSWERS_FILE, "r", encoding="utf-8") as f:
+        answers = json.load(f)
+    references = {}
+    for questions in QUESTION_BANK.values():
+        for q in questions:
+            reference = answers.get(str(q["id"]))
+            if reference:
+                references[" ".join(tokenize(q["text"]))] = {"type": q["type"], **reference}
+    return references
+
+
+@lru_cache(maxsize=1)
+def _vocabulary() -> Tuple[Dict[str, int], "np.ndarray", float]:
+    """Term ids and smoothed IDF fitted on the bank's questions and reference answers."""
+    import numpy as np
+    docs = [set(terms(q["text"])) for questions in QUESTION_BANK.values() for q in questions]
+    docs += [set(terms(r["answer"])) for r in _references().values()]
+    df: Dict[str, int] = {}
+    for doc in docs:
+        for term in doc:
+            df[term] = df.get(term, 0) + 1
+    vocab = {term: i for i, term in enumerate(df)}
+    idf = np.array([math.log((1 + len(docs)) / (1 + df[t])) + 1 for t in vocab], dtype=np.float64)
+    unseen_idf = math.log(1 + len(docs)) + 1  # terms the bank never uses count as rare
+    return vocab, idf, unseen_idf
+
+
+def question_type(question: str, reference: Optional[dict] = None) -> str:
+    if reference:
+        return reference["type"]
+    if _BEHAVIORAL_QUESTION.search(question):
+        return "behavioral"
+    if _CODING_QUESTION.search(question):
+        return "coding"
+    return "technical"
+
+
+def _tfidf(docs: Sequence[List[str]]) -> Tuple["np.ndarray", "np.ndarray", "np.ndarray"]:
+    """
+    Sparse sublinear TF-IDF for a batch: returns sorted unique keys (row * width + term id),
+    their L2-normalized weights and the key width. Terms outside the bank vocabulary get ids
+    past its end, so they still count towards each document's norm.
+    """
+    import numpy as np
+    vocab, idf, unseen_idf = _vocabulary()
+    unseen: Dict[str, int] = {}
+    ids = [vocab[t] if t in vocab else unseen.setdefault(t, len(vocab) + len(unseen)) for doc in docs for t in doc]
+    width = len(vocab) + len(unseen) + 1
+    rows = np.repeat(np.arange(len(docs)), [len(doc) for doc in docs])
+    keys, counts = np.unique(rows * width + np.array(ids, dtype=np.int64), return_counts=True)
+    term_ids = keys % width
+    weights = (1 + np.log(counts)) * np.where(term_ids < len(vocab), idf[np.minimum(term_ids, len(vocab) - 1)], unseen_idf)
+    norms = np.sqrt(np.bincount(keys // width, weights ** 2, minlength=len(docs)))
+    weights /= np.maximum(norms[keys // width], 1e-12)
+    return keys, weights, np.int64(width)
+
+
+def cosine_pairs(left: Sequence[List[str]], right: Sequence[List[str]]) -> "np.ndarray":
+    """Cosine similarity of left[i] with right[i] for every i, computed in one sparse pass."""
+    import numpy as np
+    n = len(left)
+    keys, weights, width = _tfidf(list(left) + list(right))
+    rows, term_ids = keys // width, keys % width
+    is_left = rows < n
+    # Shift the right-hand rows onto the left ones so matching (row, term) pairs share a key
+    left_keys, right_keys = keys[is_left], (rows[~is_left] - n) * width + term_ids[~is_left]
+    _, li, ri = np.intersect1d(left_keys, right_keys, assume_unique=True, return_indices=True)
+    return np.bincount(left_keys[li] // width, weights[is_left][li] * weights[~is_left][ri], minlength=n)
+
+
+@lru_cache(maxsize=4096)
+def _keyword_form(keyword: str) -> Tuple[str, Optional[str]]:
+    """(" folded words ", literal) for a keyword; symbol keywords like "[::-1]" or "% 2" match literally."""
+    words = tokenize(fold(keyword))
+    literal = " ".join(tokenize(keyword)) != " ".join(keyword.lower().replace("-", " ").split())
+    return f" {' '.join(words)} ", keyword.lower() if literal or not words else None
+
+
+@lru_cache(maxsize=1024)
+def _target_terms(text: str) -> List[str]:
+    # Questions and reference answers repeat across a batch; treat the result as read-only
+    return terms(text)
+
+
+def keyword_hits(answer: str, keywords: List[str], tokens: Optional[List[str]] = None) -> Tuple[List[str], List[str]]:
+    """Splits keywords into (found, missing). Word keywords match whole (plural-folded) words."""
+    joined = " ".join(tokenize(fold(answer)) if tokens is None else tokens)
+    # "arr.filter" should match "filter" and still match "node.js"
+    padded = f" {joined} {joined.replace('.', ' ')} "
+    lowered = answer.lower()
+    found, missing = [], []
+    for keyword in keywords:
+        words, literal = _keyword_form(keyword)
+        (found if (literal in lowered if literal else words in padded) else missing).append(keyword)
+    return found, missing
+
+
+def _structure(answer: str, answer_terms: List[str], kind: str) -> float:
+    if kind == "coding":
+        return min(1.0, len({m.group(0)[:2] for m in _CODE_MARKERS.finditer(answer)}) / 3)
+    if kind == "behavioral":
+        words = set(answer_terms)
+        return sum(any(w.startswith(cue) for cue in cues for w in words) for cues in _STAR_CUES) / len(_STAR_CUES)
+    sentences = len(_SENTENCE_END.findall(answer.strip() + " "))
+    return 0.5 * (sentences >= 2) + 0.5 * bool(_EXAMPLE_MARKERS.search(answer))
+
+
+def _feedback(kind: str, found: List[str], missing: List[str], similarity: float,
+              length: float, structure: float, has_reference: bool) -> Tuple[str, str]:
+    notes, tips = [], []
+    if found or missing:
+        notes.append(f"Covers {len(found)} of {len(found) + len(missing)} key points.")
+    if has_reference:
+        notes.append("Close to a model answer." if similarity >= 0.8 else
+                     "Partly matches a model answer." if similarity >= 0.4 else "Differs from a model answer.")
+    else:
+        notes.append("Stays on the question's topic." if similarity >= 0.5 else "Does not clearly address the question.")
+    if missing:
+        tips.append(f"Address: {', '.join(missing[:5])}.")
+    if length < 0.5:
+        tips.append("Expand the answer with more detail.")
+    if structure < 0.5:
+        tips.append({
+            "coding": "Include working code with a return value.",
+            "behavioral": "Structure it as situation, action and result.",
+            "technical": "Explain in a few sentences and give a concrete example.",
+        }[kind])
+    return " ".join(notes), " ".join(tips) or "Add a concrete example from your own work."
+
+
+def score_answers(items: Sequence[Tuple[str, str]], keywords: Optional[Sequence[List[str]]] = None) -> List[Dict]:
+    """
+    Grades (question, answer) pairs locally. `keywords[i]` are extra key points for item i on top
+    of the bank's. Returns dicts with the EvaluationResult fields, in input order.
+    """
+    import numpy as np
+    if not items:
+        return []
+    references = _references()
+    refs = [references.get(" ".join(tokenize(question))) for question, _ in items]
+    kinds = [question_type(question, ref) for (question, _), ref in zip(items, refs)]
+
+    tokens = [tokenize(fold(answer)) for _, answer in items]
+    answer_terms = [[t for t in doc if t not in STOPWORDS] for doc in tokens]
+    target_terms = [_target_terms(ref["answer"] if ref else question) for (question, _), ref in zip(items, refs)]
+    has_reference = np.array([ref is not None for ref in refs])
+    similarity = cosine_pairs(answer_terms, target_terms)
+    full = np.where(has_reference, SIMILARITY_FULL["reference"], SIMILARITY_FULL["question"])
+    similarity = np.clip(similarity / full, 0.0, 1.0)
+
+    hits = []
+    for i, (_, answer) in enumerate(items):
+        extra = list(keywords[i]) if keywords else []
+        key_points = list(dict.fromkeys(extra + (refs[i]["keywords"] if refs[i] else [])))
+        hits.append(keyword_hits(answer, key_points, tokens[i]))
+    coverage = np.array([len(f) / (len(f) + len(m)) if f or m else np.nan for f, m in hits])
+    words = np.array([len(answer.split()) for _, answer in items], dtype=np.float64)
+    length = np.clip(words / np.array([TARGET_WORDS[k] for k in kinds]), 0.0, 1.0)
+    structure = np.array([_structure(answer, answer_terms[i], kinds[i]) for i, (_, answer) in enumerate(items)])
+
+    features = np.column_stack([coverage, similarity, length, structure])
+    weights = np.broadcast_to(np.array([WEIGHTS[k] for k in ("coverage", "similarity", "length", "structure")]), features.shape)
+    weights = np.where(np.isnan(features), 0.0, weights)
+    combined = (np.nan_to_num(features) * weights).sum(axis=1) / weights.sum(axis=1)
+    scores = np.rint(combined * 10).astype(int)
+
+    results = []
+    for i, (found, missing) in enumerate(hits):
+        feedback, improvements = _feedback(kinds[i], found, missing, similarity[i], length[i], structure[i], refs[i] is not None)
+        results.append({
+            "score": int(scores[i]),
+            "feedback": feedback,
+            "missing_keywords": missing,
+            "improvements": improvements,
+            "ideal_answer": refs[i]["answer"] if refs[i] else "",
+        })
+    return results
+
+
+def score_answer(question: str, answer: str, keywords: Optional[List[str]] = None) -> Dict:
+    return score_answers([(question, answer)], [keywords or []])[0]